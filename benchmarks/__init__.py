@@ -0,0 +1 @@
+"""Outils de mesure hors ligne : serveur Open-Meteo simulé et benchmarks."""
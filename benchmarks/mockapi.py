@@ -0,0 +1,311 @@
+"""Serveur Open-Meteo simulé, pour mesurer et tester sans l'API réelle.
+
+Les réponses sont tirées, par modèle, d'un enregistrement réel
+(``benchmarks/recorded/<MODÈLE>.json``, écrit par ``--record``), sinon d'une
+réponse de référence construite à la main (``benchmarks/reference/``, une
+localisation : horizons courts, valeurs ``null``, passage à l'heure d'été),
+sinon d'une réponse synthétique de même structure. Leurs dates sont décalées
+pour commencer au jour de la requête, comme l'API. Le serveur peut ajouter de
+la latence et des erreurs (503, 429 avec ``Retry-After``) ; il sert aussi le
+``meta.json`` des modèles.
+
+    python -m benchmarks.mockapi --port 8765 --latency 0.05 --error-rate 0.02
+    METEO_API_URL=http://127.0.0.1:8765/v1/forecast \\
+    METEO_META_URL=http://127.0.0.1:8765/data/{meta}/static/meta.json streamlit run meteo.py
+"""
+
+import argparse
+import datetime
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from meteo_data import fastjson
+from meteo_data.communes import COMMUNES_DEUX_SEVRES
+from meteo_data.fetch import build_forecast_url, fetch_json
+from meteo_data.forecast import DAILY_VARIABLES, FORECAST_DAYS, HOURLY_VARIABLES
+from meteo_data.models import MODELS, RUN_SCHEDULES
+
+RECORDED_DIR = os.path.join(os.path.dirname(__file__), "recorded")
+REFERENCE_DIR = os.path.join(os.path.dirname(__file__), "reference")
+# réponses réelles d'abord, réponses de référence à défaut
+FIXTURE_DIRS = (RECORDED_DIR, REFERENCE_DIR)
+# variables horodatées, décalées avec les dates de la réponse
+TIME_VARIABLES = ("time", "sunrise", "sunset")
+
+# variantes de chaque réponse (températures décalées), réparties entre les points
+VARIANTS = 8
+
+META_PATH = re.compile(r"^/data/(?P<meta>[^/]+)/static/meta\.json$")
+
+
+def record_fixtures(model_names=None, directory=RECORDED_DIR):
+    """Enregistre une réponse réelle (première commune) par modèle ; renvoie les chemins."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for model_name in model_names or MODELS:
+        url = build_forecast_url(COMMUNES_DEUX_SEVRES[:1], MODELS[model_name], DAILY_VARIABLES, HOURLY_VARIABLES,
+                                 FORECAST_DAYS, api_url="https://api.open-meteo.com/v1/forecast")
+        path = os.path.join(directory, f"{model_name}.json")
+        with open(path, "wb") as fh:
+            fh.write(fastjson.dumps(fetch_json(url)))
+        paths.append(path)
+    return paths
+
+
+def _times(start, count, step, fmt):
+    return [str(value)[:fmt] for value in start + np.arange(count) * step]
+
+
+def synthetic_location(model_name, days=FORECAST_DAYS, start=None):
+    """Réponse d'une localisation, de même structure que l'API, à valeurs déterministes."""
+    rng = np.random.default_rng(zlib.crc32(model_name.encode("utf-8")))
+    start = np.datetime64(start or datetime.date.today(), "D")
+    hours = np.arange(days * 24)
+    diurnal = np.sin(((hours % 24) - 9) / 24 * 2 * np.pi)
+    temperature = 12 + 6 * diurnal + np.cumsum(rng.normal(0, 0.3, hours.size))
+    wind = np.abs(15 + 8 * rng.standard_normal(hours.size))
+    rain = np.clip(rng.gamma(0.3, 1.5, hours.size) - 0.4, 0, None)
+    by_day = (days, 24)
+    hourly = {
+        "time": _times(start.astype("datetime64[h]"), hours.size, np.timedelta64(1, "h"), 16),
+        "temperature_2m": temperature.round(1).tolist(),
+        "relative_humidity_2m": np.clip(75 - 15 * diurnal + rng.normal(0, 5, hours.size), 20, 100).round().tolist(),
+        "wind_speed_10m": wind.round(1).tolist(),
+        "wind_direction_10m": rng.integers(0, 360, hours.size).tolist(),
+        "cloudcover": rng.integers(0, 101, hours.size).tolist(),
+        "precipitation_probability": np.clip(rain * 40, 0, 100).round().tolist(),
+    }
+    sunrise = start.astype("datetime64[m]") + np.arange(days) * np.timedelta64(1, "D") + np.timedelta64(8 * 60, "m")
+    sunset = sunrise + np.timedelta64(10 * 60 + 30, "m")
+    daily = {
+        "time": _times(start, days, np.timedelta64(1, "D"), 10),
+        "temperature_2m_max": temperature.reshape(by_day).max(axis=1).round(1).tolist(),
+        "temperature_2m_min": temperature.reshape(by_day).min(axis=1).round(1).tolist(),
+        "precipitation_sum": rain.reshape(by_day).sum(axis=1).round(1).tolist(),
+        "wind_speed_10m_max": wind.reshape(by_day).max(axis=1).round(1).tolist(),
+        "wind_gusts_10m_max": (wind.reshape(by_day).max(axis=1) * 1.5).round(1).tolist(),
+        "sunrise": [str(value) for value in sunrise],
+        "sunset": [str(value) for value in sunset],
+        "uv_index_max": rng.uniform(0, 6, days).round(2).tolist(),
+        "daylight_duration": np.full(days, 37800.0).tolist(),
+        "precipitation_probability_max": np.clip(rain.reshape(by_day).max(axis=1) * 40, 0, 100).round().tolist(),
+    }
+    return {
+        "latitude": 46.32, "longitude": -0.46, "generationtime_ms": 0.5, "utc_offset_seconds": 7200,
+        "timezone": "Europe/Paris", "timezone_abbreviation": "CEST", "elevation": 50.0,
+        "daily_units": {variable: "" for variable in daily}, "daily": daily,
+        "hourly_units": {variable: "" for variable in hourly}, "hourly": hourly,
+    }
+
+
+def shift_dates(data, start):
+    """Réponse ``data`` décalée d'un nombre entier de jours pour commencer le jour ``start``."""
+    offset = np.datetime64(start, "D") - np.datetime64(data["daily"]["time"][0], "D")
+    if offset == 0:
+        return data
+    shifted = dict(data)
+    for section in ("daily", "hourly"):
+        shifted[section] = {
+            variable: [None if value is None else str(np.datetime64(value) + offset)[:len(value)] for value in values]
+            if variable in TIME_VARIABLES else values
+            for variable, values in data[section].items()
+        }
+    return shifted
+
+
+def load_fixture(model_name, start=None, directories=FIXTURE_DIRS):
+    """Réponse enregistrée (ou de référence, ou synthétique) du modèle, datée à partir de ``start``.
+
+    ``start`` : aujourd'hui par défaut, premier jour des réponses de l'API.
+    """
+    start = start or datetime.date.today()
+    for directory in directories:
+        path = os.path.join(directory, f"{model_name}.json")
+        if os.path.exists(path):
+            with open(path, "rb") as fh:
+                return shift_dates(fastjson.loads(fh.read()), start)
+    return synthetic_location(model_name, start=start)
+
+
+def _shifted(values, shift):
+    array = np.array(values, dtype=np.float64)
+    return [None if np.isnan(value) else round(value, 1) for value in (array + shift).tolist()]
+
+
+def response_variants(template, count=VARIANTS):
+    """Corps JSON précompilés, coordonnées à compléter : ``variante % (lat, lon)``."""
+    variants = []
+    for k in range(count):
+        shift = (k - count // 2) * 0.4
+        data = {key: value for key, value in template.items() if key not in ("latitude", "longitude")}
+        for section in ("daily", "hourly"):
+            data[section] = {
+                variable: _shifted(values, shift) if variable.startswith("temperature") else values
+                for variable, values in template[section].items()
+            }
+        body = fastjson.dumps(data)
+        variants.append(b'{"latitude":%s,"longitude":%s,' + body[1:].replace(b"%", b"%%"))
+    return variants
+
+
+class MockOpenMeteo:
+    """Serveur HTTP local imitant ``/v1/forecast`` et les ``meta.json`` d'Open-Meteo.
+
+    ``latency`` (± ``jitter``) secondes sont ajoutées à chaque réponse ; une
+    part ``error_rate`` des requêtes échoue en 503 et une part
+    ``rate_limit_rate`` en 429. ``requests`` compte les requêtes par statut.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, seed=0, directories=FIXTURE_DIRS):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._directories = directories
+        self._variants_date = None
+        self._variants_for(datetime.date.today())
+        self._meta = {schedule["meta"]: name for name, schedule in RUN_SCHEDULES.items()}
+        self._thread = None
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # connexions réutilisées, comme avec l'API réelle
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body, headers = server.respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def forecast_url(self):
+        return f"{self.url}/v1/forecast"
+
+    @property
+    def meta_url(self):
+        return f"{self.url}/data/{{meta}}/static/meta.json"
+
+    def _variants_for(self, date):
+        """Corps précompilés de chaque modèle, datés à partir de ``date`` (recompilés au changement de jour)."""
+        with self._lock:
+            if self._variants_date != date:
+                self._variants = {
+                    MODELS[name]: response_variants(load_fixture(name, date, self._directories)) for name in MODELS
+                }
+                self._variants_date = date
+            return self._variants
+
+    def _count(self, status):
+        with self._lock:
+            self.requests[status] = self.requests.get(status, 0) + 1
+
+    def respond(self, path):
+        """``(statut, corps, en-têtes)`` pour un chemin de requête."""
+        parts = urlsplit(path)
+        with self._lock:
+            draw = self._random.random()
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        if delay:
+            time.sleep(delay)
+
+        meta = META_PATH.match(parts.path)
+        if meta and meta["meta"] in self._meta:
+            run = int(time.time() - RUN_SCHEDULES[self._meta[meta["meta"]]]["delay"]) // 3600 * 3600
+            self._count(200)
+            return 200, fastjson.dumps({"last_run_initialisation_time": run, "last_run_availability_time": run}), {}
+        if parts.path != "/v1/forecast":
+            self._count(404)
+            return 404, b'{"error":true,"reason":"not found"}', {}
+        if draw < self.error_rate:
+            self._count(503)
+            return 503, b'{"error":true,"reason":"injected"}', {}
+        if draw < self.error_rate + self.rate_limit_rate:
+            self._count(429)
+            return 429, b'{"error":true,"reason":"rate limited"}', {"Retry-After": "1"}
+
+        query = parse_qs(parts.query)
+        by_model = self._variants_for(datetime.date.today())
+        variants = by_model.get(query.get("models", [""])[0]) or next(iter(by_model.values()))
+        latitudes = query["latitude"][0].split(",")
+        longitudes = query["longitude"][0].split(",")
+        bodies = [
+            variants[int(abs(float(lat) * 1000 + float(lon) * 1000)) % len(variants)] % (lat.encode(), lon.encode())
+            for lat, lon in zip(latitudes, longitudes)
+        ]
+        self._count(200)
+        return 200, bodies[0] if len(bodies) == 1 else b"[" + b",".join(bodies) + b"]", {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-open-meteo", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur Open-Meteo simulé (réponses enregistrées, de référence ou synthétiques).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="secondes ajoutées à chaque réponse")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variation aléatoire de la latence (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="part des requêtes en erreur 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="part des requêtes refusées en 429")
+    parser.add_argument("--record", action="store_true",
+                        help="enregistre une réponse réelle par modèle dans benchmarks/recorded puis quitte")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        for path in record_fixtures():
+            print(path)
+        return 0
+    server = MockOpenMeteo(args.host, args.port, args.latency, args.jitter, args.error_rate, args.rate_limit_rate)
+    print(f"METEO_API_URL={server.forecast_url}")
+    print(f"METEO_META_URL={server.meta_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
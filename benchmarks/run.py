@@ -0,0 +1,271 @@
+"""Benchmarks hors ligne de la chaîne de prévisions, étape par étape.
+
+Les prévisions de tous les modèles sont servies par ``benchmarks.mockapi`` ;
+les communes au-delà du registre fourni sont tirées dans le département.
+Chaque étape est chronométrée séparément et les résultats sont écrits en
+JSON, comparables d'une version à l'autre avec ``--baseline``.
+
+    python -m benchmarks.run --scales 20 250 2000 --output bench.json
+    python -m benchmarks.run --baseline bench.json   # code de sortie 1 si régression
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.express as px
+import plotly.graph_objects as go
+
+from benchmarks.mockapi import MockOpenMeteo
+from meteo_data.communes import COMMUNES_DEUX_SEVRES
+from meteo_data.decimate import decimate_frame
+from meteo_data.derived import DerivedTables, departement_forecast, hourly_envelope
+from meteo_data.fetch import RATE_BURST, RateLimiter, build_forecast_url, chunk_communes, fetch_many, fetch_metrics
+from meteo_data.forecast import DAILY_VARIABLES, FORECAST_DAYS, HOURLY_VARIABLES, build_compact_frames, split_locations
+from meteo_data.index import ForecastIndex
+from meteo_data.models import MODELS
+from meteo_data.multimodel import combine_models, model_slice
+from meteo_data.spatial import thin_points
+
+STAGES = ("fetch", "parse", "concat", "aggregation", "derived", "filtering", "figures")
+DEFAULT_SCALES = (20, 250, 2000)
+
+# emprise des Deux-Sèvres, pour les communes synthétiques
+BOUNDS = {"lat": (45.97, 47.11), "lon": (-0.90, 0.22)}
+
+# mêmes seuils que l'application
+MAP_MAX_POINTS = 500
+MAX_LINE_SERIES = 25
+
+# écart ignoré dans les comparaisons (bruit de mesure), en secondes
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def synthetic_communes(count, seed=0):
+    """Le registre fourni, complété si besoin de points tirés dans le département."""
+    if count <= len(COMMUNES_DEUX_SEVRES):
+        return list(COMMUNES_DEUX_SEVRES[:count])
+    rng = np.random.default_rng(seed)
+    extra = count - len(COMMUNES_DEUX_SEVRES)
+    lats = rng.uniform(*BOUNDS["lat"], extra).round(4)
+    lons = rng.uniform(*BOUNDS["lon"], extra).round(4)
+    return list(COMMUNES_DEUX_SEVRES) + [
+        {"nom": f"Commune {position:04d}", "lat": float(lat), "lon": float(lon), "departement": "79"}
+        for position, (lat, lon) in enumerate(zip(lats, lons), start=1)
+    ]
+
+
+def fetch_model(model_name, communes, api_url, limiter):
+    """Réponses du modèle par commune, comme ``fetch_responses`` mais avec un limiteur dédié."""
+    chunks = chunk_communes(communes)
+    urls = [build_forecast_url(chunk, MODELS[model_name], DAILY_VARIABLES, HOURLY_VARIABLES, FORECAST_DAYS, api_url)
+            for chunk in chunks]
+    served, responses = [], []
+    for index, data, error in sorted(fetch_many(urls, limiter=limiter), key=lambda item: item[0]):
+        if error is None:
+            served.extend(chunks[index])
+            responses.extend(split_locations(data, len(chunks[index])))
+    return served, responses, len(urls)
+
+
+def build_figures(derived, forecast_index, df_hourly):
+    """Figures principales de l'application, sérialisées comme par ``st.plotly_chart``."""
+    date = forecast_index.dates[0]
+    daily = forecast_index.daily(date)
+    column = "Température Max (°C)"
+    if len(daily) > MAP_MAX_POINTS:
+        groups, _ = thin_points(daily["Latitude"].to_numpy(), daily["Longitude"].to_numpy(), MAP_MAX_POINTS)
+        daily = daily.groupby(groups, sort=False).agg(
+            Ville=("Ville", "first"), Latitude=("Latitude", "mean"), Longitude=("Longitude", "mean"),
+            **{column: (column, "mean")},
+        )
+    figures = [px.scatter_mapbox(daily, lat="Latitude", lon="Longitude", color=column, size=column,
+                                 hover_name="Ville", size_max=15, zoom=8)]
+
+    forecast = derived.departement_forecast
+    dept = go.Figure()
+    dept.add_trace(go.Scatter(x=forecast["Date"], y=forecast["Température Max (°C)"], mode="lines+markers"))
+    dept.add_trace(go.Scatter(x=forecast["Date"], y=forecast["Température Min (°C)"], mode="lines+markers"))
+    figures.append(dept)
+
+    hourly = forecast_index.hourly(forecast_index.dates[:3])
+    column = "Température (°C)"
+    if df_hourly["Ville"].nunique() > MAX_LINE_SERIES:
+        envelope = hourly_envelope(hourly, column)
+        figures.append(go.Figure([go.Scatter(x=envelope["Date et Heure"], y=envelope[name], mode="lines")
+                                  for name in ("mean", "max", "min")]))
+    else:
+        figures.append(px.line(decimate_frame(hourly, "Date et Heure", column, "Ville"), x="Date et Heure",
+                               y=column, color="Ville", render_mode="webgl"))
+    return sum(len(figure.to_json()) for figure in figures)
+
+
+def _timed(function, repeat):
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return result, durations
+
+
+def run_scale(server, count, repeat=3, model_names=None, rps=0.0):
+    """Chronomètre chaque étape pour ``count`` communes ; renvoie ``(durées par étape, détails)``."""
+    model_names = list(MODELS) if model_names is None else list(model_names)
+    communes = synthetic_communes(count)
+    limiter = RateLimiter(rps, RATE_BURST)
+    durations = {}
+
+    fetched, durations["fetch"] = _timed(
+        lambda: {name: fetch_model(name, communes, server.forecast_url, limiter) for name in model_names}, repeat)
+    frames, durations["parse"] = _timed(
+        lambda: {name: build_compact_frames(served, responses, [None] * len(served))
+                 for name, (served, responses, _) in fetched.items()}, repeat)
+    (df_all_long_term, df_all_hourly), durations["concat"] = _timed(
+        lambda: (combine_models({name: frame[0] for name, frame in frames.items()}),
+                 combine_models({name: frame[1] for name, frame in frames.items()})), repeat)
+
+    df_long_term, df_hourly = frames[model_names[0]]
+    _, durations["aggregation"] = _timed(lambda: departement_forecast(df_long_term), repeat)
+    derived, durations["derived"] = _timed(lambda: DerivedTables(df_long_term, df_hourly), repeat)
+
+    def filtering():
+        model_long_term = model_slice(df_all_long_term, model_names[0])
+        model_hourly = model_slice(df_all_hourly, model_names[0])
+        forecast_index = ForecastIndex(model_long_term, model_hourly)
+        selected = forecast_index.communes[:3]
+        for date in forecast_index.dates:
+            forecast_index.daily(date)
+        forecast_index.hourly(forecast_index.dates[:3], selected)
+        forecast_index.daily_commune(selected[0])
+        return forecast_index
+
+    forecast_index, durations["filtering"] = _timed(filtering, repeat)
+    figure_bytes, durations["figures"] = _timed(lambda: build_figures(derived, forecast_index, df_hourly), repeat)
+
+    details = {
+        "communes": count,
+        "models": model_names,
+        "requests": sum(requests for _, _, requests in fetched.values()),
+        "served": {name: len(served) for name, (served, _, _) in fetched.items()},
+        "daily_rows": len(df_all_long_term),
+        "hourly_rows": len(df_all_hourly),
+        "hourly_bytes": int(df_all_hourly.memory_usage(deep=True).sum()),
+        "figure_json_bytes": figure_bytes,
+    }
+    return durations, details
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plotly": plotly.__version__,
+    }
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat=3, model_names=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                   rate_limit_rate=0.0, rps=0.0):
+    """Lance le serveur simulé et mesure chaque échelle ; renvoie le rapport JSON (dict)."""
+    results, details = [], []
+    metrics_before = fetch_metrics()
+    with MockOpenMeteo(latency=latency, jitter=jitter, error_rate=error_rate,
+                       rate_limit_rate=rate_limit_rate) as server:
+        # premier passage non mesuré : imports paresseux et caches de Plotly/pandas
+        run_scale(server, min(scales), 1, model_names, rps)
+        for count in scales:
+            durations, scale_details = run_scale(server, count, repeat, model_names, rps)
+            details.append(scale_details)
+            for stage in STAGES:
+                results.append({
+                    "communes": count,
+                    "stage": stage,
+                    "min_s": round(min(durations[stage]), 6),
+                    "median_s": round(statistics.median(durations[stage]), 6),
+                    "runs_s": [round(duration, 6) for duration in durations[stage]],
+                })
+        server_requests = {str(status): count for status, count in sorted(server.requests.items())}
+    metrics_after = fetch_metrics()
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "options": {"scales": list(scales), "repeat": repeat, "latency": latency, "jitter": jitter,
+                    "error_rate": error_rate, "rate_limit_rate": rate_limit_rate, "rps": rps},
+        "results": results,
+        "details": details,
+        "server_requests": server_requests,
+        "fetch_metrics": {key: value - metrics_before[key] for key, value in metrics_after.items()
+                          if isinstance(value, int)},
+    }
+
+
+def compare(report, baseline, tolerance=0.2):
+    """Étapes plus lentes que dans ``baseline`` de plus de ``tolerance`` (médianes)."""
+    reference = {(row["communes"], row["stage"]): row["median_s"] for row in baseline["results"]}
+    regressions = []
+    for row in report["results"]:
+        before = reference.get((row["communes"], row["stage"]))
+        if before is None:
+            continue
+        after = row["median_s"]
+        if after > before * (1 + tolerance) and after - before > MIN_REGRESSION_SECONDS:
+            regressions.append({"communes": row["communes"], "stage": row["stage"], "baseline_s": before,
+                                "median_s": after, "ratio": round(after / before, 2)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne (serveur Open-Meteo simulé).")
+    parser.add_argument("--scales", nargs="+", type=int, default=list(DEFAULT_SCALES), help="nombres de communes")
+    parser.add_argument("--repeat", type=int, default=3, help="mesures par étape (médiane et minimum)")
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--latency", type=float, default=0.0, help="latence simulée par requête (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variation de la latence (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="part des requêtes en erreur 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="part des requêtes refusées en 429")
+    parser.add_argument("--rps", type=float, default=0.0, help="débit maximal (requêtes/s), 0 : illimité")
+    parser.add_argument("--output", help="fichier JSON de résultats (sortie standard par défaut)")
+    parser.add_argument("--baseline", help="résultats d'une version précédente à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="ralentissement toléré (0.2 : +20 %%)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.scales, args.repeat, args.models, args.latency, args.jitter, args.error_rate,
+                            args.rate_limit_rate, args.rps)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            report["regressions"] = compare(report, json.load(fh), args.tolerance)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    table = pd.DataFrame(report["results"]).pivot(index="stage", columns="communes", values="median_s")
+    print(table.reindex(STAGES).round(4).to_string(), file=sys.stderr)
+    for regression in report.get("regressions", []):
+        print(f"Régression : {regression['stage']} ({regression['communes']} communes) "
+              f"{regression['baseline_s']:.4f} s -> {regression['median_s']:.4f} s", file=sys.stderr)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
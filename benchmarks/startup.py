@@ -0,0 +1,96 @@
+"""Temps de démarrage à froid : imports mesurés dans un interpréteur neuf.
+
+    python -m benchmarks.startup --repeat 5
+
+- ``meteo_data`` : couche données seule (jobs, export, worker) ; la mesure
+  échoue si elle importe Streamlit ou Plotly ;
+- ``interface`` : imports de premier niveau de ``meteo.py``, payés avant que
+  le titre de la page s'affiche ;
+- ``plotly.express`` : import différé au premier graphique dessiné, mesuré
+  après ceux de l'interface (Streamlit charge déjà ``plotly.graph_objects``).
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADLESS_MODULES = (
+    "meteo_data", "meteo_data.loader", "meteo_data.multimodel", "meteo_data.derived", "meteo_data.store",
+    "meteo_data.archive", "meteo_data.ensemble", "meteo_data.verification", "meteo_data.export",
+    "meteo_data.prefetch", "meteo_data.service",
+)
+UI_ONLY_PACKAGES = ("streamlit", "plotly")
+
+# exécuté dans l'interpréteur neuf : durée des imports et paquets d'interface chargés
+PROBE = """
+import json, sys, time
+{setup}
+started = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "ui_packages": sorted({{name.split(".")[0] for name in sys.modules}} & {ui})}}))
+"""
+
+
+def interface_imports(path=os.path.join(ROOT, "meteo.py")):
+    """Instructions d'import de premier niveau du script Streamlit."""
+    with open(path, encoding="utf-8") as fh:
+        source = fh.read()
+    tree = ast.parse(source)
+    return "\n".join(ast.get_source_segment(source, node) for node in tree.body
+                     if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def measure(imports, setup=""):
+    code = PROBE.format(setup=setup, imports=imports, ui=set(UI_ONLY_PACKAGES))
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_startup(repeat=5):
+    interface = interface_imports()
+    probes = {
+        "meteo_data": ("\n".join(f"import {module}" for module in HEADLESS_MODULES), ""),
+        "interface": (interface, ""),
+        "plotly.express": ("import plotly.express", interface),
+    }
+    results = []
+    for name, (imports, setup) in probes.items():
+        runs = [measure(imports, setup) for _ in range(repeat)]
+        seconds = [run["seconds"] for run in runs]
+        results.append({
+            "probe": name, "median_s": round(statistics.median(seconds), 4), "min_s": round(min(seconds), 4),
+            "ui_packages": runs[0]["ui_packages"],
+        })
+    return {"python": sys.version.split()[0], "repeat": repeat, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Temps d'import à froid de la couche données et de l'interface.")
+    parser.add_argument("--repeat", type=int, default=5, help="interpréteurs neufs par mesure")
+    parser.add_argument("--output", help="fichier JSON de résultats (sortie standard par défaut)")
+    args = parser.parse_args(argv)
+
+    report = run_startup(args.repeat)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    headless = next(result for result in report["results"] if result["probe"] == "meteo_data")
+    if headless["ui_packages"]:
+        print(f"meteo_data importe {', '.join(headless['ui_packages'])}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
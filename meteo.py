@@ -1,255 +1,413 @@
+import os
+import threading
+import time
+
+import numpy as np
 import pandas as pd
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-import requests
-import time
+# Plotly (~0,5 s d'import) est importé par les sections qui dessinent un graphique,
+# pas au démarrage : le titre et les chiffres clés s'affichent avant
+
+from meteo_data import MODELS, get_cache, metrics
+from meteo_data.archive import get_archive
+from meteo_data.communes import COMMUNES_DEUX_SEVRES
+from meteo_data.decimate import decimate_frame
+from meteo_data.derived import DerivedTables, hourly_envelope, hourly_range, key_figure_commune_column
+from meteo_data.ensemble import ENSEMBLE_COLUMNS, load_ensemble
+from meteo_data.fetch import fetch_metrics
+from meteo_data.grid import GRID_DEDUP
+from meteo_data.forecast import RUN_COLUMN
+from meteo_data.index import ForecastIndex, frames_version
+from meteo_data.lru import SizedLRUCache
+from meteo_data.models import ENSEMBLE_MODELS
+from meteo_data.multimodel import (
+    COMPARISON_COLUMNS,
+    MODEL_COLUMN,
+    combine_models,
+    load_all_models,
+    model_slice,
+    model_spread,
+    models_version,
+    spread_summary,
+)
+from meteo_data.runs import RECHECK_INTERVAL, run_key
+from meteo_data.spatial import SpatialIndex, thin_points
+from meteo_data.store import DATA_SOURCE, get_store
+from meteo_data.verification import LEAD_COLUMN, VARIABLE_COLUMN, VERIFIED_COLUMNS, VerificationEngine, scores_from_sums
 
 st.set_page_config(layout="wide", page_title="Visualisation Météo Deux-Sèvres")
 
-# communes + coordonnées
-COMMUNES_DEUX_SEVRES = [
-    {"nom": "Niort", "lat": 46.3239, "lon": -0.4615},
-    {"nom": "Bressuire", "lat": 46.8641, "lon": -0.4958},
-    {"nom": "Parthenay", "lat": 46.6472, "lon": -0.2564},
-    {"nom": "Thouars", "lat": 47.0153, "lon": -0.2128},
-    {"nom": "Mauléon", "lat": 46.9028, "lon": -0.6625},
-    {"nom": "Saint-Maixent-l'École", "lat": 46.4167, "lon": -0.1667},
-    {"nom": "Airvault", "lat": 46.8556, "lon": -0.2025},
-    {"nom": "Chef-Boutonne", "lat": 46.2833, "lon": -0.3167},
-    {"nom": "Prahecq", "lat": 46.2833, "lon": -0.4333},
-    {"nom": "La Crèche", "lat": 46.3833, "lon": -0.3500},
-    {"nom": "Mauzé-sur-le-Mignon", "lat": 46.2167, "lon": -0.6167},
-    {"nom": "Coulon", "lat": 46.3167, "lon": -0.6833},
-    {"nom": "Chauray", "lat": 46.3667, "lon": -0.4167},
-    {"nom": "Bessines", "lat": 46.3167, "lon": -0.3833},
-    {"nom": "Saint-Symphorien", "lat": 46.4667, "lon": -0.3167},
-    {"nom": "Echiré", "lat": 46.3500, "lon": -0.4000},
-    {"nom": "Saint-Gelais", "lat": 46.4000, "lon": -0.3667},
-    {"nom": "Fors", "lat": 46.2833, "lon": -0.4500},
-    {"nom": "Frontenay-Rohan-Rohan", "lat": 46.2667, "lon": -0.4167},
-    {"nom": "Saint-Georges-de-Rex", "lat": 46.2500, "lon": -0.5500},
-]
-
-# Modèles météo connus
-MODELS = {
-    "AROME": "arome_france",
-    "ARPEGE": "arpege_europe",
-    "ICON_EU": "icon_eu",
-    "GFS": "gfs_global"
-}
+# mesures : export Prometheus sur METEO_METRICS_PORT (un serveur par processus)
+page_started = time.perf_counter()
+metrics.serve_metrics()
 
-# charger données API
-@st.cache_data(ttl=3600)  # Cache de 1 heure
-def load_data_from_api(model_name="AROME"):
-    model_key = MODELS[model_name]
-    forecast_days = 16
+# données de tous les modèles pour des runs donnés, partagées entre sessions.
+# run_keys change à la publication attendue d'un nouveau run : le conteneur est
+# alors ignoré et le cache disque revalidé. cache_resource : les DataFrames
+# restent en mémoire, sans copie ni désérialisation à chaque rerun (ils ne
+# doivent pas être modifiés) ; changer de modèle n'est qu'une sélection
+@st.cache_resource(ttl=RECHECK_INTERVAL, max_entries=2)
+def api_data_slot(run_keys):
+    return {"lock": threading.Lock(), "data": None}
+
+def load_all_data_from_api(run_keys):
+    slot = api_data_slot(run_keys)
+    with slot["lock"]:
+        if slot["data"] is not None:
+            return slot["data"]
+        data, revalidating = fetch_all_data_from_api()
+        # copie périmée servie pendant le téléchargement du nouveau run : pas gardée
+        # sous ces run_keys, le rerun suivant relit le cache disque rafraîchi
+        if not revalidating:
+            slot["data"] = data
+    if revalidating:
+        st.info(f"🔄 Nouveau run en cours de téléchargement ({', '.join(revalidating)}) : "
+                "prévisions précédentes affichées en attendant.")
+    return data
+
+# chargement de tous les modèles en parallèle, hors des caches Streamlit pour
+# que la barre de progression avance pendant le téléchargement
+def fetch_all_data_from_api():
+    # une seule barre pour tous les modèles, avancée au fil des communes reçues
+    progress_bar = st.progress(0.0, text="Chargement des données météorologiques...")
+    loaded_communes = {}
+    # modèles servis depuis la copie périmée pendant leur rafraîchissement
+    revalidating = []
+    # incidents affichés à part : un avertissement groupé plutôt qu'un par commune
+    incidents = []
     
-    all_long_term_data = []
-    all_hourly_data = []
+    def on_progress(model_name, done, total, communes):
+        loaded_communes[model_name] = done
+        progress_bar.progress(min(1.0, sum(loaded_communes.values()) / (total * len(MODELS))),
+                              text=f"Modèle {model_name} : {done}/{total} communes")
     
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    total_communes = len(COMMUNES_DEUX_SEVRES)
-    
-    for index, ville in enumerate(COMMUNES_DEUX_SEVRES):
-        status_text.text(f"Chargement des données pour {ville['nom']}... ({index + 1}/{total_communes})")
-        progress_bar.progress((index + 1) / total_communes)
-        
-        URL = f"https://api.open-meteo.com/v1/forecast?latitude={ville['lat']}&longitude={ville['lon']}&models={model_key}&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,wind_speed_10m_max,wind_gusts_10m_max,sunrise,sunset,uv_index_max,daylight_duration,precipitation_probability_max&hourly=temperature_2m,relative_humidity_2m,wind_speed_10m,wind_direction_10m,cloudcover,precipitation_probability&timezone=Europe/Paris&forecast_days={forecast_days}"
-        
-        try:
-            response = requests.get(URL, timeout=10)
-            data = response.json()
-            
-            # DataFrame day
-            df_long_term = pd.DataFrame({
-                "Ville": [ville['nom']] * len(data["daily"]["time"]),
-                "Latitude": [ville['lat']] * len(data["daily"]["time"]),
-                "Longitude": [ville['lon']] * len(data["daily"]["time"]),
-                "Date": data["daily"]["time"],
-                "Température Max (°C)": data["daily"]["temperature_2m_max"],
-                "Température Min (°C)": data["daily"]["temperature_2m_min"],
-                "Précipitations (mm)": data["daily"]["precipitation_sum"],
-                "Probabilité de Précipitations (%)": data["daily"]["precipitation_probability_max"],
-                "Vitesse du vent Max (km/h)": data["daily"]["wind_speed_10m_max"],
-                "Rafales Max (km/h)": data["daily"]["wind_gusts_10m_max"],
-                "Lever du soleil": data["daily"]["sunrise"],
-                "Coucher du soleil": data["daily"]["sunset"],
-                "Durée du jour (secondes)": data["daily"]["daylight_duration"],
-                "Indice UV Max": data["daily"]["uv_index_max"]
-            })
-            
-            # DataFrame heure
-            df_hourly = pd.DataFrame({
-                "Ville": [ville['nom']] * len(data["hourly"]["time"]),
-                "Date et Heure": data["hourly"]["time"],
-                "Température (°C)": data["hourly"]["temperature_2m"],
-                "Humidité (%)": data["hourly"]["relative_humidity_2m"],
-                "Vitesse du vent (km/h)": data["hourly"]["wind_speed_10m"],
-                "Direction du vent (°)": data["hourly"]["wind_direction_10m"],
-                "Couverture nuageuse (%)": data["hourly"]["cloudcover"],
-                "Probabilité de Précipitations (%)": data["hourly"]["precipitation_probability"]
-            })
-            
-            all_long_term_data.append(df_long_term)
-            all_hourly_data.append(df_hourly)
-            
-            # pause pour ne pas surcharger l'API
-            time.sleep(0.2)
-            
-        except Exception as e:
-            st.warning(f"Erreur pour {ville['nom']}: {e}")
+    def on_error(model_name, communes, error):
+        if not communes:
+            incidents.append({"Modèle": model_name, "Commune": "(toutes)", "Statut": "indisponible", "Erreur": str(error)})
+        for ville in communes:
+            incidents.append({"Modèle": model_name, "Commune": ville["nom"], "Statut": "indisponible", "Erreur": str(error)})
+    
+    def on_stale(model_name, communes, error):
+        if error is None:
+            revalidating.append(model_name)
+            return
+        for ville in communes:
+            incidents.append({"Modèle": model_name, "Commune": ville["nom"], "Statut": "copie précédente", "Erreur": str(error)})
     
+    df_long_term, df_hourly = load_all_models(on_progress=on_progress, on_error=on_error, on_stale=on_stale)
     progress_bar.empty()
-    status_text.empty()
     
-    # assemble les données
-    df_long_term = pd.concat(all_long_term_data, ignore_index=True)
-    df_hourly = pd.concat(all_hourly_data, ignore_index=True)
+    return (df_long_term, df_hourly, models_version(df_long_term, df_hourly),
+            pd.DataFrame(incidents, columns=["Modèle", "Commune", "Statut", "Erreur"])), revalidating
+
+def show_load_incidents(incidents):
+    if incidents.empty:
+        return
+    lost = incidents[incidents["Statut"] == "indisponible"]
+    stale = incidents[incidents["Statut"] == "copie précédente"]
+    if len(stale):
+        st.info(f"ℹ️ {len(stale)} prévision(s) commune/modèle affichée(s) depuis la dernière réponse en cache (API indisponible).")
+    if len(lost):
+        st.warning(f"⚠️ {len(lost)} prévision(s) commune/modèle indisponible(s) après plusieurs tentatives.")
+        # les communes déjà en cache disque ne sont pas retéléchargées
+        if st.button("Réessayer les communes manquantes"):
+            api_data_slot.clear()
+            st.rerun()
+    with st.expander("Détail des incidents de chargement"):
+        st.dataframe(incidents, use_container_width=True, hide_index=True)
+
+# lecture du magasin alimenté par le worker de préchargement (python -m meteo_data.prefetch),
+# pour tous les modèles disponibles ; versions = ((modèle, version), ...)
+@st.cache_resource(max_entries=2)
+def load_all_data_from_store(versions):
+    with metrics.timer("store_read"):
+        frames = {model_name: get_store().read(model_name) for model_name, _ in versions}
+    df_long_term = combine_models({model_name: frame[0] for model_name, frame in frames.items()})
+    df_hourly = combine_models({model_name: frame[1] for model_name, frame in frames.items()})
+    return df_long_term, df_hourly, models_version(df_long_term, df_hourly)
+
+# données d'un modèle : simple sélection dans les données de tous les modèles,
+# avec l'empreinte de leur contenu (calculée une fois par chargement)
+@st.cache_resource(max_entries=2 * len(MODELS))
+def load_model_frames(model_name, all_version, _df_all_long_term, _df_all_hourly):
+    with metrics.timer("model_slice", model=model_name):
+        df_long_term, df_hourly = model_slice(_df_all_long_term, model_name), model_slice(_df_all_hourly, model_name)
+        return df_long_term, df_hourly, frames_version(df_long_term, df_hourly)
+
+# index (date, commune) construit une fois par chargement ; les DataFrames
+# (préfixe _) ne sont pas hachés, la version suffit à identifier les données
+@st.cache_resource(max_entries=2 * len(MODELS))
+def load_forecast_index(model_name, data_version, _df_long_term, _df_hourly):
+    with metrics.timer("index", model=model_name):
+        return ForecastIndex(_df_long_term, _df_hourly)
+
+# tables dérivées (moyennes, catégories, agrégats horaires), une fois par chargement
+@st.cache_resource(max_entries=2 * len(MODELS))
+def load_derived_tables(model_name, data_version, _df_long_term, _df_hourly):
+    with metrics.timer("derived", model=model_name):
+        return DerivedTables(_df_long_term, _df_hourly)
+
+# cache des figures Plotly partagé entre sessions : clé (graphique, modèle,
+# version des données, sélection), éviction LRU au-delà de la taille maximale
+FIGURE_CACHE_MAX_BYTES = int(float(os.environ.get("METEO_FIGURE_CACHE_MB", "64")) * 1024 * 1024)
+
+# taille d'une figure estimée d'après les tableaux de ses traces, sans la sérialiser
+FIGURE_ARRAY_PROPERTIES = ("x", "y", "z", "lat", "lon", "customdata", "text", "hovertext", "ids")
+
+def array_nbytes(values):
+    if isinstance(values, np.ndarray) and values.dtype != object:
+        return values.nbytes
+    if isinstance(values, str):
+        return len(values)
+    try:
+        # tuples, listes, tableaux d'objets : ~16 octets par valeur
+        return 16 * len(values)
+    except TypeError:
+        return 0
+
+def figure_nbytes(fig):
+    size = 0
+    for trace in fig.data:
+        for name in FIGURE_ARRAY_PROPERTIES:
+            if name in trace:
+                size += array_nbytes(trace[name])
+        if "marker" in trace:
+            size += sum(array_nbytes(trace.marker[name]) for name in ("size", "color") if name in trace.marker)
+    return size
+
+@st.cache_resource
+def get_figure_cache():
+    return SizedLRUCache(FIGURE_CACHE_MAX_BYTES, sizeof=figure_nbytes)
+
+def cached_figure(chart, data_key, selection, build):
+    built = []
     
-    # Conversion des dates
-    df_long_term["Date"] = pd.to_datetime(df_long_term["Date"])
-    df_hourly["Date et Heure"] = pd.to_datetime(df_hourly["Date et Heure"])
+    def timed_build():
+        built.append(chart)
+        with metrics.timer("figure_build", chart=chart):
+            return build()
     
-    return df_long_term, df_hourly
+    fig = get_figure_cache().get_or_build((chart, *data_key, *selection), timed_build)
+    metrics.increment("figure_cache_total", result="miss" if built else "hit")
+    return fig
 
-# interface user
-st.title("📊 Visualisation Météo Deux-Sèvres")
+# envoi d'une figure au navigateur (sérialisation Plotly)
+def show_chart(fig, container=st, **kwargs):
+    with metrics.timer("plotly_chart"):
+        return container.plotly_chart(fig, use_container_width=True, **kwargs)
 
-# onglet pour choisir modele
-selected_model = st.sidebar.selectbox("Modèle météorologique", list(MODELS.keys()))
+# carte : au-delà de MAP_MAX_POINTS communes, les points sont regroupés par maille
+MAP_MAX_POINTS = int(os.environ.get("METEO_MAP_MAX_POINTS", "500"))
+COMMUNE_DEPARTEMENTS = {ville["nom"]: ville["departement"] for ville in COMMUNES_DEUX_SEVRES}
 
-# Bouton d'actualisation
-if st.sidebar.button("🔄 Rafraîchir les données"):
-    st.cache_data.clear()
-    st.rerun()
+def thin_map_data(map_data, param_column, max_points):
+    groups, _ = thin_points(map_data["Latitude"].to_numpy(), map_data["Longitude"].to_numpy(), max_points)
+    grouped = map_data.groupby(groups, sort=False)
+    thinned = grouped.agg(**{
+        "Ville": ("Ville", "first"),
+        "Latitude": ("Latitude", "mean"),
+        "Longitude": ("Longitude", "mean"),
+        param_column: (param_column, "mean"),
+        "Communes": ("Ville", "size"),
+    })
+    others = thinned["Communes"] - 1
+    thinned["Ville"] = thinned["Ville"].astype(str).where(others == 0, thinned["Ville"].astype(str) + " (+" + others.astype(str) + ")")
+    return thinned.reset_index(drop=True)
 
-# Affichage de l'heure de last MAJ
-st.sidebar.info(f"💡 Les données sont mises en cache pendant 1 heure pour optimiser les performances.")
+def map_zoom(map_data):
+    span = max(np.ptp(map_data["Latitude"].to_numpy()), np.ptp(map_data["Longitude"].to_numpy()), 0.1)
+    return int(np.clip(np.log2(360 / span) - 0.5, 4, 10))
 
-# Chargement des données
-with st.spinner("Chargement des données météorologiques..."):
-    df_long_term, df_hourly = load_data_from_api(selected_model)
+# Seuils vent (rafales, km/h)
+WIND_THRESHOLDS = {
+    "Vent fort": 50,
+    "Vent très fort": 75
+}
 
-if df_long_term is not None and df_hourly is not None:
-    st.success(f"✅ Données chargées : {len(df_long_term)} prévisions journalières et {len(df_hourly)} prévisions horaires")
-    
-    # Récupération des dates dispo
-    available_dates = df_long_term["Date"].dt.date.unique()
+# courbes horaires : au-delà de MAX_LINE_SERIES communes, le mode automatique
+# affiche l'enveloppe moyenne/min/max plutôt qu'une courbe par commune
+MAX_LINE_SERIES = 25
+HOURLY_DISPLAY_MODES = ["Automatique", "Une courbe par commune", "Enveloppe (moyenne/min/max)"]
+
+def envelope_figure(envelope, title=None, color="green", fillcolor="rgba(0,128,0,0.2)"):
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=envelope["Date et Heure"],
+        y=envelope["mean"],
+        mode='lines',
+        name='Moyenne',
+        line=dict(color=color)
+    ))
     
-    # Création du slider pour les dates
-    selected_date_idx = st.slider("Sélectionner la date", 0, len(available_dates)-1, 0)
-    selected_date = available_dates[selected_date_idx]
-    st.write(f"Date sélectionnée: **{selected_date}**")
+    fig.add_trace(go.Scatter(
+        x=envelope["Date et Heure"],
+        y=envelope["max"],
+        mode='lines',
+        name='Maximum',
+        line=dict(width=0),
+        showlegend=False
+    ))
     
-    # Filtrage des données pour la date sélectionnée
-    daily_data = df_long_term[df_long_term["Date"].dt.date == selected_date]
-    hourly_data = df_hourly[df_hourly["Date et Heure"].dt.date == selected_date]
+    fig.add_trace(go.Scatter(
+        x=envelope["Date et Heure"],
+        y=envelope["min"],
+        mode='lines',
+        name='Minimum',
+        fill='tonexty',
+        fillcolor=fillcolor,
+        line=dict(width=0),
+        showlegend=False
+    ))
     
-    # ===================== CHIFFRES CLÉS =====================
+    if title:
+        fig.update_layout(title=title)
+    return fig
+
+def hourly_figure(hourly, column, title, envelope=None, color="green", fillcolor="rgba(0,128,0,0.2)"):
+    import plotly.express as px
+    if envelope is not None:
+        return envelope_figure(envelope, title, color, fillcolor)
+    # une courbe WebGL par commune, séries décimées à la largeur du graphique
+    return px.line(decimate_frame(hourly, "Date et Heure", column, "Ville"), 
+                   x="Date et Heure", 
+                   y=column, 
+                   color="Ville",
+                   render_mode="webgl",
+                   title=title)
+
+# Chaque section interactive est un fragment : ses widgets ne relancent que
+# la section concernée (et ne resérialisent que ses propres figures).
+
+# ===================== CHIFFRES CLÉS =====================
+@metrics.timed("section", section="key_figures")
+def key_figures_section(figures):
     st.header("🔑 Chiffres clés du jour")
     
+    def key_metric(container, label, column, value_format):
+        value = figures[column]
+        if pd.notna(value):
+            ville = figures[key_figure_commune_column(column)]
+        else:
+            value = 0
+            ville = "Non disponible"
+        container.metric(label, value_format.format(value), f"à {ville}")
+    
     # Mise en page en colonnes pour les chiffres clés
     col1, col2, col3, col4 = st.columns(4)
     
-    # Température max
-    max_temp = daily_data["Température Max (°C)"].max()
-    if pd.notna(max_temp):
-        ville_max_temp = daily_data.loc[daily_data["Température Max (°C)"].idxmax(), "Ville"]
-    else:
-        max_temp = 0
-        ville_max_temp = "Non disponible"
-    col1.metric("Température maximale", f"{max_temp:.1f} °C", f"à {ville_max_temp}")
-    
-    # Température min
-    min_temp = daily_data["Température Min (°C)"].min()
-    if pd.notna(min_temp):
-        ville_min_temp = daily_data.loc[daily_data["Température Min (°C)"].idxmin(), "Ville"]
-    else:
-        min_temp = 0
-        ville_min_temp = "Non disponible"
-    col2.metric("Température minimale", f"{min_temp:.1f} °C", f"à {ville_min_temp}")
-    
-    # Vent max
-    max_wind = daily_data["Rafales Max (km/h)"].max()
-    if pd.notna(max_wind):
-        ville_max_wind = daily_data.loc[daily_data["Rafales Max (km/h)"].idxmax(), "Ville"]
-    else:
-        max_wind = 0
-        ville_max_wind = "Non disponible"
-    col3.metric("Rafales maximales", f"{max_wind:.1f} km/h", f"à {ville_max_wind}")
-    
-    # UV max
-    max_uv = daily_data["Indice UV Max"].max()
-    if pd.notna(max_uv):
-        ville_max_uv = daily_data.loc[daily_data["Indice UV Max"].idxmax(), "Ville"]
-    else:
-        max_uv = 0
-        ville_max_uv = "Non disponible"
-    col4.metric("Indice UV maximal", f"{max_uv:.1f}", f"à {ville_max_uv}")
+    key_metric(col1, "Température maximale", "Température Max (°C)", "{:.1f} °C")
+    key_metric(col2, "Température minimale", "Température Min (°C)", "{:.1f} °C")
+    key_metric(col3, "Rafales maximales", "Rafales Max (km/h)", "{:.1f} km/h")
+    key_metric(col4, "Indice UV maximal", "Indice UV Max", "{:.1f}")
     
     # Seconde ligne de chiffres clés
     col1, col2, col3, col4 = st.columns(4)
     
-    # Précipitations max
-    max_precip = daily_data["Précipitations (mm)"].max()
-    if pd.notna(max_precip):
-        ville_max_precip = daily_data.loc[daily_data["Précipitations (mm)"].idxmax(), "Ville"]
-    else:
-        max_precip = 0
-        ville_max_precip = "Non disponible"
-    col1.metric("Précipitations maximales", f"{max_precip:.1f} mm", f"à {ville_max_precip}")
-    
-    # Proba précipitations max
-    max_precip_prob = daily_data["Probabilité de Précipitations (%)"].max()
-    if pd.notna(max_precip_prob):
-        ville_max_precip_prob = daily_data.loc[daily_data["Probabilité de Précipitations (%)"].idxmax(), "Ville"]
-    else:
-        max_precip_prob = 0
-        ville_max_precip_prob = "Non disponible"
-    col2.metric("Probabilité précipitations", f"{max_precip_prob:.0f}%", f"à {ville_max_precip_prob}")
+    key_metric(col1, "Précipitations maximales", "Précipitations (mm)", "{:.1f} mm")
+    key_metric(col2, "Probabilité précipitations", "Probabilité de Précipitations (%)", "{:.0f}%")
     
     # Durée du jour
-    avg_daylight = daily_data["Durée du jour (secondes)"].mean() / 3600
-    col3.metric("Durée moyenne du jour", f"{avg_daylight:.1f} heures", "")
+    col3.metric("Durée moyenne du jour", f"{figures['Durée moyenne du jour (h)']:.1f} heures", "")
     
     # Heures d'ensoleillement
-    if not daily_data.empty and "Lever du soleil" in daily_data.columns and "Coucher du soleil" in daily_data.columns:
-        if pd.notna(daily_data["Lever du soleil"].iloc[0]) and pd.notna(daily_data["Coucher du soleil"].iloc[0]):
-            sunrise = datetime.strptime(daily_data["Lever du soleil"].iloc[0], "%Y-%m-%dT%H:%M").strftime("%H:%M")
-            sunset = datetime.strptime(daily_data["Coucher du soleil"].iloc[0], "%Y-%m-%dT%H:%M").strftime("%H:%M")
-            col4.metric("Lever/Coucher du soleil", f"{sunrise} - {sunset}", "")
-        else:
-            col4.metric("Lever/Coucher du soleil", "Non disponible", "")
+    if pd.notna(figures["Lever du soleil"]) and pd.notna(figures["Coucher du soleil"]):
+        col4.metric("Lever/Coucher du soleil", f"{figures['Lever du soleil']} - {figures['Coucher du soleil']}", "")
     else:
         col4.metric("Lever/Coucher du soleil", "Non disponible", "")
+
+# ===================== CARTES =====================
+@st.fragment
+@metrics.timed("section", section="map")
+def map_section(daily_data, selected_date, data_key):
+    import plotly.express as px
+    st.header("🗺️ Cartographie")
+    
+    map_param_options = {
+        "Température Max (°C)": "Température Max (°C)",
+        "Température Min (°C)": "Température Min (°C)",
+        "Précipitations (mm)": "Précipitations (mm)",
+        "Probabilité de Précipitations (%)": "Probabilité de Précipitations (%)",
+        "Rafales de vent (km/h)": "Rafales Max (km/h)",
+        "Indice UV": "Indice UV Max"
+    }
+    
+    map_param = st.selectbox("Paramètre à visualiser", list(map_param_options.keys()))
+    param_column = map_param_options[map_param]
+    
+    # plusieurs départements : choix de la zone pour afficher le détail
+    departements = sorted({COMMUNE_DEPARTEMENTS.get(ville) for ville in daily_data["Ville"].unique()} - {None})
+    zone = "Toutes les zones"
+    if len(departements) > 1:
+        zone = st.selectbox("Zone affichée", ["Toutes les zones"] + departements)
+    map_data = daily_data
+    if zone != "Toutes les zones":
+        map_data = daily_data[daily_data["Ville"].map(COMMUNE_DEPARTEMENTS).eq(zone).to_numpy()]
+    # au-delà de l'échéance du modèle (ou variable qu'il ne fournit pas) : valeurs nulles
+    map_data = map_data[map_data[param_column].notna().to_numpy()]
+    if map_data.empty:
+        st.info(f"{map_param} : non disponible pour cette date avec ce modèle.")
+        return
+    thinned = len(map_data) > MAP_MAX_POINTS
+    
+    def build_map():
+        points = thin_map_data(map_data, param_column, MAP_MAX_POINTS) if thinned else map_data
+        fig = px.scatter_mapbox(points, 
+                              lat="Latitude", 
+                              lon="Longitude", 
+                              color=param_column,
+                              size=param_column,
+                              hover_name="Ville", 
+                              hover_data={param_column: ":.1f"},
+                              color_continuous_scale=px.colors.sequential.Plasma,
+                              size_max=15,
+                              zoom=map_zoom(map_data),
+                              title=f"{map_param} par commune - {selected_date}")
         
-    # ===================== PRÉVISIONS GÉNÉRALES =====================
+        fig.update_layout(mapbox_style="carto-positron", height=600)
+        return fig
+    
+    fig = cached_figure("map", data_key, (param_column, selected_date, zone), build_map)
+    if thinned:
+        st.caption(f"Carte simplifiée : {len(map_data)} communes regroupées par secteur (valeur moyenne). "
+                   "Choisissez une zone pour afficher toutes les communes.")
+    event = show_chart(fig, on_select="rerun", selection_mode="points", key="map_selection")
+    # clic sur la carte (point ou secteur regroupé) : commune la plus proche du point cliqué
+    clicked = [point for point in event.selection.points if "lat" in point and "lon" in point]
+    if clicked:
+        index = SpatialIndex(map_data["Latitude"].to_numpy(), map_data["Longitude"].to_numpy())
+        commune = map_data.iloc[index.nearest(clicked[0]["lat"], clicked[0]["lon"])]
+        st.info(f"📍 Commune la plus proche : **{commune['Ville']}** — {map_param} : {commune[param_column]:.1f}")
+
+# ===================== SITUATION DU JOUR =====================
+# le slider de date ne relance que les chiffres clés et la carte
+@st.fragment
+@metrics.timed("section", section="daily")
+def daily_section(forecast_index, derived, data_key):
+    # Récupération des dates dispo
+    available_dates = forecast_index.dates
+    
+    # Création du slider pour les dates
+    selected_date_idx = st.slider("Sélectionner la date", 0, len(available_dates)-1, 0)
+    selected_date = available_dates[selected_date_idx]
+    st.write(f"Date sélectionnée: **{selected_date}**")
+    
+    # Filtrage des données pour la date sélectionnée
+    daily_data = forecast_index.daily(selected_date)
+    
+    # chiffres clés précalculés pour toutes les dates : une seule ligne à lire
+    key_figures_section(derived.key_figures.loc[pd.Timestamp(selected_date)])
+    map_section(daily_data, selected_date, data_key)
+
+# ===================== PRÉVISIONS GÉNÉRALES =====================
+@metrics.timed("section", section="departement")
+def departement_section(derived, data_key):
+    import plotly.express as px
+    import plotly.graph_objects as go
     st.header("🌐 Prévisions générales du département")
     
-    # dataframe pour les moyennes par date
-    departement_forecast = df_long_term.groupby("Date").agg({
-        "Température Max (°C)": "mean",
-        "Température Min (°C)": "mean",
-        "Précipitations (mm)": "mean",
-        "Probabilité de Précipitations (%)": "mean",
-        "Vitesse du vent Max (km/h)": "mean",
-        "Rafales Max (km/h)": "mean",
-        "Indice UV Max": "mean"
-    }).reset_index()
-
-    # Conversion en numérique (sécurité)
-    for col in departement_forecast.columns:
-        if col != "Date":
-            departement_forecast[col] = pd.to_numeric(departement_forecast[col], errors='coerce')
-        
-    # Arrondir les valeurs
-    for col in departement_forecast.columns:
-        if col != "Date":
-            departement_forecast[col] = departement_forecast[col].round(1)
+    # dataframe pour les moyennes par date (précalculé)
+    departement_forecast = derived.departement_forecast
     
     # Création onglets
     gen_tab1, gen_tab2, gen_tab3, gen_tab4 = st.tabs(["Vue d'ensemble", "Températures", "Précipitations", "Vent"])
@@ -280,242 +438,229 @@ if df_long_term is not None and df_hourly is not None:
         # Heatmap
         st.subheader("Aperçu général des 16 prochains jours")
         
-        heatmap_data = departement_forecast.copy()
-        heatmap_data["Date_str"] = heatmap_data["Date"].dt.strftime("%d/%m")
-        heatmap_data["Température moyenne"] = (heatmap_data["Température Max (°C)"] + heatmap_data["Température Min (°C)"]) / 2
+        heatmap_data = derived.heatmap
         
-        fig_heatmap = px.imshow(
-            heatmap_data[["Température moyenne", "Précipitations (mm)", "Rafales Max (km/h)", "Indice UV Max"]].T,
-            x=heatmap_data["Date_str"],
-            y=["Température", "Précipitations", "Vent", "UV"],
-            color_continuous_scale="RdYlBu_r",
-            aspect="auto",
-            title="Conditions météorologiques générales (intensité relative)"
-        )
+        def build_heatmap():
+            fig_heatmap = px.imshow(
+                heatmap_data[["Température moyenne", "Précipitations (mm)", "Rafales Max (km/h)", "Indice UV Max"]].T,
+                x=heatmap_data["Date_str"],
+                y=["Température", "Précipitations", "Vent", "UV"],
+                color_continuous_scale="RdYlBu_r",
+                aspect="auto",
+                title="Conditions météorologiques générales (intensité relative)"
+            )
+            
+            fig_heatmap.update_layout(height=250)
+            return fig_heatmap
         
-        fig_heatmap.update_layout(height=250)
-        st.plotly_chart(fig_heatmap, use_container_width=True)
+        fig_heatmap = cached_figure("heatmap", data_key, (), build_heatmap)
+        show_chart(fig_heatmap)
         
     with gen_tab2:
         # Graphique des températures moy
-        fig_dept_temp = go.Figure()
-        
-        fig_dept_temp.add_trace(go.Scatter(
-            x=departement_forecast["Date"],
-            y=departement_forecast["Température Max (°C)"],
-            mode='lines+markers',
-            name='Température Max moyenne',
-            line=dict(color='red')
-        ))
-        
-        fig_dept_temp.add_trace(go.Scatter(
-            x=departement_forecast["Date"],
-            y=departement_forecast["Température Min (°C)"],
-            mode='lines+markers',
-            name='Température Min moyenne',
-            line=dict(color='blue')
-        ))
-        
-        # Zone de confort thermique
-        fig_dept_temp.add_trace(go.Scatter(
-            x=departement_forecast["Date"],
-            y=[25] * len(departement_forecast),
-            mode='lines',
-            line=dict(color="rgba(0,255,0,0.2)", width=0),
-            showlegend=False
-        ))
-        
-        fig_dept_temp.add_trace(go.Scatter(
-            x=departement_forecast["Date"],
-            y=[18] * len(departement_forecast),
-            mode='lines',
-            line=dict(color="rgba(0,255,0,0.2)", width=0),
-            fill='tonexty',
-            fillcolor='rgba(0,255,0,0.1)',
-            name='Zone de confort'
-        ))
+        def build_dept_temp():
+            fig_dept_temp = go.Figure()
+            
+            fig_dept_temp.add_trace(go.Scatter(
+                x=departement_forecast["Date"],
+                y=departement_forecast["Température Max (°C)"],
+                mode='lines+markers',
+                name='Température Max moyenne',
+                line=dict(color='red')
+            ))
+            
+            fig_dept_temp.add_trace(go.Scatter(
+                x=departement_forecast["Date"],
+                y=departement_forecast["Température Min (°C)"],
+                mode='lines+markers',
+                name='Température Min moyenne',
+                line=dict(color='blue')
+            ))
+            
+            # Zone de confort thermique
+            fig_dept_temp.add_trace(go.Scatter(
+                x=departement_forecast["Date"],
+                y=[25] * len(departement_forecast),
+                mode='lines',
+                line=dict(color="rgba(0,255,0,0.2)", width=0),
+                showlegend=False
+            ))
+            
+            fig_dept_temp.add_trace(go.Scatter(
+                x=departement_forecast["Date"],
+                y=[18] * len(departement_forecast),
+                mode='lines',
+                line=dict(color="rgba(0,255,0,0.2)", width=0),
+                fill='tonexty',
+                fillcolor='rgba(0,255,0,0.1)',
+                name='Zone de confort'
+            ))
+            
+            fig_dept_temp.update_layout(
+                title="Prévisions de températures moyennes - Deux-Sèvres",
+                xaxis_title="Date",
+                yaxis_title="Température (°C)",
+                hovermode="x unified"
+            )
+            return fig_dept_temp
         
-        fig_dept_temp.update_layout(
-            title="Prévisions de températures moyennes - Deux-Sèvres",
-            xaxis_title="Date",
-            yaxis_title="Température (°C)",
-            hovermode="x unified"
-        )
+        fig_dept_temp = cached_figure("dept_temp", data_key, (), build_dept_temp)
         
-        st.plotly_chart(fig_dept_temp, use_container_width=True)
+        show_chart(fig_dept_temp)
         
         # Histo écarts de température
-        ecart_temp = departement_forecast["Température Max (°C)"] - departement_forecast["Température Min (°C)"]
+        def build_dept_ecart():
+            ecart_temp = departement_forecast["Température Max (°C)"] - departement_forecast["Température Min (°C)"]
+            
+            fig_ecart = px.bar(
+                x=departement_forecast["Date"],
+                y=ecart_temp,
+                labels={"x": "Date", "y": "Écart (°C)"},
+                title="Écart journalier de température (Max - Min)"
+            )
+            return fig_ecart
         
-        fig_ecart = px.bar(
-            x=departement_forecast["Date"],
-            y=ecart_temp,
-            labels={"x": "Date", "y": "Écart (°C)"},
-            title="Écart journalier de température (Max - Min)"
-        )
+        fig_ecart = cached_figure("dept_ecart", data_key, (), build_dept_ecart)
         
-        st.plotly_chart(fig_ecart, use_container_width=True)
+        show_chart(fig_ecart)
         
     with gen_tab3:
         # précipitations
-        fig_dept_precip = go.Figure()
-        
-        fig_dept_precip.add_trace(go.Bar(
-            x=departement_forecast["Date"],
-            y=departement_forecast["Précipitations (mm)"],
-            name='Précipitations moyennes',
-            marker_color='royalblue'
-        ))
-        
-        fig_dept_precip.add_trace(go.Scatter(
-            x=departement_forecast["Date"],
-            y=departement_forecast["Probabilité de Précipitations (%)"],
-            mode='lines+markers',
-            name='Probabilité moyenne',
-            marker=dict(color='darkblue'),
-            yaxis="y2"
-        ))
-        
-        precipitations_cumulees = departement_forecast["Précipitations (mm)"].cumsum()
+        def build_dept_precip():
+            fig_dept_precip = go.Figure()
+            
+            fig_dept_precip.add_trace(go.Bar(
+                x=departement_forecast["Date"],
+                y=departement_forecast["Précipitations (mm)"],
+                name='Précipitations moyennes',
+                marker_color='royalblue'
+            ))
+            
+            fig_dept_precip.add_trace(go.Scatter(
+                x=departement_forecast["Date"],
+                y=departement_forecast["Probabilité de Précipitations (%)"],
+                mode='lines+markers',
+                name='Probabilité moyenne',
+                marker=dict(color='darkblue'),
+                yaxis="y2"
+            ))
+            
+            precipitations_cumulees = departement_forecast["Précipitations (mm)"].cumsum()
+            
+            fig_dept_precip.add_trace(go.Scatter(
+                x=departement_forecast["Date"],
+                y=precipitations_cumulees,
+                mode='lines',
+                name='Cumul précipitations',
+                line=dict(color='purple', dash='dot'),
+                yaxis="y3"
+            ))
+            
+            fig_dept_precip.update_layout(
+                title="Prévisions de précipitations moyennes - Deux-Sèvres",
+                xaxis_title="Date",
+                yaxis_title="Précipitations (mm)",
+                yaxis2=dict(
+                    title="Probabilité (%)",
+                    overlaying="y",
+                    side="right",
+                    range=[0, 100]
+                ),
+                yaxis3=dict(
+                    title="Cumul (mm)",
+                    overlaying="y",
+                    side="right",
+                    anchor="free",
+                    position=1.0,
+                    range=[0, max(precipitations_cumulees) * 1.1]
+                ),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                margin=dict(r=50),
+                hovermode="x unified"
+            )
+            return fig_dept_precip
         
-        fig_dept_precip.add_trace(go.Scatter(
-            x=departement_forecast["Date"],
-            y=precipitations_cumulees,
-            mode='lines',
-            name='Cumul précipitations',
-            line=dict(color='purple', dash='dot'),
-            yaxis="y3"
-        ))
+        fig_dept_precip = cached_figure("dept_precip", data_key, (), build_dept_precip)
         
-        fig_dept_precip.update_layout(
-            title="Prévisions de précipitations moyennes - Deux-Sèvres",
-            xaxis_title="Date",
-            yaxis_title="Précipitations (mm)",
-            yaxis2=dict(
-                title="Probabilité (%)",
-                overlaying="y",
-                side="right",
-                range=[0, 100]
-            ),
-            yaxis3=dict(
-                title="Cumul (mm)",
-                overlaying="y",
-                side="right",
-                anchor="free",
-                position=1.0,
-                range=[0, max(precipitations_cumulees) * 1.1]
-            ),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            margin=dict(r=50),
-            hovermode="x unified"
-        )
-        
-        st.plotly_chart(fig_dept_precip, use_container_width=True)
+        show_chart(fig_dept_precip)
         
         # Catégorisation des jours
-        precip_categories = pd.cut(
-            departement_forecast["Précipitations (mm)"],
-            bins=[-0.1, 0.2, 1, 5, 10, 100],
-            labels=["Sec", "Bruine", "Léger", "Modéré", "Fort"]
-        )
+        category_counts = derived.precipitation_counts
         
-        category_counts = precip_categories.value_counts().sort_index()
+        def build_precip_pie():
+            fig_precip_pie = px.pie(
+                values=category_counts.values,
+                names=category_counts.index,
+                title="Répartition des jours selon les précipitations",
+                color_discrete_sequence=px.colors.sequential.Blues[1:]
+            )
+            return fig_precip_pie
         
-        fig_precip_pie = px.pie(
-            values=category_counts.values,
-            names=category_counts.index,
-            title="Répartition des jours selon les précipitations",
-            color_discrete_sequence=px.colors.sequential.Blues[1:]
-        )
+        fig_precip_pie = cached_figure("precip_pie", data_key, (), build_precip_pie)
         
-        st.plotly_chart(fig_precip_pie, use_container_width=True)
+        show_chart(fig_precip_pie)
         
     with gen_tab4:
         # Graphique vent
-        fig_dept_wind = go.Figure()
-        
-        fig_dept_wind.add_trace(go.Bar(
-            x=departement_forecast["Date"],
-            y=departement_forecast["Vitesse du vent Max (km/h)"],
-            name='Vitesse du vent Max moyenne',
-            marker_color='green'
-        ))
-        
-        fig_dept_wind.add_trace(go.Scatter(
-            x=departement_forecast["Date"],
-            y=departement_forecast["Rafales Max (km/h)"],
-            mode='lines+markers',
-            name='Rafales Max moyennes',
-            marker=dict(color='darkgreen')
-        ))
-        
-        # Seuils vent
-        wind_thresholds = {
-            "Vent fort": 50,
-            "Vent très fort": 75
-        }
-        
-        for label, val in wind_thresholds.items():
-            fig_dept_wind.add_shape(
-                type="line",
-                x0=departement_forecast["Date"].min(),
-                y0=val,
-                x1=departement_forecast["Date"].max(),
-                y1=val,
-                line=dict(color="red", width=1, dash="dash"),
-            )
+        def build_dept_wind():
+            fig_dept_wind = go.Figure()
+            
+            fig_dept_wind.add_trace(go.Bar(
+                x=departement_forecast["Date"],
+                y=departement_forecast["Vitesse du vent Max (km/h)"],
+                name='Vitesse du vent Max moyenne',
+                marker_color='green'
+            ))
             
-            fig_dept_wind.add_annotation(
-                x=departement_forecast["Date"].max(),
-                y=val,
-                text=label,
-                showarrow=False,
-                yshift=5,
-                xshift=-5,
-                font=dict(color="red")
+            fig_dept_wind.add_trace(go.Scatter(
+                x=departement_forecast["Date"],
+                y=departement_forecast["Rafales Max (km/h)"],
+                mode='lines+markers',
+                name='Rafales Max moyennes',
+                marker=dict(color='darkgreen')
+            ))
+            
+            for label, val in WIND_THRESHOLDS.items():
+                fig_dept_wind.add_shape(
+                    type="line",
+                    x0=departement_forecast["Date"].min(),
+                    y0=val,
+                    x1=departement_forecast["Date"].max(),
+                    y1=val,
+                    line=dict(color="red", width=1, dash="dash"),
+                )
+                
+                fig_dept_wind.add_annotation(
+                    x=departement_forecast["Date"].max(),
+                    y=val,
+                    text=label,
+                    showarrow=False,
+                    yshift=5,
+                    xshift=-5,
+                    font=dict(color="red")
+                )
+            
+            fig_dept_wind.update_layout(
+                title="Prévisions de vent moyen - Deux-Sèvres",
+                xaxis_title="Date",
+                yaxis_title="Vitesse (km/h)",
+                hovermode="x unified"
             )
+            return fig_dept_wind
         
-        fig_dept_wind.update_layout(
-            title="Prévisions de vent moyen - Deux-Sèvres",
-            xaxis_title="Date",
-            yaxis_title="Vitesse (km/h)",
-            hovermode="x unified"
-        )
+        fig_dept_wind = cached_figure("dept_wind", data_key, (), build_dept_wind)
         
-        st.plotly_chart(fig_dept_wind, use_container_width=True)
-    
-    # ===================== CARTES =====================
-    st.header("🗺️ Cartographie")
-    
-    map_param_options = {
-        "Température Max (°C)": "Température Max (°C)",
-        "Température Min (°C)": "Température Min (°C)",
-        "Précipitations (mm)": "Précipitations (mm)",
-        "Probabilité de Précipitations (%)": "Probabilité de Précipitations (%)",
-        "Rafales de vent (km/h)": "Rafales Max (km/h)",
-        "Indice UV": "Indice UV Max"
-    }
-    
-    map_param = st.selectbox("Paramètre à visualiser", list(map_param_options.keys()))
-    param_column = map_param_options[map_param]
-    
-    fig = px.scatter_mapbox(daily_data, 
-                          lat="Latitude", 
-                          lon="Longitude", 
-                          color=param_column,
-                          size=param_column,
-                          hover_name="Ville", 
-                          hover_data=[param_column],
-                          color_continuous_scale=px.colors.sequential.Plasma,
-                          size_max=15,
-                          zoom=8,
-                          title=f"{map_param} par commune - {selected_date}")
-    
-    fig.update_layout(mapbox_style="carto-positron", height=600)
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # ===================== ÉVOLUTION HORAIRE =====================
+        show_chart(fig_dept_wind)
+
+# ===================== ÉVOLUTION HORAIRE =====================
+@st.fragment
+@metrics.timed("section", section="hourly")
+def hourly_section(forecast_index, derived, data_key):
+    import plotly.express as px
+    import plotly.graph_objects as go
     st.header("⏱️ Évolution horaire")
+    
+    available_dates = forecast_index.dates
 
     date_range = st.slider(
         "Sélectionner la plage de dates pour l'évolution horaire", 
@@ -527,168 +672,184 @@ if df_long_term is not None and df_hourly is not None:
     selected_date_range = available_dates[date_range[0]:date_range[1]+1]
     st.write(f"Période sélectionnée: Du **{selected_date_range[0]}** au **{selected_date_range[-1]}**")
 
-    hourly_data_range = df_hourly[df_hourly["Date et Heure"].dt.date.isin(selected_date_range)]
-
-    available_cities = sorted(hourly_data_range["Ville"].unique())
+    available_cities = forecast_index.communes
     city_options = ["Toutes les communes"] + available_cities
     selected_cities = st.multiselect("Sélectionner des communes", city_options, default=[city_options[0]])
 
     if "Toutes les communes" in selected_cities:
-        filtered_hourly = hourly_data_range
+        filtered_hourly = forecast_index.hourly(selected_date_range)
         if len(selected_cities) > 1:
             st.info("L'option 'Toutes les communes' est sélectionnée. Les autres sélections sont ignorées.")
     else:
-        filtered_hourly = hourly_data_range[hourly_data_range["Ville"].isin(selected_cities)]
+        filtered_hourly = forecast_index.hourly(selected_date_range, selected_cities)
+    
+    series_count = len(available_cities) if "Toutes les communes" in selected_cities else len(selected_cities)
+    display_mode = st.radio("Affichage", HOURLY_DISPLAY_MODES, horizontal=True)
+    use_envelope = display_mode == HOURLY_DISPLAY_MODES[2] or (
+        display_mode == HOURLY_DISPLAY_MODES[0] and series_count > MAX_LINE_SERIES
+    )
+    
+    def selection_envelope(column):
+        if not use_envelope:
+            return None
+        if "Toutes les communes" in selected_cities:
+            return hourly_range(derived.envelopes[column], selected_date_range)
+        return hourly_envelope(filtered_hourly, column)
+    
+    # sélection identifiant les figures horaires dans le cache
+    if "Toutes les communes" in selected_cities:
+        hourly_selection = (tuple(selected_date_range), ("Toutes les communes",), use_envelope)
+    else:
+        hourly_selection = (tuple(selected_date_range), tuple(selected_cities), use_envelope)
 
     if not filtered_hourly.empty:
-        fig_temp = px.line(filtered_hourly, 
-                        x="Date et Heure", 
-                        y="Température (°C)", 
-                        color="Ville",
-                        title=f"Évolution des températures - Du {selected_date_range[0]} au {selected_date_range[-1]}")
+        def build_hourly_temp():
+            fig_temp = hourly_figure(filtered_hourly, "Température (°C)",
+                                     f"Évolution des températures - Du {selected_date_range[0]} au {selected_date_range[-1]}",
+                                     selection_envelope("Température (°C)"), "red", "rgba(255,0,0,0.15)")
+            
+            for date in selected_date_range[1:]:
+                midnight = pd.Timestamp(date).replace(hour=0, minute=0)
+                fig_temp.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
+            return fig_temp
         
-        for date in selected_date_range[1:]:
-            midnight = pd.Timestamp(date).replace(hour=0, minute=0)
-            fig_temp.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
+        fig_temp = cached_figure("hourly_temp", data_key, hourly_selection, build_hourly_temp)
         
-        st.plotly_chart(fig_temp, use_container_width=True)
+        show_chart(fig_temp)
         
         col1, col2 = st.columns(2)
         
-        fig_hum = px.line(filtered_hourly, 
-                        x="Date et Heure", 
-                        y="Humidité (%)", 
-                        color="Ville",
-                        title=f"Évolution de l'humidité")
+        def build_hourly_hum():
+            fig_hum = hourly_figure(filtered_hourly, "Humidité (%)", f"Évolution de l'humidité",
+                                    selection_envelope("Humidité (%)"), "royalblue", "rgba(65,105,225,0.2)")
+            
+            for date in selected_date_range[1:]:
+                midnight = pd.Timestamp(date).replace(hour=0, minute=0)
+                fig_hum.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
+            return fig_hum
         
-        for date in selected_date_range[1:]:
-            midnight = pd.Timestamp(date).replace(hour=0, minute=0)
-            fig_hum.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
+        fig_hum = cached_figure("hourly_hum", data_key, hourly_selection, build_hourly_hum)
         
-        col1.plotly_chart(fig_hum, use_container_width=True)
+        show_chart(fig_hum, col1)
         
-        fig_wind = px.line(filtered_hourly, 
-                        x="Date et Heure", 
-                        y="Vitesse du vent (km/h)", 
-                        color="Ville",
-                        title=f"Évolution du vent")
+        def build_hourly_wind():
+            fig_wind = hourly_figure(filtered_hourly, "Vitesse du vent (km/h)", f"Évolution du vent",
+                                     selection_envelope("Vitesse du vent (km/h)"))
+            
+            for date in selected_date_range[1:]:
+                midnight = pd.Timestamp(date).replace(hour=0, minute=0)
+                fig_wind.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
+            return fig_wind
         
-        for date in selected_date_range[1:]:
-            midnight = pd.Timestamp(date).replace(hour=0, minute=0)
-            fig_wind.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
+        fig_wind = cached_figure("hourly_wind", data_key, hourly_selection, build_hourly_wind)
         
-        col2.plotly_chart(fig_wind, use_container_width=True)
+        show_chart(fig_wind, col2)
         
         col1, col2 = st.columns(2)
         
         if len(selected_cities) == 1 and selected_cities[0] != "Toutes les communes":
-            city_data = filtered_hourly[filtered_hourly["Ville"] == selected_cities[0]]
+            city_data = filtered_hourly
             
             # Rose des vents
             if "Direction du vent (°)" in city_data.columns and not city_data["Direction du vent (°)"].isna().all():
-                wind_dir_bins = [0, 22.5, 45, 67.5, 90, 112.5, 135, 157.5, 180, 202.5, 225, 247.5, 270, 292.5, 315, 337.5, 360]
-                wind_dir_labels = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW", "N"]
+                def build_windrose():
+                    wind_dir_bins = [0, 22.5, 45, 67.5, 90, 112.5, 135, 157.5, 180, 202.5, 225, 247.5, 270, 292.5, 315, 337.5, 360]
+                    wind_dir_labels = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW", "N"]
+                    
+                    city_data_copy = city_data.copy()
+                    city_data_copy["Direction"] = pd.cut(city_data_copy["Direction du vent (°)"], bins=wind_dir_bins, labels=wind_dir_labels[:-1])
+                    dir_counts = city_data_copy.groupby("Direction")["Vitesse du vent (km/h)"].mean().reset_index()
+                    
+                    fig_windrose = px.bar_polar(dir_counts, 
+                                            r="Vitesse du vent (km/h)", 
+                                            theta="Direction",
+                                            title=f"Rose des vents - {selected_cities[0]}")
+                    return fig_windrose
                 
-                city_data_copy = city_data.copy()
-                city_data_copy["Direction"] = pd.cut(city_data_copy["Direction du vent (°)"], bins=wind_dir_bins, labels=wind_dir_labels[:-1])
-                dir_counts = city_data_copy.groupby("Direction")["Vitesse du vent (km/h)"].mean().reset_index()
+                fig_windrose = cached_figure("windrose", data_key, hourly_selection, build_windrose)
                 
-                fig_windrose = px.bar_polar(dir_counts, 
-                                        r="Vitesse du vent (km/h)", 
-                                        theta="Direction",
-                                        title=f"Rose des vents - {selected_cities[0]}")
-                
-                col1.plotly_chart(fig_windrose, use_container_width=True)
+                show_chart(fig_windrose, col1)
             else:
                 col1.warning("Données de direction du vent non disponibles pour cette ville.")
             
             # Couverture nuageuse
             if "Couverture nuageuse (%)" in city_data.columns and not city_data["Couverture nuageuse (%)"].isna().all():
-                fig_clouds = go.Figure()
-                fig_clouds.add_trace(go.Scatter(
-                    x=city_data["Date et Heure"],
-                    y=city_data["Couverture nuageuse (%)"],
-                    mode='lines+markers',
-                    name='Couverture nuageuse',
-                    fill='tozeroy'
-                ))
+                def build_clouds():
+                    fig_clouds = go.Figure()
+                    fig_clouds.add_trace(go.Scatter(
+                        x=city_data["Date et Heure"],
+                        y=city_data["Couverture nuageuse (%)"],
+                        mode='lines+markers',
+                        name='Couverture nuageuse',
+                        fill='tozeroy'
+                    ))
+                    
+                    for date in selected_date_range[1:]:
+                        midnight = pd.Timestamp(date).replace(hour=0, minute=0)
+                        fig_clouds.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
+                    
+                    fig_clouds.update_layout(title=f"Couverture nuageuse - {selected_cities[0]}")
+                    return fig_clouds
                 
-                for date in selected_date_range[1:]:
-                    midnight = pd.Timestamp(date).replace(hour=0, minute=0)
-                    fig_clouds.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
-                
-                fig_clouds.update_layout(title=f"Couverture nuageuse - {selected_cities[0]}")
-                col2.plotly_chart(fig_clouds, use_container_width=True)
+                fig_clouds = cached_figure("clouds", data_key, hourly_selection, build_clouds)
+                show_chart(fig_clouds, col2)
             else:
                 col2.warning("Données de couverture nuageuse non disponibles pour cette ville.")
         elif "Toutes les communes" in selected_cities:
             col1.subheader("Statistiques de vent moyennes")
             
-            hourly_avg = filtered_hourly.groupby("Date et Heure")["Vitesse du vent (km/h)"].agg(["mean", "min", "max"]).reset_index()
+            hourly_avg = hourly_range(derived.wind_stats, selected_date_range)
             
-            fig_wind_stats = go.Figure()
-            fig_wind_stats.add_trace(go.Scatter(
-                x=hourly_avg["Date et Heure"],
-                y=hourly_avg["mean"],
-                mode='lines',
-                name='Moyenne',
-                line=dict(color='green')
-            ))
+            def build_wind_stats():
+                fig_wind_stats = envelope_figure(hourly_avg)
+                
+                for date in selected_date_range[1:]:
+                    midnight = pd.Timestamp(date).replace(hour=0, minute=0)
+                    fig_wind_stats.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
+                return fig_wind_stats
             
-            fig_wind_stats.add_trace(go.Scatter(
-                x=hourly_avg["Date et Heure"],
-                y=hourly_avg["max"],
-                mode='lines',
-                name='Maximum',
-                line=dict(width=0),
-                showlegend=False
-            ))
+            fig_wind_stats = cached_figure("wind_stats", data_key, (tuple(selected_date_range),), build_wind_stats)
             
-            fig_wind_stats.add_trace(go.Scatter(
-                x=hourly_avg["Date et Heure"],
-                y=hourly_avg["min"],
-                mode='lines',
-                name='Minimum',
-                fill='tonexty',
-                fillcolor='rgba(0,128,0,0.2)',
-                line=dict(width=0),
-                showlegend=False
-            ))
-            
-            for date in selected_date_range[1:]:
-                midnight = pd.Timestamp(date).replace(hour=0, minute=0)
-                fig_wind_stats.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
+            show_chart(fig_wind_stats, col1)
             
-            col1.plotly_chart(fig_wind_stats, use_container_width=True)
+            cloud_avg = hourly_range(derived.cloud_mean, selected_date_range)
             
-            if "Couverture nuageuse (%)" in filtered_hourly.columns and not filtered_hourly["Couverture nuageuse (%)"].isna().all():
+            if cloud_avg["Couverture nuageuse (%)"].notna().any():
                 col2.subheader("Couverture nuageuse moyenne")
                 
-                cloud_avg = filtered_hourly.groupby("Date et Heure")["Couverture nuageuse (%)"].mean().reset_index()
+                def build_cloud_avg():
+                    fig_cloud_avg = go.Figure()
+                    fig_cloud_avg.add_trace(go.Scatter(
+                        x=cloud_avg["Date et Heure"],
+                        y=cloud_avg["Couverture nuageuse (%)"],
+                        mode='lines',
+                        fill='tozeroy',
+                        name='Couverture nuageuse moyenne'
+                    ))
+                    
+                    for date in selected_date_range[1:]:
+                        midnight = pd.Timestamp(date).replace(hour=0, minute=0)
+                        fig_cloud_avg.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
+                    return fig_cloud_avg
                 
-                fig_cloud_avg = go.Figure()
-                fig_cloud_avg.add_trace(go.Scatter(
-                    x=cloud_avg["Date et Heure"],
-                    y=cloud_avg["Couverture nuageuse (%)"],
-                    mode='lines',
-                    fill='tozeroy',
-                    name='Couverture nuageuse moyenne'
-                ))
+                fig_cloud_avg = cached_figure("cloud_avg", data_key, (tuple(selected_date_range),), build_cloud_avg)
                 
-                for date in selected_date_range[1:]:
-                    midnight = pd.Timestamp(date).replace(hour=0, minute=0)
-                    fig_cloud_avg.add_vline(x=midnight, line_width=1, line_dash="dash", line_color="gray")
-                
-                col2.plotly_chart(fig_cloud_avg, use_container_width=True)
+                show_chart(fig_cloud_avg, col2)
             else:
                 col2.warning("Données de couverture nuageuse non disponibles.")
     else:
         st.warning("Aucune donnée disponible pour la sélection actuelle.")
 
-    # ===================== PRÉVISIONS À 16 JOURS =====================
+# ===================== PRÉVISIONS À 16 JOURS =====================
+@st.fragment
+@metrics.timed("section", section="long_term")
+def long_term_section(forecast_index, derived, data_key):
+    import plotly.graph_objects as go
     st.header("📅 Prévisions sur 16 jours")
+    
+    departement_forecast = derived.departement_forecast
 
-    available_cities_long = sorted(df_long_term["Ville"].unique())
+    available_cities_long = forecast_index.communes
     city_options_long = ["Toutes les communes"] + available_cities_long
     city_forecast = st.selectbox("Commune pour les prévisions", city_options_long)
 
@@ -696,100 +857,456 @@ if df_long_term is not None and df_hourly is not None:
         city_long_term = departement_forecast
         title_suffix = "Moyenne départementale"
     else:
-        city_long_term = df_long_term[df_long_term["Ville"] == city_forecast]
+        city_long_term = forecast_index.daily_commune(city_forecast)
         title_suffix = city_forecast
 
     tab1, tab2, tab3 = st.tabs(["Températures", "Précipitations", "Vent"])
 
     with tab1:
-        fig_forecast_temp = go.Figure()
-        
-        fig_forecast_temp.add_trace(go.Scatter(
-            x=city_long_term["Date"],
-            y=city_long_term["Température Max (°C)"],
-            mode='lines+markers',
-            name='Température Max',
-            line=dict(color='red')
-        ))
-        
-        fig_forecast_temp.add_trace(go.Scatter(
-            x=city_long_term["Date"],
-            y=city_long_term["Température Min (°C)"],
-            mode='lines+markers',
-            name='Température Min',
-            line=dict(color='blue')
-        ))
+        def build_forecast_temp():
+            fig_forecast_temp = go.Figure()
+            
+            fig_forecast_temp.add_trace(go.Scatter(
+                x=city_long_term["Date"],
+                y=city_long_term["Température Max (°C)"],
+                mode='lines+markers',
+                name='Température Max',
+                line=dict(color='red')
+            ))
+            
+            fig_forecast_temp.add_trace(go.Scatter(
+                x=city_long_term["Date"],
+                y=city_long_term["Température Min (°C)"],
+                mode='lines+markers',
+                name='Température Min',
+                line=dict(color='blue')
+            ))
+            
+            fig_forecast_temp.update_layout(
+                title=f"Prévisions de températures - {title_suffix}",
+                xaxis_title="Date",
+                yaxis_title="Température (°C)",
+                hovermode="x unified"
+            )
+            return fig_forecast_temp
         
-        fig_forecast_temp.update_layout(
-            title=f"Prévisions de températures - {title_suffix}",
-            xaxis_title="Date",
-            yaxis_title="Température (°C)",
-            hovermode="x unified"
-        )
+        fig_forecast_temp = cached_figure("forecast_temp", data_key, (city_forecast,), build_forecast_temp)
         
-        st.plotly_chart(fig_forecast_temp, use_container_width=True)
+        show_chart(fig_forecast_temp)
 
     with tab2:
-        fig_forecast_precip = go.Figure()
-        
-        fig_forecast_precip.add_trace(go.Bar(
-            x=city_long_term["Date"],
-            y=city_long_term["Précipitations (mm)"],
-            name='Précipitations',
-            marker_color='royalblue'
-        ))
+        def build_forecast_precip():
+            fig_forecast_precip = go.Figure()
+            
+            fig_forecast_precip.add_trace(go.Bar(
+                x=city_long_term["Date"],
+                y=city_long_term["Précipitations (mm)"],
+                name='Précipitations',
+                marker_color='royalblue'
+            ))
+            
+            fig_forecast_precip.add_trace(go.Scatter(
+                x=city_long_term["Date"],
+                y=city_long_term["Probabilité de Précipitations (%)"],
+                mode='lines+markers',
+                name='Probabilité de précipitations',
+                marker=dict(color='darkblue'),
+                yaxis="y2"
+            ))
+            
+            fig_forecast_precip.update_layout(
+                title=f"Prévisions de précipitations - {title_suffix}",
+                xaxis_title="Date",
+                yaxis_title="Précipitations (mm)",
+                yaxis2=dict(
+                    title="Probabilité (%)",
+                    overlaying="y",
+                    side="right",
+                    range=[0, 100]
+                ),
+                hovermode="x unified"
+            )
+            return fig_forecast_precip
         
-        fig_forecast_precip.add_trace(go.Scatter(
-            x=city_long_term["Date"],
-            y=city_long_term["Probabilité de Précipitations (%)"],
-            mode='lines+markers',
-            name='Probabilité de précipitations',
-            marker=dict(color='darkblue'),
-            yaxis="y2"
-        ))
+        fig_forecast_precip = cached_figure("forecast_precip", data_key, (city_forecast,), build_forecast_precip)
         
-        fig_forecast_precip.update_layout(
-            title=f"Prévisions de précipitations - {title_suffix}",
-            xaxis_title="Date",
-            yaxis_title="Précipitations (mm)",
-            yaxis2=dict(
-                title="Probabilité (%)",
-                overlaying="y",
-                side="right",
-                range=[0, 100]
-            ),
-            hovermode="x unified"
-        )
-        
-        st.plotly_chart(fig_forecast_precip, use_container_width=True)
+        show_chart(fig_forecast_precip)
 
     with tab3:
-        fig_forecast_wind = go.Figure()
+        def build_forecast_wind():
+            fig_forecast_wind = go.Figure()
+            
+            fig_forecast_wind.add_trace(go.Bar(
+                x=city_long_term["Date"],
+                y=city_long_term["Vitesse du vent Max (km/h)"],
+                name='Vitesse du vent Max',
+                marker_color='green'
+            ))
+            
+            fig_forecast_wind.add_trace(go.Scatter(
+                x=city_long_term["Date"],
+                y=city_long_term["Rafales Max (km/h)"],
+                mode='lines+markers',
+                name='Rafales Max',
+                marker=dict(color='darkgreen')
+            ))
+            
+            fig_forecast_wind.update_layout(
+                title=f"Prévisions de vent - {title_suffix}",
+                xaxis_title="Date",
+                yaxis_title="Vitesse (km/h)",
+                hovermode="x unified"
+            )
+            return fig_forecast_wind
         
-        fig_forecast_wind.add_trace(go.Bar(
-            x=city_long_term["Date"],
-            y=city_long_term["Vitesse du vent Max (km/h)"],
-            name='Vitesse du vent Max',
-            marker_color='green'
-        ))
+        fig_forecast_wind = cached_figure("forecast_wind", data_key, (city_forecast,), build_forecast_wind)
+        
+        show_chart(fig_forecast_wind)
+
+# ===================== COMPARAISON DES MODÈLES =====================
+# écarts entre modèles, calculés une fois par chargement et par variable
+@st.cache_resource(max_entries=4 * len(COMPARISON_COLUMNS))
+def load_model_spread(all_version, column, _df_all_hourly):
+    return model_spread(_df_all_hourly, column)
+
+@st.cache_resource(max_entries=4)
+def load_spread_summary(all_version, _df_all_hourly):
+    return spread_summary(_df_all_hourly)
+
+@st.fragment
+@metrics.timed("section", section="comparison")
+def comparison_section(df_all_hourly, data_key):
+    import plotly.express as px
+    loaded_models = [name for name in MODELS if name in set(df_all_hourly[MODEL_COLUMN].unique())]
+    if len(loaded_models) < 2:
+        return
+    
+    st.header("⚖️ Comparaison des modèles")
+    
+    compared_column = st.selectbox("Variable comparée", COMPARISON_COLUMNS)
+    spread = load_model_spread(data_key[1], compared_column, df_all_hourly)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        def build_models_mean():
+            fig = px.line(spread, 
+                          x=spread.index, 
+                          y=[name for name in loaded_models if name in spread.columns],
+                          render_mode="webgl",
+                          title=f"{compared_column} - moyenne départementale par modèle")
+            fig.update_layout(xaxis_title="Date et Heure", yaxis_title=compared_column, legend_title="Modèle")
+            return fig
+        
+        fig_models = cached_figure("models_mean", data_key, (compared_column,), build_models_mean)
+        show_chart(fig_models)
+    
+    with col2:
+        def build_models_spread():
+            fig = px.line(spread, 
+                          x=spread.index, 
+                          y=["Écart (max - min)", "Désaccord moyen"],
+                          render_mode="webgl",
+                          title=f"Désaccord entre modèles - {compared_column}")
+            fig.update_layout(xaxis_title="Date et Heure", yaxis_title="Écart", legend_title="")
+            return fig
         
-        fig_forecast_wind.add_trace(go.Scatter(
-            x=city_long_term["Date"],
-            y=city_long_term["Rafales Max (km/h)"],
-            mode='lines+markers',
-            name='Rafales Max',
-            marker=dict(color='darkgreen')
+        fig_spread = cached_figure("models_spread", data_key, (compared_column,), build_models_spread)
+        show_chart(fig_spread)
+    
+    st.caption("Écart (max - min) : entre les moyennes départementales des modèles. "
+               "Désaccord moyen : écart-type entre modèles, commune par commune, moyenné sur le département. "
+               "Les écarts ne sont calculés qu'aux heures couvertes par au moins deux modèles.")
+    
+    st.subheader("Écart entre modèles par variable")
+    st.dataframe(load_spread_summary(data_key[1], df_all_hourly), use_container_width=True)
+
+# ===================== PRÉVISIONS D'ENSEMBLE =====================
+# tableau membre × maille × heure × variable, gardé tel quel en mémoire
+# (cache_resource : pas de copie à chaque exécution)
+@st.cache_resource(ttl=RECHECK_INTERVAL, max_entries=len(ENSEMBLE_MODELS))
+def load_ensemble_data(model_name):
+    progress_bar = st.progress(0)
+    
+    def on_progress(done, total, cells):
+        progress_bar.progress(done / total)
+    
+    def on_error(cells, error):
+        st.warning(f"Erreur pour {len(cells)} point(s) de grille de l'ensemble {model_name}: {error}")
+    
+    ensemble = load_ensemble(model_name, on_progress=on_progress, on_error=on_error)
+    progress_bar.empty()
+    return ensemble
+
+@st.fragment
+@metrics.timed("section", section="ensemble")
+def ensemble_section():
+    st.header("🎲 Prévisions d'ensemble")
+    
+    if not st.toggle("Afficher les prévisions d'ensemble (incertitude)"):
+        st.caption("Les prévisions d'ensemble (plusieurs dizaines de membres par modèle) sont chargées à la demande.")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        ensemble_model = st.selectbox("Modèle d'ensemble", list(ENSEMBLE_MODELS))
+    with col2:
+        ensemble_label = st.selectbox("Variable", list(ENSEMBLE_COLUMNS.values()))
+    
+    try:
+        with st.spinner("Chargement des prévisions d'ensemble..."):
+            ensemble = load_ensemble_data(ensemble_model)
+    except Exception as e:
+        st.error(f"Impossible de charger les prévisions d'ensemble : {e}")
+        return
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
+    with col3:
+        ensemble_city = st.selectbox("Commune", ["Toutes les communes"] + sorted(ensemble.communes))
+    commune = None if ensemble_city == "Toutes les communes" else ensemble_city
+    variable = next(key for key, label in ENSEMBLE_COLUMNS.items() if label == ensemble_label)
+    ensemble_key = ("Ensemble", ensemble_model, ensemble.fetched_at)
+    
+    def build_ensemble_bands():
+        bands = ensemble.percentile_frame(variable, commune)
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=bands["Date et Heure"],
+            y=bands["P90"],
+            mode='lines',
+            name='P90',
+            line=dict(width=0),
+            showlegend=False
+        ))
+        fig.add_trace(go.Scatter(
+            x=bands["Date et Heure"],
+            y=bands["P10"],
+            mode='lines',
+            name='P10 - P90',
+            fill='tonexty',
+            fillcolor='rgba(65,105,225,0.2)',
+            line=dict(width=0)
         ))
+        fig.add_trace(go.Scatter(
+            x=bands["Date et Heure"],
+            y=bands["P50"],
+            mode='lines',
+            name='Médiane',
+            line=dict(color='royalblue')
+        ))
+        title_suffix = commune or "Moyenne départementale"
+        fig.update_layout(title=f"{ensemble_label} - {ensemble.members} membres - {title_suffix}",
+                          xaxis_title="Date et Heure", yaxis_title=ensemble_label, hovermode="x unified")
+        return fig
+    
+    fig_bands = cached_figure("ensemble_bands", ensemble_key, (variable, ensemble_city), build_ensemble_bands)
+    show_chart(fig_bands)
+    
+    if "wind_gusts_10m" in ensemble.variables:
+        def build_ensemble_exceedance():
+            probabilities = ensemble.exceedance_frame("wind_gusts_10m", list(WIND_THRESHOLDS.values()), commune)
+            probabilities = probabilities.rename(columns={
+                value: f"{label} (> {value} km/h)" for label, value in WIND_THRESHOLDS.items()
+            })
+            fig = px.line(probabilities, 
+                          x="Date et Heure", 
+                          y=[column for column in probabilities.columns if column != "Date et Heure"],
+                          title=f"Probabilité de rafales au-dessus des seuils - {commune or 'au moins une commune'}")
+            fig.update_layout(yaxis_title="Probabilité (%)", yaxis_range=[0, 100], legend_title="")
+            return fig
         
-        fig_forecast_wind.update_layout(
-            title=f"Prévisions de vent - {title_suffix}",
-            xaxis_title="Date",
-            yaxis_title="Vitesse (km/h)",
-            hovermode="x unified"
-        )
+        fig_exceedance = cached_figure("ensemble_exceedance", ensemble_key, (ensemble_city,), build_ensemble_exceedance)
+        show_chart(fig_exceedance)
+
+# ===================== VÉRIFICATION DES MODÈLES =====================
+# sommes d'écarts mises à jour au plus une fois par heure (nouvelles dates seulement)
+VERIFICATION_MAX_PASSES = 12
+
+@st.cache_data(ttl=3600)
+def load_verification_sums():
+    engine = VerificationEngine(get_archive())
+    
+    def on_error(communes, error):
+        st.warning(f"Observations indisponibles pour {len(communes)} commune(s): {error}")
+    
+    for _ in range(VERIFICATION_MAX_PASSES):
+        if not engine.update(on_error=on_error):
+            break
+    return engine.sums()
+
+@st.fragment
+@metrics.timed("section", section="verification")
+def verification_section():
+    st.header("🎯 Vérification des modèles")
+    
+    if get_archive() is None:
+        st.caption("La vérification s'appuie sur l'archive des prévisions (METEO_ARCHIVE_DIR), désactivée ici.")
+        return
+    if not st.toggle("Afficher les scores des modèles (prévisions archivées comparées aux observations)"):
+        return
+    
+    try:
+        with st.spinner("Mise à jour des scores..."):
+            sums = load_verification_sums()
+    except Exception as e:
+        st.error(f"Impossible de calculer les scores : {e}")
+        return
+    if sums.empty:
+        st.info("Pas encore de prévision archivée dont les observations sont publiées.")
+        return
+    import plotly.express as px
+    
+    verified_column = st.selectbox("Variable vérifiée", [column for column in VERIFIED_COLUMNS
+                                                         if column in set(sums[VARIABLE_COLUMN])])
+    sums = sums[(sums[VARIABLE_COLUMN] == verified_column).to_numpy()]
+    verification_key = ("Vérification", len(sums), int(sums["n"].sum()))
+    
+    tab1, tab2, tab3 = st.tabs(["Par modèle", "Par échéance", "Par commune"])
+    
+    with tab1:
+        by_model = scores_from_sums(sums, (MODEL_COLUMN,))
         
-        st.plotly_chart(fig_forecast_wind, use_container_width=True)
-            
+        def build_verification_models():
+            fig = px.bar(by_model.melt(id_vars=MODEL_COLUMN, value_vars=["MAE", "RMSE", "Biais"], var_name="Score"),
+                         x=MODEL_COLUMN, y="value", color="Score", barmode="group",
+                         title=f"Scores par modèle - {verified_column}")
+            fig.update_layout(yaxis_title="Écart", xaxis_title="Modèle")
+            return fig
+        
+        fig = cached_figure("verification_models", verification_key, (verified_column,), build_verification_models)
+        show_chart(fig)
+        st.dataframe(by_model.round(2), use_container_width=True, hide_index=True)
+    
+    with tab2:
+        by_lead = scores_from_sums(sums, (MODEL_COLUMN, LEAD_COLUMN))
+        
+        def build_verification_leads():
+            fig = px.line(by_lead, x=LEAD_COLUMN, y="MAE", color=MODEL_COLUMN, markers=True,
+                          title=f"Erreur absolue moyenne selon l'échéance - {verified_column}")
+            fig.update_layout(yaxis_title="MAE", xaxis_title="Échéance (jours)")
+            return fig
+        
+        fig = cached_figure("verification_leads", verification_key, (verified_column,), build_verification_leads)
+        show_chart(fig)
+    
+    with tab3:
+        by_commune = scores_from_sums(sums, ("Ville", MODEL_COLUMN)).pivot(index="Ville", columns=MODEL_COLUMN, values="MAE")
+        st.caption("Erreur absolue moyenne par commune et par modèle")
+        st.dataframe(by_commune.round(2), use_container_width=True)
+
+# ===================== ADMINISTRATION =====================
+# panneau masqué : ?admin=<METEO_ADMIN_TOKEN> dans l'URL, désactivé sans jeton
+ADMIN_TOKEN = os.environ.get("METEO_ADMIN_TOKEN", "")
+METRIC_LABELS = ["stage", "model", "section", "chart", "outcome", "result"]
+
+def metrics_table(rows, values):
+    table = pd.DataFrame(rows)
+    labels = [column for column in METRIC_LABELS if column in table]
+    return table[labels + values].fillna("") if len(table) else table
+
+def admin_panel():
+    if not ADMIN_TOKEN or st.query_params.get("admin") != ADMIN_TOKEN:
+        return
+    with st.sidebar.expander("🛠️ Administration", expanded=True):
+        if not metrics.registry.enabled:
+            st.caption("Mesures désactivées (METEO_METRICS=0).")
+            return
+        histograms = metrics.registry.histograms()
+        values = ["n", "total (s)", "moyenne (s)", "p50 (s)", "p95 (s)"]
+        st.caption("Durée des étapes (processus, toutes sessions)")
+        st.dataframe(metrics_table([row for row in histograms if row["nom"] == "stage_seconds"], values),
+                     use_container_width=True, hide_index=True)
+        st.caption("Latence de l'API par modèle")
+        st.dataframe(metrics_table([row for row in histograms if row["nom"] == "api_request_seconds"], values),
+                     use_container_width=True, hide_index=True)
+        st.caption("Compteurs (caches, requêtes)")
+        counters = metrics.registry.counters()
+        table = metrics_table(counters, ["valeur"])
+        if len(table):
+            table.insert(0, "nom", [row["nom"] for row in counters])
+        st.dataframe(table, use_container_width=True, hide_index=True)
+        st.caption("Requêtes API")
+        st.dataframe(pd.Series(fetch_metrics(), name="Valeur"), use_container_width=True)
+        forecast_cache = get_cache()
+        if forecast_cache is not None:
+            cache_stats = forecast_cache.stats()
+            st.caption(f"Cache disque : {cache_stats['entries']} entrées, {cache_stats['bytes'] / 1e6:.1f} Mo")
+        figure_stats = get_figure_cache().stats()
+        st.caption(f"Cache des figures : {figure_stats['entries']} figures, {figure_stats['bytes'] / 1e6:.1f} Mo")
+        st.download_button("Exporter (format Prometheus)", metrics.registry.prometheus_text(),
+                           file_name="meteo.prom", mime="text/plain")
+        if st.button("Remettre les mesures à zéro"):
+            metrics.registry.reset()
+            st.rerun()
+
+# interface user
+st.title("📊 Visualisation Météo Deux-Sèvres")
+
+# onglet pour choisir modele
+selected_model = st.sidebar.selectbox("Modèle météorologique", list(MODELS.keys()))
+
+# Bouton d'actualisation
+if st.sidebar.button("🔄 Rafraîchir les données"):
+    forecast_cache = get_cache()
+    if forecast_cache is not None:
+        forecast_cache.invalidate(MODELS[selected_model])
+    st.cache_data.clear()
+    api_data_slot.clear()
+    st.rerun()
+
+# Affichage de l'heure de last MAJ
+st.sidebar.info(f"💡 Les données sont mises en cache jusqu'à la publication du prochain run du modèle.")
+if GRID_DEDUP:
+    st.sidebar.caption("⚠️ Mode maille (METEO_GRID_DEDUP) : les communes proches partagent les prévisions "
+                       "de la commune la plus peuplée de leur maille ; valeurs approchées pour les autres.")
+
+
+# Chargement des données de tous les modèles : magasin préchargé en priorité,
+# API en direct sinon. Le modèle sélectionné n'est qu'une sélection de lignes.
+forecast_store = get_store() if DATA_SOURCE != "api" else None
+store_versions = tuple(
+    (model_name, version) for model_name in MODELS
+    if (version := forecast_store.version(model_name)) is not None
+) if forecast_store is not None else ()
+if selected_model in dict(store_versions):
+    df_all_long_term, df_all_hourly, all_version = load_all_data_from_store(store_versions)
+elif DATA_SOURCE == "store":
+    st.error("Aucune donnée préchargée pour ce modèle. Lancer le worker : `python -m meteo_data.prefetch`.")
+    st.stop()
+else:
+    df_all_long_term, df_all_hourly, all_version, load_incidents = load_all_data_from_api(
+        tuple(run_key(model_name) for model_name in MODELS))
+    show_load_incidents(load_incidents)
+
+df_long_term = df_hourly = None
+if selected_model in set(df_all_long_term[MODEL_COLUMN].unique()):
+    df_long_term, df_hourly, data_version = load_model_frames(selected_model, all_version, df_all_long_term, df_all_hourly)
+
+displayed_run = df_long_term[RUN_COLUMN].max() if df_long_term is not None else pd.NaT
+if pd.notna(displayed_run):
+    st.sidebar.caption(f"Run {selected_model} affiché : {displayed_run:%d/%m/%Y %H:%M} UTC")
+
+if df_long_term is not None and df_hourly is not None:
+    st.success(f"✅ Données chargées : {len(df_long_term)} prévisions journalières et {len(df_hourly)} prévisions horaires")
+    
+    forecast_index = load_forecast_index(selected_model, data_version, df_long_term, df_hourly)
+    derived = load_derived_tables(selected_model, data_version, df_long_term, df_hourly)
+    
+    # situation du jour (date, chiffres clés, carte) puis vues sur toute la période
+    data_key = (selected_model, data_version)
+    daily_section(forecast_index, derived, data_key)
+    departement_section(derived, data_key)
+    hourly_section(forecast_index, derived, data_key)
+    long_term_section(forecast_index, derived, data_key)
+    comparison_section(df_all_hourly, ("Comparaison", all_version))
+    ensemble_section()
+    verification_section()
+
 else:
 
     st.error("Impossible de charger les données depuis l'API Open-Meteo.")
+
+metrics.observe("stage_seconds", time.perf_counter() - page_started, stage="page")
+admin_panel()
+metrics.write_textfile()
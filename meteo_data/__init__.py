@@ -0,0 +1,20 @@
+"""Couche données de l'application météo Deux-Sèvres (récupération Open-Meteo)."""
+
+from meteo_data.cache import ForecastCache, get_cache
+from meteo_data.communes import COMMUNES_DEUX_SEVRES, load_communes
+from meteo_data.fetch import RateLimiter, fetch_many, fetch_metrics, get_session
+from meteo_data.loader import load_forecasts
+from meteo_data.models import MODELS
+
+__all__ = [
+    "COMMUNES_DEUX_SEVRES",
+    "ForecastCache",
+    "MODELS",
+    "RateLimiter",
+    "fetch_many",
+    "fetch_metrics",
+    "get_cache",
+    "get_session",
+    "load_communes",
+    "load_forecasts",
+]
@@ -0,0 +1,289 @@
+"""Archive des prévisions : Parquet partitionné par modèle et par date prévue.
+
+Chaque chargement normalisé y est ajouté (sans jamais réécrire l'existant),
+avec le run du modèle et l'heure d'archivage. Une commune déjà archivée pour
+un run n'est pas réécrite : l'archive grossit d'un run par modèle, pas d'un
+chargement, et un chargement ultérieur complète les communes qui manquaient.
+
+Arborescence::
+
+    <METEO_ARCHIVE_DIR>/hourly/model=AROME/date=2026-10-17/part-<ms>-<pid>.parquet
+    <METEO_ARCHIVE_DIR>/daily/model=AROME/date=2026-10-17/...
+    <METEO_ARCHIVE_DIR>/runs/AROME.jsonl
+
+Les requêtes ne listent que les partitions couvrant la période demandée, ne
+lisent que les colonnes utiles et poussent les filtres (période, communes) au
+lecteur Parquet. Les partitions d'une date passée, qui ne recevront plus de
+prévision, sont regroupées en un seul fichier.
+"""
+
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from meteo_data.cache import CACHE_DIR
+from meteo_data.forecast import RUN_COLUMN
+from meteo_data.models import MODELS
+from meteo_data.singleflight import get_single_flight
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.environ.get("METEO_ARCHIVE_DIR", os.path.join(CACHE_DIR, "archive") if CACHE_DIR else "")
+
+# heure d'archivage de chaque ligne
+FETCHED_COLUMN = "Archivé le"
+MODEL_COLUMN = "Modèle"
+TIME_COLUMNS = {"daily": "Date", "hourly": "Date et Heure"}
+
+
+def _to_table(df, fetched_at):
+    """Schéma stable d'un fichier à l'autre : chaînes, ``float32``, horodatages à la seconde."""
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column == "Ville":
+            columns[column] = pa.array(values.astype(str).to_numpy(), type=pa.string())
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            columns[column] = pa.array(values.to_numpy().astype("datetime64[s]"), type=pa.timestamp("s"))
+        else:
+            columns[column] = pa.array(pd.to_numeric(values, errors="coerce").to_numpy(dtype="float32"),
+                                       type=pa.float32())
+    columns[FETCHED_COLUMN] = pa.array(np.full(len(df), np.datetime64(int(fetched_at), "s")), type=pa.timestamp("s"))
+    return pa.table(columns)
+
+
+def _new_communes(frames, archived):
+    """Communes pas encore archivées, par run (horodatage ISO)."""
+    new = {}
+    for df in frames:
+        pairs = df.loc[df[RUN_COLUMN].notna().to_numpy(), [RUN_COLUMN, "Ville"]].drop_duplicates()
+        for run, ville in zip(pairs[RUN_COLUMN], pairs["Ville"].astype(str)):
+            label = pd.Timestamp(run).isoformat()
+            known = archived.get(label, set())
+            if known is not None and ville not in known:
+                new.setdefault(label, set()).add(ville)
+    return new
+
+
+def _write_table(table, directory, name):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+    return path
+
+
+class ForecastArchive:
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "runs"), exist_ok=True)
+        self._flight = get_single_flight(directory)
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _partition_dir(self, kind, model_name, date):
+        return os.path.join(self.directory, kind, f"model={model_name}", f"date={date}")
+
+    def _runs_path(self, model_name):
+        return os.path.join(self.directory, "runs", f"{model_name}.jsonl")
+
+    def archived_runs(self, model_name):
+        """Communes déjà archivées par run (horodatage ISO) ; ``None`` : toutes."""
+        path = self._runs_path(model_name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            cached = self._runs.get(model_name)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        runs = {}
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                # entrée sans liste de communes (format antérieur) : run complet
+                if entry.get("communes") is None or runs.get(entry["run_time"], set()) is None:
+                    runs[entry["run_time"]] = None
+                else:
+                    runs.setdefault(entry["run_time"], set()).update(entry["communes"])
+        with self._lock:
+            self._runs[model_name] = (mtime, runs)
+        return runs
+
+    def append(self, model_name, df_long_term, df_hourly, fetched_at=None):
+        """Ajoute les lignes des communes pas encore archivées pour leur run ; renvoie leur nombre.
+
+        Les lignes sans run connu ne sont pas archivées.
+        """
+        frames = (df_long_term, df_hourly)
+        if not _new_communes(frames, self.archived_runs(model_name)):
+            return 0
+
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        written = 0
+        # un seul écrivain par modèle, entre threads et entre processus
+        with self._flight.hold(f"archive|{model_name}"):
+            new = _new_communes(frames, self.archived_runs(model_name))
+            for kind, df in zip(("daily", "hourly"), frames):
+                villes = df["Ville"].astype(str)
+                keep = np.zeros(len(df), dtype=bool)
+                for run, communes in new.items():
+                    keep |= (df[RUN_COLUMN].eq(pd.Timestamp(run)) & villes.isin(communes)).to_numpy()
+                df = df[keep]
+                if df.empty:
+                    continue
+                time_column = TIME_COLUMNS[kind]
+                dates = df[time_column].dt.strftime("%Y-%m-%d")
+                for date, part in df.groupby(dates.to_numpy(), sort=True):
+                    part = part.sort_values(["Ville", time_column], kind="stable")
+                    _write_table(_to_table(part, fetched_at), self._partition_dir(kind, model_name, date),
+                                 f"part-{int(fetched_at * 1000)}-{os.getpid()}.parquet")
+                    written += len(part)
+            if new:
+                with open(self._runs_path(model_name), "a", encoding="utf-8") as fh:
+                    for run in sorted(new):
+                        fh.write(json.dumps({"run_time": run, "fetched_at": fetched_at,
+                                             "communes": sorted(new[run])}, ensure_ascii=False) + "\n")
+            self.compact(model_name)
+        return written
+
+    def compact(self, model_name, before=None):
+        """Regroupe en un fichier chaque partition antérieure à ``before`` (aujourd'hui)."""
+        before = (before or datetime.date.today()).isoformat()
+        for kind, time_column in TIME_COLUMNS.items():
+            model_dir = os.path.join(self.directory, kind, f"model={model_name}")
+            if not os.path.isdir(model_dir):
+                continue
+            for partition in os.listdir(model_dir):
+                if not partition.startswith("date=") or partition[5:] >= before:
+                    continue
+                directory = os.path.join(model_dir, partition)
+                files = sorted(name for name in os.listdir(directory) if name.endswith(".parquet"))
+                if len(files) < 2:
+                    continue
+                table = pa.concat_tables(
+                    [pq.read_table(os.path.join(directory, name)) for name in files], promote_options="default"
+                ).sort_by([("Ville", "ascending"), (time_column, "ascending"), (RUN_COLUMN, "ascending")])
+                # le fichier regroupé est publié avant la suppression des morceaux
+                _write_table(table, directory, f"compact-{int(time.time() * 1000)}.parquet")
+                for name in files:
+                    os.remove(os.path.join(directory, name))
+
+    def dates(self, kind="hourly", models=None):
+        """Dates prévues présentes dans l'archive (``YYYY-MM-DD``), triées."""
+        dates = set()
+        for model_name in list(MODELS) if models is None else models:
+            model_dir = os.path.join(self.directory, kind, f"model={model_name}")
+            if os.path.isdir(model_dir):
+                dates.update(name[5:] for name in os.listdir(model_dir) if name.startswith("date="))
+        return sorted(dates)
+
+    def _files(self, kind, model_names, start, end):
+        """Fichiers des partitions couvrant ``[start, end]``, sans lister toute l'archive."""
+        files = []
+        for model_name in model_names:
+            model_dir = os.path.join(self.directory, kind, f"model={model_name}")
+            if start is not None and end is not None:
+                days = pd.date_range(start.normalize(), end.normalize(), freq="D").strftime("%Y-%m-%d")
+                partitions = [f"date={day}" for day in days]
+            elif os.path.isdir(model_dir):
+                partitions = [name for name in os.listdir(model_dir) if name.startswith("date=")]
+                if start is not None:
+                    partitions = [name for name in partitions if name[5:] >= start.strftime("%Y-%m-%d")]
+                if end is not None:
+                    partitions = [name for name in partitions if name[5:] <= end.strftime("%Y-%m-%d")]
+            else:
+                partitions = []
+            for partition in partitions:
+                directory = os.path.join(model_dir, partition)
+                try:
+                    names = os.listdir(directory)
+                except FileNotFoundError:
+                    continue
+                files.extend((model_name, os.path.join(directory, name))
+                             for name in sorted(names) if name.endswith(".parquet"))
+        return files
+
+    def query(self, kind="hourly", start=None, end=None, models=None, communes=None, variables=None,
+              runs=None):
+        """Prévisions archivées sur ``[start, end]`` (dates prévues, bornes incluses).
+
+        ``models``, ``communes``, ``variables`` (colonnes de mesures) et ``runs``
+        restreignent la lecture ; seules les partitions et colonnes utiles sont
+        lues. Renvoie un DataFrame avec ``MODEL_COLUMN``, ``Ville``, la colonne
+        de temps, ``RUN_COLUMN``, ``FETCHED_COLUMN`` et les mesures.
+        """
+        time_column = TIME_COLUMNS[kind]
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        model_names = list(MODELS) if models is None else list(models)
+
+        predicate = None
+        if start is not None:
+            predicate = pc.field(time_column) >= pa.scalar(start.to_pydatetime(), pa.timestamp("s"))
+        if end is not None:
+            bound = pc.field(time_column) <= pa.scalar(end.to_pydatetime(), pa.timestamp("s"))
+            predicate = bound if predicate is None else predicate & bound
+        if communes is not None:
+            bound = pc.field("Ville").isin(list(communes))
+            predicate = bound if predicate is None else predicate & bound
+        if runs is not None:
+            values = pa.array([pd.Timestamp(run).to_pydatetime() for run in runs], pa.timestamp("s"))
+            bound = pc.field(RUN_COLUMN).isin(values)
+            predicate = bound if predicate is None else predicate & bound
+
+        for attempt in range(2):
+            files = self._files(kind, model_names, start, end)
+            try:
+                frames = []
+                for model_name in model_names:
+                    paths = [path for name, path in files if name == model_name]
+                    if not paths:
+                        continue
+                    dataset = ds.dataset(paths, format="parquet")
+                    columns = None
+                    if variables is not None:
+                        columns = [column for column in ["Ville", time_column, RUN_COLUMN, FETCHED_COLUMN,
+                                                         *variables] if column in dataset.schema.names]
+                    table = dataset.to_table(columns=columns, filter=predicate)
+                    frame = table.to_pandas()
+                    frame.insert(0, MODEL_COLUMN, model_name)
+                    frames.append(frame)
+                break
+            except FileNotFoundError:
+                # partition regroupée pendant la lecture : on relit la liste des fichiers
+                if attempt:
+                    raise
+        if not frames:
+            return pd.DataFrame(columns=[MODEL_COLUMN, "Ville", time_column, RUN_COLUMN, FETCHED_COLUMN])
+        result = pd.concat(frames, ignore_index=True)
+        result[MODEL_COLUMN] = pd.Categorical(result[MODEL_COLUMN], categories=list(MODELS))
+        result["Ville"] = result["Ville"].astype("category")
+        return result
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Archive partagée du processus, ou ``None`` si ``METEO_ARCHIVE_DIR`` est vide."""
+    global _archive
+    with _archive_lock:
+        if _archive is None and ARCHIVE_DIR:
+            _archive = ForecastArchive()
+    return _archive
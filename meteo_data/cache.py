@@ -0,0 +1,199 @@
+"""Cache persistant des réponses Open-Meteo, partagé entre processus.
+
+Une base SQLite (mode WAL) dans un répertoire local conserve la réponse JSON
+compressée de chaque commune, indexée par modèle, commune et jeu de variables.
+Elle survit aux redémarrages et aux déploiements, et tous les processus de la
+machine la lisent. Chaque entrée retient le run du modèle dont elle provient
+et son instant d'expiration (par défaut ``ttl`` secondes, en pratique la
+publication attendue du run suivant) ; au-delà de ``max_bytes``, les entrées
+les moins récemment lues sont évincées.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from meteo_data import fastjson
+
+CACHE_DIR = os.environ.get(
+    "METEO_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "meteo-deux-sevres")
+)
+CACHE_TTL = int(os.environ.get("METEO_CACHE_TTL", "3600"))
+# durée de conservation d'une entrée expirée, pour revalidation
+CACHE_STALE_RETENTION = 24 * 3600
+CACHE_MAX_BYTES = int(float(os.environ.get("METEO_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    commune TEXT NOT NULL,
+    variables TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    run_time REAL
+);
+CREATE INDEX IF NOT EXISTS forecasts_model ON forecasts (model);
+CREATE INDEX IF NOT EXISTS forecasts_last_access ON forecasts (last_access);
+"""
+
+
+# réponse en cache, run d'origine (epoch ou None) et expiration (epoch)
+CacheEntry = namedtuple("CacheEntry", ["data", "run_time", "expires_at"])
+
+
+def variables_signature(daily, hourly, forecast_days):
+    return f"daily={','.join(daily)}|hourly={','.join(hourly)}|days={forecast_days}"
+
+
+def _commune_id(ville):
+    return f"{ville['nom']}@{ville['lat']:.4f},{ville['lon']:.4f}"
+
+
+def _entry_key(model_key, ville, signature):
+    raw = f"{model_key}|{_commune_id(ville)}|{signature}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ForecastCache:
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES,
+                 stale_retention=CACHE_STALE_RETENTION):
+        self.directory = directory
+        self.ttl = ttl
+        self.stale_retention = stale_retention
+        self.max_bytes = max_bytes
+        self.path = os.path.join(directory, "forecasts.sqlite")
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(forecasts)")}
+            if "run_time" not in columns:
+                conn.execute("ALTER TABLE forecasts ADD COLUMN run_time REAL")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get_many(self, model_key, communes, signature, include_expired=False):
+        """Entrées ``CacheEntry`` indexées par position dans ``communes``.
+
+        Avec ``include_expired``, les entrées expirées (pas encore évincées)
+        sont aussi renvoyées, pour être revalidées plutôt que retéléchargées.
+        """
+        now = time.time()
+        keys = [_entry_key(model_key, ville, signature) for ville in communes]
+        found = {}
+        min_expiry = float("-inf") if include_expired else now
+        conn = self._connect()
+        try:
+            with conn:
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, payload, run_time, expires_at FROM forecasts WHERE expires_at > ? "
+                        f"AND key IN ({','.join('?' * len(batch))})",
+                        [min_expiry, *batch],
+                    ).fetchall()
+                    found.update((row[0], row[1:]) for row in rows)
+                    conn.execute(
+                        f"UPDATE forecasts SET last_access = ? WHERE key IN ({','.join('?' * len(batch))})",
+                        [now, *batch],
+                    )
+        finally:
+            conn.close()
+        entries = {}
+        for position, key in enumerate(keys):
+            if key in found:
+                payload, run_time, expires_at = found[key]
+                entries[position] = CacheEntry(fastjson.loads(zlib.decompress(payload)), run_time, expires_at)
+        return entries
+
+    def put_many(self, model_key, items, signature, expires_at=None, run_time=None):
+        """Enregistre des paires ``(commune, réponse)`` puis applique l'éviction."""
+        now = time.time()
+        expires_at = now + self.ttl if expires_at is None else expires_at
+        rows = []
+        for ville, data in items:
+            # niveau 1 : 2 à 3 fois plus rapide que le défaut, taux de compression proche
+            payload = zlib.compress(fastjson.dumps(data), 1)
+            rows.append((
+                _entry_key(model_key, ville, signature), model_key, _commune_id(ville), signature,
+                now, expires_at, now, len(payload), payload, run_time,
+            ))
+        if not rows:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._evict(conn, now)
+        finally:
+            conn.close()
+
+    def touch(self, model_key, communes, signature, expires_at):
+        """Prolonge des entrées dont l'amont n'a pas changé."""
+        keys = [(expires_at, _entry_key(model_key, ville, signature)) for ville in communes]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("UPDATE forecasts SET expires_at = ? WHERE key = ?", keys)
+        finally:
+            conn.close()
+
+    def _evict(self, conn, now):
+        with conn:
+            # les entrées expirées restent revalidables un temps avant suppression
+            conn.execute("DELETE FROM forecasts WHERE expires_at <= ?", (now - self.stale_retention,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM forecasts").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # éviction LRU jusqu'à repasser sous la limite
+            excess = total - self.max_bytes
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM forecasts ORDER BY last_access"):
+                victims.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM forecasts WHERE key = ?", victims)
+
+    def invalidate(self, model_key=None):
+        conn = self._connect()
+        try:
+            with conn:
+                if model_key is None:
+                    conn.execute("DELETE FROM forecasts")
+                else:
+                    conn.execute("DELETE FROM forecasts WHERE model = ?", (model_key,))
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM forecasts").fetchone()
+        finally:
+            conn.close()
+        return {"entries": count, "bytes": size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Cache partagé du processus, ou ``None`` si ``METEO_CACHE_DIR`` est vide."""
+    global _cache
+    with _cache_lock:
+        if _cache is None and CACHE_DIR:
+            _cache = ForecastCache()
+    return _cache
@@ -0,0 +1,91 @@
+"""Registre des communes suivies.
+
+Le registre est lu depuis un fichier CSV ou GeoJSON local (code INSEE, nom,
+département, région, coordonnées, population), puis filtré par département
+et région. Par défaut : les communes des Deux-Sèvres fournies avec le paquet.
+"""
+
+import json
+import os
+from collections import Counter
+
+import pandas as pd
+
+REGISTRY_FILE = os.environ.get(
+    "METEO_COMMUNES_FILE", os.path.join(os.path.dirname(__file__), "communes.csv")
+)
+DEPARTEMENTS = [code.strip() for code in os.environ.get("METEO_DEPARTEMENTS", "79").split(",") if code.strip()]
+REGIONS = [nom.strip() for nom in os.environ.get("METEO_REGIONS", "").split(",") if nom.strip()]
+
+REGISTRY_COLUMNS = ["code_insee", "nom", "departement", "region", "lat", "lon", "population"]
+
+
+def _read_geojson(path):
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    rows = []
+    for feature in features:
+        props = feature.get("properties") or {}
+        lon, lat = feature["geometry"]["coordinates"][:2]
+        rows.append({
+            "code_insee": props.get("code_insee", props.get("code")),
+            "nom": props["nom"],
+            "departement": props.get("departement", props.get("codeDepartement")),
+            "region": props.get("region"),
+            "lat": lat,
+            "lon": lon,
+            "population": props.get("population"),
+        })
+    return pd.DataFrame(rows, columns=REGISTRY_COLUMNS)
+
+
+def read_registry(path=None):
+    """Registre complet sous forme de DataFrame (CSV ou GeoJSON selon l'extension)."""
+    path = REGISTRY_FILE if path is None else path
+    if path.lower().endswith((".geojson", ".json")):
+        table = _read_geojson(path)
+    else:
+        table = pd.read_csv(path, dtype={"code_insee": "string", "departement": "string", "region": "string"})
+    table = table.reindex(columns=REGISTRY_COLUMNS)
+    table["code_insee"] = table["code_insee"].astype("string")
+    table["departement"] = table["departement"].astype("string")
+    table["region"] = table["region"].astype("string")
+    table["population"] = pd.to_numeric(table["population"], errors="coerce")
+    return table
+
+
+def load_communes(path=None, departements=None, regions=None, min_population=None):
+    """Communes du registre (dicts ``nom``/``lat``/``lon``…), filtrées.
+
+    Les homonymes sont distingués par leur département : ``"Nom (79)"``,
+    le nom servant de clé dans les caches et les tableaux.
+    """
+    table = read_registry(path)
+    if departements:
+        table = table[table["departement"].isin([str(code) for code in departements])]
+    if regions:
+        table = table[table["region"].isin(list(regions))]
+    if min_population is not None:
+        table = table[table["population"] >= min_population]
+    communes = []
+    for row in table.itertuples(index=False):
+        communes.append({
+            "nom": row.nom,
+            "lat": float(row.lat),
+            "lon": float(row.lon),
+            "code_insee": None if pd.isna(row.code_insee) else row.code_insee,
+            "departement": None if pd.isna(row.departement) else row.departement,
+            "region": None if pd.isna(row.region) else row.region,
+            "population": None if pd.isna(row.population) else int(row.population),
+        })
+    # homonymes dans un même département : on retombe sur le code INSEE
+    for suffix in ("departement", "code_insee"):
+        homonymes = {nom for nom, count in Counter(ville["nom"] for ville in communes).items() if count > 1}
+        for ville in communes:
+            if ville["nom"] in homonymes and ville[suffix]:
+                ville["nom"] = f"{ville['nom']} ({ville[suffix]})"
+    return communes
+
+
+# communes suivies (METEO_DEPARTEMENTS / METEO_REGIONS)
+COMMUNES_DEUX_SEVRES = load_communes(departements=DEPARTEMENTS, regions=REGIONS)
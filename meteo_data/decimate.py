@@ -0,0 +1,85 @@
+"""Décimation des séries horaires avant envoi au navigateur.
+
+Largest-Triangle-Three-Buckets (LTTB) réduit les séries d'un graphique pour
+qu'il tienne dans un budget de points adapté à sa largeur, partagé entre ses
+séries, en conservant leur forme ; le minimum et le maximum de chaque série
+sont toujours conservés.
+"""
+
+import os
+
+import numpy as np
+
+# points envoyés au navigateur par graphique, toutes séries confondues
+# (~ 2 points par pixel d'un graphique pleine largeur)
+MAX_POINTS_PER_CHART = int(os.environ.get("METEO_CHART_MAX_POINTS", "2000"))
+# en deçà, une série ne montre plus sa forme : le budget est alors dépassé
+MIN_POINTS_PER_SERIES = 24
+
+
+def series_max_points(series_count, chart_points=MAX_POINTS_PER_CHART):
+    """Points par série pour que ``series_count`` séries tiennent dans ``chart_points``."""
+    return max(MIN_POINTS_PER_SERIES, chart_points // max(series_count, 1))
+
+
+def lttb_indices(x, y, threshold):
+    """Positions retenues par LTTB parmi les points ``(x, y)`` (sans NaN), triées."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # premier et dernier points fixes, n - 2 points répartis en threshold - 2 paquets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # moyenne du paquet suivant (ou dernier point) comme troisième sommet
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def decimate_indices(x, y, max_points=MAX_POINTS_PER_CHART):
+    """Positions à garder d'une série : LTTB + extrêmes, NaN exclus si décimée."""
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) == 0:
+        return valid
+    keep = valid[lttb_indices(np.asarray(x)[valid], y[valid], max_points)]
+    extrema = valid[[int(np.argmin(y[valid])), int(np.argmax(y[valid]))]]
+    return np.union1d(keep, extrema)
+
+
+def decimate_frame(df, x, y, by, max_points=None):
+    """Décime chaque série ``y(x)`` de ``df`` (une série par valeur de ``by``).
+
+    ``max_points`` : points par série, par défaut ``series_max_points`` du
+    nombre de séries.
+    """
+    if df.empty:
+        return df
+    x_values = df[x].to_numpy()
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        x_values = x_values.astype("datetime64[ns]").astype(np.int64)
+    y_values = df[y].to_numpy(dtype=np.float64, na_value=np.nan)
+    groups = df.groupby(by, observed=True, sort=False).indices
+    max_points = series_max_points(len(groups)) if max_points is None else max_points
+    parts = []
+    for positions in groups.values():
+        parts.append(positions[decimate_indices(x_values[positions], y_values[positions], max_points)])
+    return df.take(np.sort(np.concatenate(parts)))
@@ -0,0 +1,126 @@
+"""Tables dérivées des prévisions, calculées une fois par chargement.
+
+Moyennes départementales, chiffres clés de chaque date, catégories de
+précipitations, tableau de la heatmap et agrégats horaires toutes communes :
+l'interface les réutilise à chaque interaction au lieu de relancer les
+``groupby`` correspondants.
+"""
+
+import pandas as pd
+
+DEPARTEMENT_COLUMNS = [
+    "Température Max (°C)",
+    "Température Min (°C)",
+    "Précipitations (mm)",
+    "Probabilité de Précipitations (%)",
+    "Vitesse du vent Max (km/h)",
+    "Rafales Max (km/h)",
+    "Indice UV Max",
+]
+
+# chiffres clés : colonne -> extrême retenu
+KEY_FIGURES = {
+    "Température Max (°C)": "max",
+    "Température Min (°C)": "min",
+    "Rafales Max (km/h)": "max",
+    "Indice UV Max": "max",
+    "Précipitations (mm)": "max",
+    "Probabilité de Précipitations (%)": "max",
+}
+
+PRECIPITATION_BINS = [-0.1, 0.2, 1, 5, 10, 100]
+PRECIPITATION_LABELS = ["Sec", "Bruine", "Léger", "Modéré", "Fort"]
+
+# variables horaires dont l'enveloppe toutes communes est précalculée
+ENVELOPE_COLUMNS = ["Température (°C)", "Humidité (%)", "Vitesse du vent (km/h)"]
+
+
+def departement_forecast(df_long_term):
+    """Moyennes départementales par date, arrondies au dixième."""
+    # dataframe pour les moyennes par date
+    forecast = df_long_term.groupby("Date")[DEPARTEMENT_COLUMNS].mean().reset_index()
+    # float64 pour l'affichage des valeurs arrondies
+    forecast[DEPARTEMENT_COLUMNS] = (
+        forecast[DEPARTEMENT_COLUMNS].apply(pd.to_numeric, errors="coerce").astype("float64").round(1)
+    )
+    return forecast
+
+
+def key_figure_commune_column(column):
+    return f"{column} (commune)"
+
+
+def _clock_times(times):
+    """Heures HH:MM d'une série datetime64 (ou de chaînes ISO des anciens magasins)."""
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, format="%Y-%m-%dT%H:%M")
+    return times.dt.strftime("%H:%M")
+
+
+def key_figures(df_long_term):
+    """Chiffres clés de toutes les dates en une passe.
+
+    Pour chaque colonne de ``KEY_FIGURES`` : valeur extrême et commune où elle
+    est atteinte (première commune en cas d'égalité). S'y ajoutent la durée
+    moyenne du jour (h) et le lever/coucher du soleil de la première commune.
+    Indexé par date ; valeurs manquantes à NaN.
+    """
+    dates = pd.Index(df_long_term["Date"].drop_duplicates().sort_values(), name="Date")
+    figures = pd.DataFrame(index=dates)
+    for column, extreme in KEY_FIGURES.items():
+        values = df_long_term[["Date", "Ville", column]].dropna(subset=[column])
+        # tri stable : à valeur égale, l'ordre des communes est conservé
+        best = values.sort_values(["Date", column], ascending=[True, extreme == "min"], kind="stable")
+        best = best.drop_duplicates("Date").set_index("Date")
+        figures[column] = best[column].astype("float64")
+        figures[key_figure_commune_column(column)] = best["Ville"].astype(object)
+
+    figures["Durée moyenne du jour (h)"] = (
+        df_long_term.groupby("Date")["Durée du jour (secondes)"].mean().astype("float64") / 3600
+    )
+    first_rows = df_long_term.drop_duplicates("Date").set_index("Date")
+    figures["Lever du soleil"] = _clock_times(first_rows["Lever du soleil"])
+    figures["Coucher du soleil"] = _clock_times(first_rows["Coucher du soleil"])
+    return figures
+
+
+def precipitation_category_counts(forecast):
+    """Nombre de jours par catégorie de précipitations."""
+    categories = pd.cut(forecast["Précipitations (mm)"], bins=PRECIPITATION_BINS, labels=PRECIPITATION_LABELS)
+    return categories.value_counts().sort_index()
+
+
+def heatmap_table(forecast):
+    heatmap_data = forecast.copy()
+    heatmap_data["Date_str"] = heatmap_data["Date"].dt.strftime("%d/%m")
+    heatmap_data["Température moyenne"] = (heatmap_data["Température Max (°C)"] + heatmap_data["Température Min (°C)"]) / 2
+    return heatmap_data
+
+
+def hourly_cloud_mean(df_hourly):
+    """Couverture nuageuse moyenne toutes communes, par heure."""
+    return df_hourly.groupby("Date et Heure")["Couverture nuageuse (%)"].mean().reset_index()
+
+
+def hourly_envelope(df_hourly, column):
+    """Moyenne/min/max d'une variable horaire sur les communes présentes, par heure."""
+    return df_hourly.groupby("Date et Heure")[column].agg(["mean", "min", "max"]).reset_index()
+
+
+def hourly_range(table, dates):
+    """Lignes d'une table horaire triée couvrant les ``dates`` (consécutives)."""
+    times = table["Date et Heure"]
+    start = times.searchsorted(pd.Timestamp(dates[0]), side="left")
+    end = times.searchsorted(pd.Timestamp(dates[-1]) + pd.Timedelta(days=1), side="left")
+    return table.iloc[start:end]
+
+
+class DerivedTables:
+    def __init__(self, df_long_term, df_hourly):
+        self.departement_forecast = departement_forecast(df_long_term)
+        self.key_figures = key_figures(df_long_term)
+        self.precipitation_counts = precipitation_category_counts(self.departement_forecast)
+        self.heatmap = heatmap_table(self.departement_forecast)
+        self.envelopes = {column: hourly_envelope(df_hourly, column) for column in ENVELOPE_COLUMNS}
+        self.wind_stats = self.envelopes["Vitesse du vent (km/h)"]
+        self.cloud_mean = hourly_cloud_mean(df_hourly)
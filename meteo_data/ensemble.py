@@ -0,0 +1,203 @@
+"""Prévisions d'ensemble Open-Meteo : tableau dense et bandes de percentiles.
+
+Les membres de l'ensemble ne sont pas convertis en DataFrames : les réponses
+sont recopiées, au fil de leur arrivée, dans un tableau ``float32`` préalloué
+de forme (membre, maille, heure, variable). Les communes d'une même maille du
+modèle partagent la même série (voir ``resolve_grid_cells``), le tableau est
+donc dimensionné sur les mailles et les communes n'en sont qu'un index.
+
+Ordre de grandeur : 51 membres × 250 mailles × 384 heures × 3 variables en
+``float32`` occupent 59 Mo ; percentiles et probabilités de dépassement sont
+calculés variable par variable, sans copie du tableau entier.
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from meteo_data import metrics
+from meteo_data.communes import COMMUNES_DEUX_SEVRES
+from meteo_data.fetch import chunk_communes, fetch_many
+from meteo_data.forecast import HOUR, split_locations, time_axis
+from meteo_data.grid import resolve_grid_cells
+from meteo_data.models import ENSEMBLE_GRID_RESOLUTIONS, ENSEMBLE_MODELS
+
+ENSEMBLE_API_URL = os.environ.get("METEO_ENSEMBLE_API_URL", "https://ensemble-api.open-meteo.com/v1/ensemble")
+ENSEMBLE_FORECAST_DAYS = 16
+
+# une réponse pèse ~0,5 Mo par point : paquets plus petits qu'en déterministe
+ENSEMBLE_BATCH_SIZE = int(os.environ.get("METEO_ENSEMBLE_BATCH_SIZE", "10"))
+
+# variable API -> colonne affichée
+ENSEMBLE_COLUMNS = {
+    "temperature_2m": "Température (°C)",
+    "wind_gusts_10m": "Rafales (km/h)",
+    "precipitation": "Précipitations (mm)",
+}
+ENSEMBLE_VARIABLES = tuple(ENSEMBLE_COLUMNS)
+
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+
+def build_ensemble_url(communes, model_key, hourly, forecast_days):
+    latitudes = ",".join(str(ville["lat"]) for ville in communes)
+    longitudes = ",".join(str(ville["lon"]) for ville in communes)
+    return (
+        f"{ENSEMBLE_API_URL}?latitude={latitudes}&longitude={longitudes}&models={model_key}"
+        f"&hourly={','.join(hourly)}&timezone=Europe/Paris&forecast_days={forecast_days}"
+    )
+
+
+def member_keys(hourly, variable):
+    """Clés des membres d'une variable : contrôle puis ``<variable>_memberNN``."""
+    members = sorted(key for key in hourly if key.startswith(f"{variable}_member"))
+    return ([variable] if variable in hourly else []) + members
+
+
+def member_percentiles(values, q):
+    """Percentiles sur l'axe 0 (membres), NaN ignorés, avec un seul tri.
+
+    Interpolation linéaire, comme ``np.nanpercentile``, mais sans boucle sur
+    les séries : les rangs sont calculés pour toutes les séries à la fois.
+    """
+    ordered = np.sort(values, axis=0)  # les NaN sont rangés en fin d'axe
+    valid = np.count_nonzero(~np.isnan(values), axis=0)
+    q = np.asarray(q, dtype=np.float64).reshape((-1,) + (1,) * (values.ndim - 1))
+    rank = q / 100 * np.maximum(valid - 1, 0)
+    lower = np.floor(rank).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(valid - 1, 0))
+    low = np.take_along_axis(ordered, lower, axis=0)
+    high = np.take_along_axis(ordered, upper, axis=0)
+    result = low + (high - low) * (rank - lower)
+    return np.where(valid > 0, result, np.nan).astype(values.dtype)
+
+
+def exceedance_probability(values, thresholds):
+    """Part des membres (axe 0) au-dessus de chaque seuil, NaN exclus."""
+    valid = np.count_nonzero(~np.isnan(values), axis=0)
+    counts = np.stack([np.count_nonzero(values > threshold, axis=0) for threshold in thresholds])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(valid > 0, counts / valid, np.nan).astype(np.float32)
+
+
+class EnsembleForecast:
+    """Prévisions d'ensemble d'un modèle : ``values[membre, maille, heure, variable]``."""
+
+    def __init__(self, model_name, communes, cell_of, times, values, variables=ENSEMBLE_VARIABLES,
+                 fetched_at=None):
+        self.model_name = model_name
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self.communes = [ville["nom"] for ville in communes]
+        self.cell_of = np.asarray(cell_of, dtype=np.intp)
+        self.times = times
+        self.values = values
+        self.variables = list(variables)
+        self._commune_positions = {nom: position for position, nom in enumerate(self.communes)}
+        # poids de chaque maille dans la moyenne départementale (nombre de communes)
+        self._weights = np.bincount(self.cell_of, minlength=values.shape[1]).astype(np.float32)
+
+    @property
+    def members(self):
+        return self.values.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def _series(self, variable, commune=None):
+        """Membres × heures pour une commune, ou pour la moyenne départementale."""
+        values = self.values[:, :, :, self.variables.index(variable)]
+        if commune is not None:
+            return values[:, self.cell_of[self._commune_positions[commune]], :]
+        weights = np.where(np.isnan(values), 0, self._weights[None, :, None])
+        with np.errstate(invalid="ignore"):
+            return np.nansum(values * weights, axis=1) / weights.sum(axis=1)
+
+    def percentile_frame(self, variable, commune=None, q=DEFAULT_PERCENTILES):
+        """Bandes de percentiles d'une commune ou de la moyenne départementale."""
+        bands = member_percentiles(self._series(variable, commune), q)
+        frame = pd.DataFrame({"Date et Heure": self.times})
+        for percentile, band in zip(q, bands):
+            frame[f"P{percentile}"] = band
+        return frame
+
+    def exceedance_frame(self, variable, thresholds, commune=None):
+        """Probabilité (%) de dépasser chaque seuil dans une commune.
+
+        Sans commune : probabilité qu'au moins une commune dépasse le seuil.
+        """
+        values = self.values[:, :, :, self.variables.index(variable)]
+        if commune is not None:
+            series = values[:, self.cell_of[self._commune_positions[commune]], :]
+        else:
+            # maximum sur les mailles, NaN ignorés : au moins une commune au-dessus
+            series = np.fmax.reduce(values, axis=1)
+        probabilities = exceedance_probability(series, thresholds)
+        frame = pd.DataFrame({"Date et Heure": self.times})
+        for threshold, probability in zip(thresholds, probabilities):
+            frame[threshold] = (probability * 100).round(0)
+        return frame
+
+
+@metrics.timed("ensemble")
+def load_ensemble(model_name="ICON_EU", communes=None, forecast_days=ENSEMBLE_FORECAST_DAYS,
+                  variables=ENSEMBLE_VARIABLES, on_progress=None, on_error=None):
+    """Télécharge l'ensemble d'un modèle dans un ``EnsembleForecast``.
+
+    Une requête par paquet de mailles ; chaque réponse est recopiée dans le
+    tableau puis libérée. ``on_progress(terminées, total, mailles)`` et
+    ``on_error(mailles, erreur)`` sont appelés dans le thread appelant ; une
+    maille dont des séries n'ont pas la longueur de l'axe des temps est
+    signalée à ``on_error`` (ces membres restent à NaN).
+    """
+    model_key = ENSEMBLE_MODELS[model_name]
+    communes = COMMUNES_DEUX_SEVRES if communes is None else communes
+    cells, cell_of = resolve_grid_cells(model_name, communes, ENSEMBLE_GRID_RESOLUTIONS[model_name])
+    chunks = chunk_communes(cells, ENSEMBLE_BATCH_SIZE)
+    starts = np.concatenate([[0], np.cumsum([len(chunk) for chunk in chunks])[:-1]]).astype(int)
+    urls = [build_ensemble_url(chunk, model_key, variables, forecast_days) for chunk in chunks]
+
+    values = times = None
+    done = 0
+    for index, data, error in fetch_many(urls, model=model_name):
+        chunk = chunks[index]
+        done += len(chunk)
+        if on_progress is not None:
+            on_progress(done, len(cells), chunk)
+        if error is None:
+            try:
+                data = split_locations(data, len(chunk))
+            except Exception as e:
+                error = e
+        if error is not None:
+            if on_error is not None:
+                on_error(chunk, error)
+            continue
+
+        for offset, result in enumerate(data):
+            hourly = result["hourly"]
+            if values is None:
+                # dimensions connues à la première réponse : allocation unique
+                times = time_axis(hourly["time"], HOUR)
+                members = max(len(member_keys(hourly, variable)) for variable in variables)
+                values = np.full((members, len(cells), len(times), len(variables)), np.nan, dtype=np.float32)
+            cell = starts[index] + offset
+            truncated = []
+            for v, variable in enumerate(variables):
+                for member, key in enumerate(member_keys(hourly, variable)[:values.shape[0]]):
+                    # liste JSON recopiée directement dans le tableau, sans tableau intermédiaire
+                    if len(hourly[key]) == len(times):
+                        values[member, cell, :, v] = hourly[key]
+                    else:
+                        truncated.append(key)
+            if truncated and on_error is not None:
+                on_error([chunk[offset]], ValueError(
+                    f"{len(truncated)} série(s) de longueur différente de l'axe des temps "
+                    f"({len(times)} heures) : {', '.join(truncated[:3])}{'…' if len(truncated) > 3 else ''}"
+                ))
+
+    if values is None:
+        raise RuntimeError(f"Aucune prévision d'ensemble reçue pour {model_name}")
+    return EnsembleForecast(model_name, communes, cell_of, times, values, variables)
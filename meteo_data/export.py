@@ -0,0 +1,124 @@
+"""Export des prévisions en Parquet ou CSV, sans Streamlit ni Plotly.
+
+    python -m meteo_data.export --output exports/
+    python -m meteo_data.export --models AROME GFS --format csv --tables journalier departement
+    python -m meteo_data.export --source store --output /srv/meteo/exports
+
+Les modèles sont lus dans le magasin préchargé quand il les contient
+(``--source auto``), téléchargés sinon (cache disque compris). Un fichier par
+table, tous modèles confondus (colonne ``Modèle``) : ``journalier``,
+``horaire`` et ``departement`` (moyennes départementales par date).
+"""
+
+import argparse
+import logging
+import os
+
+import pandas as pd
+
+from meteo_data.derived import departement_forecast
+from meteo_data.models import MODELS
+from meteo_data.multimodel import MODEL_COLUMN, combine_models, load_all_models, model_slice
+from meteo_data.store import DATA_SOURCE, get_store
+
+logger = logging.getLogger("meteo_data.export")
+
+TABLES = ("journalier", "horaire", "departement")
+FORMATS = ("parquet", "csv")
+
+
+def load_models(model_names=None, source=DATA_SOURCE, on_error=None):
+    """``({modèle: df_long_term}, {modèle: df_hourly})``, magasin d'abord puis API.
+
+    ``source`` : ``auto``, ``store`` (magasin uniquement) ou ``api``.
+    """
+    model_names = list(MODELS) if model_names is None else list(model_names)
+    store = get_store() if source != "api" else None
+    daily, hourly = {}, {}
+    for model_name in model_names:
+        if store is not None:
+            daily[model_name], hourly[model_name] = store.read(model_name)
+    missing = [model_name for model_name in model_names if daily.get(model_name) is None]
+    if missing and source != "store":
+        df_long_term, df_hourly = load_all_models(missing, on_error=on_error)
+        loaded = set(df_long_term[MODEL_COLUMN].unique())
+        for model_name in missing:
+            if model_name in loaded:
+                daily[model_name] = model_slice(df_long_term, model_name)
+                hourly[model_name] = model_slice(df_hourly, model_name)
+    # ordre des modèles demandés, sans ceux restés indisponibles
+    available = [model_name for model_name in model_names if daily.get(model_name) is not None]
+    return ({model_name: daily[model_name] for model_name in available},
+            {model_name: hourly[model_name] for model_name in available})
+
+
+def departement_table(daily):
+    """Moyennes départementales par date de chaque modèle, en un DataFrame."""
+    parts = []
+    for model_name, df_long_term in daily.items():
+        forecast = departement_forecast(df_long_term)
+        forecast.insert(0, MODEL_COLUMN, model_name)
+        parts.append(forecast)
+    if not parts:
+        return pd.DataFrame(columns=[MODEL_COLUMN])
+    return pd.concat(parts, ignore_index=True)
+
+
+def build_tables(daily, hourly, tables=TABLES):
+    """``{table: DataFrame}`` pour les tables demandées."""
+    builders = {
+        "journalier": lambda: combine_models(daily),
+        "horaire": lambda: combine_models(hourly),
+        "departement": lambda: departement_table(daily),
+    }
+    return {table: builders[table]() for table in tables}
+
+
+def write_table(df, path, fmt):
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def export_forecasts(output, model_names=None, tables=TABLES, fmt="parquet", source=DATA_SOURCE, on_error=None):
+    """Écrit ``<output>/<table>.<format>`` pour chaque table ; renvoie les chemins écrits."""
+    daily, hourly = load_models(model_names, source, on_error)
+    if not daily:
+        return []
+    os.makedirs(output, exist_ok=True)
+    paths = []
+    for table, df in build_tables(daily, hourly, tables).items():
+        path = os.path.join(output, f"{table}.{fmt}")
+        write_table(df, path, fmt)
+        logger.info("%s : %d lignes (%s)", path, len(df), ", ".join(daily))
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporte les prévisions Open-Meteo en Parquet ou CSV.")
+    parser.add_argument("--output", default="exports", help="répertoire de sortie")
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--tables", nargs="+", choices=TABLES, default=list(TABLES))
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--source", choices=("auto", "store", "api"), default=DATA_SOURCE,
+                        help="magasin préchargé, API, ou magasin puis API (auto)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    def on_error(model_name, communes, error):
+        logger.warning("%s : %d commune(s) indisponible(s) : %s", model_name, len(communes), error)
+
+    paths = export_forecasts(args.output, args.models, args.tables, args.format, args.source, on_error)
+    if not paths:
+        logger.error("Aucune prévision disponible pour %s", ", ".join(args.models))
+        return 1
+    for path in paths:
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
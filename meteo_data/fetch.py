@@ -0,0 +1,277 @@
+"""Moteur de récupération concurrente des prévisions Open-Meteo.
+
+Les requêtes partent d'un pool de threads partageant une même session HTTP
+(connexions réutilisées) ; un seau à jetons global limite le débit à la place
+de l'ancien ``time.sleep`` entre deux communes.
+
+Les échecs transitoires (délai dépassé, connexion coupée, 429, 5xx) sont
+retentés avec un délai exponentiel aléatoire (« full jitter ») ; un 429 suspend
+tous les départs pendant la durée annoncée par ``Retry-After``. Le résultat de
+chaque tentative est compté dans ``fetch_metrics()``.
+
+En mode groupé, plusieurs communes partagent une même requête : l'API accepte
+des listes ``latitude``/``longitude`` séparées par des virgules et renvoie un
+tableau de résultats, dans l'ordre des coordonnées.
+"""
+
+import email.utils
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from meteo_data import fastjson, metrics
+
+# nombre de requêtes simultanées et débit maximal autorisé vers l'API
+MAX_WORKERS = int(os.environ.get("METEO_MAX_WORKERS", "8"))
+MAX_REQUESTS_PER_SECOND = float(os.environ.get("METEO_MAX_RPS", "10"))
+# requêtes pouvant partir d'un coup après une période calme
+RATE_BURST = float(os.environ.get("METEO_RATE_BURST", "5"))
+REQUEST_TIMEOUT = 10
+
+# nouvelles tentatives après un échec transitoire, délai de base et plafond (s)
+MAX_RETRIES = int(os.environ.get("METEO_MAX_RETRIES", "3"))
+RETRY_BACKOFF = float(os.environ.get("METEO_RETRY_BACKOFF", "0.5"))
+MAX_RETRY_DELAY = float(os.environ.get("METEO_MAX_RETRY_DELAY", "30"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# remplaçable par un serveur de test (voir benchmarks/mockapi.py)
+API_URL = os.environ.get("METEO_API_URL", "https://api.open-meteo.com/v1/forecast")
+
+# mode groupé : plusieurs communes par requête, dans les limites de l'API
+BATCH_REQUESTS = os.environ.get("METEO_FETCH_MODE", "batch") == "batch"
+MAX_LOCATIONS_PER_REQUEST = int(os.environ.get("METEO_BATCH_SIZE", "100"))
+MAX_URL_LENGTH = 8000
+
+
+class RateLimiter:
+    """Seau à jetons global, partagé entre les threads.
+
+    Le seau se remplit de ``rate`` jetons par seconde, jusqu'à ``burst`` ;
+    chaque départ consomme un jeton et attend qu'il soit disponible. ``pause``
+    suspend tous les départs (réponse 429 avec ``Retry-After``).
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # jeton réservé, éventuellement à crédit : les suivants attendront davantage
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            # pas de rafale à la reprise
+            self._tokens = min(self._tokens, 0.0)
+
+
+class FetchMetrics:
+    """Compteurs des tentatives de requêtes, par résultat."""
+
+    OUTCOMES = ("succès", "délai dépassé", "connexion", "limité (429)", "erreur serveur", "erreur client",
+                "réponse invalide")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.OUTCOMES, 0)
+            self._retries = self._failures = 0
+            self._elapsed = 0.0
+
+    def record(self, outcome, elapsed=0.0, retried=False, failed=False, model=None):
+        with self._lock:
+            self._counts[outcome] += 1
+            self._elapsed += elapsed
+            self._retries += retried
+            self._failures += failed
+        # mêmes mesures, par modèle, pour l'export Prometheus
+        metrics.increment("api_requests_total", outcome=outcome, model=model or "autre")
+        metrics.observe("api_request_seconds", elapsed, model=model or "autre")
+
+    def snapshot(self):
+        """Compteurs courants : tentatives, résultats, nouvelles tentatives, abandons, durée."""
+        with self._lock:
+            attempts = sum(self._counts.values())
+            return {
+                "tentatives": attempts,
+                **self._counts,
+                "nouvelles tentatives": self._retries,
+                "abandons": self._failures,
+                "durée moyenne (s)": round(self._elapsed / attempts, 3) if attempts else 0.0,
+            }
+
+
+def build_forecast_url(communes, model_key, daily, hourly, forecast_days, api_url=None):
+    latitudes = ",".join(str(ville["lat"]) for ville in communes)
+    longitudes = ",".join(str(ville["lon"]) for ville in communes)
+    return (
+        f"{api_url or API_URL}?latitude={latitudes}&longitude={longitudes}&models={model_key}"
+        f"&daily={','.join(daily)}&hourly={','.join(hourly)}"
+        f"&timezone=Europe/Paris&forecast_days={forecast_days}"
+    )
+
+
+def chunk_communes(communes, max_locations=None, max_url_length=MAX_URL_LENGTH):
+    """Découpe la liste en paquets respectant le nombre de points et la longueur d'URL."""
+    max_locations = max(1, max_locations or MAX_LOCATIONS_PER_REQUEST)
+    chunks = []
+    current = []
+    # longueur approximative : partie fixe de l'URL + coordonnées ajoutées
+    fixed_length = 600
+    current_length = fixed_length
+    for ville in communes:
+        added = len(str(ville["lat"])) + len(str(ville["lon"])) + 2
+        if current and (len(current) >= max_locations or current_length + added > max_url_length):
+            chunks.append(current)
+            current = []
+            current_length = fixed_length
+        current.append(ville)
+        current_length += added
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+_session = None
+_session_lock = threading.Lock()
+_limiter = RateLimiter(MAX_REQUESTS_PER_SECOND, RATE_BURST)
+_metrics = FetchMetrics()
+
+
+def fetch_metrics():
+    """Compteurs des requêtes du processus (voir ``FetchMetrics.snapshot``)."""
+    return _metrics.snapshot()
+
+
+def get_session():
+    """Session HTTP partagée, dimensionnée pour le pool de threads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(MAX_WORKERS, 10))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def retry_after_seconds(value):
+    """Délai d'un en-tête ``Retry-After`` (secondes ou date HTTP), ``None`` si absent."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Délai avant la tentative ``attempt + 1`` : tirage uniforme sous un plafond exponentiel."""
+    base = RETRY_BACKOFF if base is None else base
+    cap = MAX_RETRY_DELAY if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def fetch_json(url, session=None, limiter=None, timeout=REQUEST_TIMEOUT, retries=None, model=None):
+    """Télécharge et décode une réponse JSON, avec nouvelles tentatives si l'échec est transitoire.
+
+    ``model`` étiquette les mesures de latence et de résultat de la requête.
+    """
+    session = session or get_session()
+    limiter = limiter or _limiter
+    retries = MAX_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        last = attempt == retries
+        limiter.acquire()
+        started = time.monotonic()
+        delay = None
+        try:
+            response = session.get(url, timeout=timeout)
+        except requests.Timeout:
+            _metrics.record("délai dépassé", time.monotonic() - started, retried=not last, failed=last, model=model)
+            if last:
+                raise
+        except requests.ConnectionError:
+            _metrics.record("connexion", time.monotonic() - started, retried=not last, failed=last, model=model)
+            if last:
+                raise
+        else:
+            elapsed = time.monotonic() - started
+            status = response.status_code
+            if status in RETRY_STATUSES:
+                _metrics.record("limité (429)" if status == 429 else "erreur serveur", elapsed,
+                                retried=not last, failed=last, model=model)
+                if last:
+                    response.raise_for_status()
+                delay = retry_after_seconds(response.headers.get("Retry-After"))
+                if status == 429:
+                    # tout le pool attend, pas seulement ce thread : l'attente se fait dans acquire
+                    limiter.pause(min(MAX_RETRY_DELAY, delay if delay is not None else backoff_delay(attempt)))
+                    continue
+            elif status >= 400:
+                _metrics.record("erreur client", elapsed, failed=True, model=model)
+                response.raise_for_status()
+            else:
+                try:
+                    data = fastjson.loads(response.content)
+                except ValueError:
+                    _metrics.record("réponse invalide", elapsed, failed=True, model=model)
+                    raise
+                _metrics.record("succès", elapsed, model=model)
+                return data
+        time.sleep(min(MAX_RETRY_DELAY, delay) if delay is not None else backoff_delay(attempt))
+
+
+def fetch_many(urls, max_workers=None, limiter=None, model=None):
+    """Récupère toutes les URLs en parallèle.
+
+    Génère des tuples ``(index, données, erreur)`` dans l'ordre d'arrivée des
+    réponses, dans le thread appelant : l'appelant peut donc mettre à jour sa
+    barre de progression et afficher ses avertissements au fil de l'eau.
+    """
+    urls = list(urls)
+    if not urls:
+        return
+    workers = max(1, min(max_workers or MAX_WORKERS, len(urls)))
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="meteo-fetch") as executor:
+        futures = {
+            executor.submit(fetch_json, url, session, limiter, model=model): index
+            for index, url in enumerate(urls)
+        }
+        for future in as_completed(futures):
+            # la réponse n'est plus référencée une fois transmise à l'appelant
+            index = futures.pop(future)
+            try:
+                yield index, future.result(), None
+            except Exception as e:
+                yield index, None, e
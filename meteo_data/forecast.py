@@ -0,0 +1,189 @@
+"""Variables demandées à Open-Meteo et mise en forme des réponses."""
+
+import numpy as np
+import pandas as pd
+
+FORECAST_DAYS = 16
+
+# run du modèle (UTC) dont provient chaque prévision
+RUN_COLUMN = "Run du modèle"
+
+# variable API -> colonne affichée
+DAILY_COLUMNS = {
+    "temperature_2m_max": "Température Max (°C)",
+    "temperature_2m_min": "Température Min (°C)",
+    "precipitation_sum": "Précipitations (mm)",
+    "precipitation_probability_max": "Probabilité de Précipitations (%)",
+    "wind_speed_10m_max": "Vitesse du vent Max (km/h)",
+    "wind_gusts_10m_max": "Rafales Max (km/h)",
+    "sunrise": "Lever du soleil",
+    "sunset": "Coucher du soleil",
+    "daylight_duration": "Durée du jour (secondes)",
+    "uv_index_max": "Indice UV Max",
+}
+
+HOURLY_COLUMNS = {
+    "temperature_2m": "Température (°C)",
+    "relative_humidity_2m": "Humidité (%)",
+    "wind_speed_10m": "Vitesse du vent (km/h)",
+    "wind_direction_10m": "Direction du vent (°)",
+    "cloudcover": "Couverture nuageuse (%)",
+    "precipitation_probability": "Probabilité de Précipitations (%)",
+}
+
+# ordre des variables dans l'URL (inchangé par rapport à l'API historique)
+DAILY_VARIABLES = (
+    "temperature_2m_max", "temperature_2m_min", "precipitation_sum", "wind_speed_10m_max",
+    "wind_gusts_10m_max", "sunrise", "sunset", "uv_index_max", "daylight_duration",
+    "precipitation_probability_max",
+)
+HOURLY_VARIABLES = tuple(HOURLY_COLUMNS)
+
+# variables horodatées (les autres sont des mesures)
+DAILY_TIME_VARIABLES = ("sunrise", "sunset")
+
+
+def build_frames(ville, data, run_time=None):
+    """Transforme la réponse d'une commune en (DataFrame jour, DataFrame heure).
+
+    ``run_time`` (epoch UTC) est recopié dans la colonne ``RUN_COLUMN``.
+    """
+    daily = data["daily"]
+    hourly = data["hourly"]
+    run = pd.Timestamp(run_time, unit="s") if run_time is not None else pd.NaT
+
+    # DataFrame day
+    df_long_term = pd.DataFrame({
+        "Ville": [ville['nom']] * len(daily["time"]),
+        "Latitude": [ville['lat']] * len(daily["time"]),
+        "Longitude": [ville['lon']] * len(daily["time"]),
+        "Date": daily["time"],
+        **{column: daily[variable] for variable, column in DAILY_COLUMNS.items()},
+        RUN_COLUMN: run,
+    })
+
+    # DataFrame heure
+    df_hourly = pd.DataFrame({
+        "Ville": [ville['nom']] * len(hourly["time"]),
+        "Date et Heure": hourly["time"],
+        **{column: hourly[variable] for variable, column in HOURLY_COLUMNS.items()},
+        RUN_COLUMN: run,
+    })
+    return df_long_term, df_hourly
+
+
+def empty_frames():
+    """DataFrames vides, avec les colonnes de ``build_frames``."""
+    return (
+        pd.DataFrame(columns=["Ville", "Latitude", "Longitude", "Date", *DAILY_COLUMNS.values(), RUN_COLUMN]),
+        pd.DataFrame(columns=["Ville", "Date et Heure", *HOURLY_COLUMNS.values(), RUN_COLUMN]),
+    )
+
+
+def split_locations(data, expected):
+    """Démultiplexe une réponse multi-localisations (liste) ou simple (dict)."""
+    results = data if isinstance(data, list) else [data]
+    if len(results) != expected:
+        raise ValueError(f"{len(results)} localisations reçues pour {expected} demandées")
+    return results
+
+
+def check_response(data):
+    """Vérifie qu'une réponse contient toutes les variables, de longueurs cohérentes."""
+    for section, variables in (("daily", DAILY_COLUMNS), ("hourly", HOURLY_COLUMNS)):
+        block = data[section]
+        length = len(block["time"])
+        for variable in variables:
+            if len(block[variable]) != length:
+                raise ValueError(f"{section}.{variable} : {len(block[variable])} valeurs pour {length} dates")
+
+
+HOUR = np.timedelta64(1, "h")
+DAY = np.timedelta64(1, "D")
+
+
+def time_axis(times, step):
+    """Axe ``datetime64[us]`` de chaînes ISO régulières, construit à partir du début et du pas.
+
+    Seuls le premier, le deuxième et le dernier instant sont lus pour vérifier
+    la régularité ; un axe irrégulier est analysé chaîne par chaîne.
+    """
+    if not times:
+        return np.array([], dtype="datetime64[us]")
+    axis = np.datetime64(times[0], "us") + np.arange(len(times)) * step
+    if len(times) > 1 and (np.datetime64(times[1], "us") != axis[1] or np.datetime64(times[-1], "us") != axis[-1]):
+        return np.array(times, dtype="datetime64[us]")
+    return axis
+
+
+def section_offsets(responses, section):
+    """Longueur de la section de chaque réponse et positions de début dans la colonne concaténée."""
+    lengths = np.array([len(data[section]["time"]) for data in responses], dtype=np.int64)
+    return lengths, np.concatenate([[0], np.cumsum(lengths)])
+
+
+def section_column(responses, section, variable, offsets, dtype, missing=None):
+    """Colonne concaténée, remplie réponse par réponse dans un tableau préalloué.
+
+    ``missing`` remplit les réponses sans cette variable (erreur sinon).
+    """
+    values = np.empty(offsets[-1], dtype=dtype)
+    for data, start, end in zip(responses, offsets[:-1], offsets[1:]):
+        values[start:end] = data[section][variable] if missing is None else data[section].get(variable, missing)
+    return values
+
+
+def section_times(responses, section, offsets, step):
+    """Colonne de temps ; un axe partagé par plusieurs réponses n'est construit qu'une fois."""
+    values = np.empty(offsets[-1], dtype="datetime64[us]")
+    axes = {}
+    for data, start, end in zip(responses, offsets[:-1], offsets[1:]):
+        times = data[section]["time"]
+        if not times:
+            continue
+        key = (times[0], times[-1], len(times))
+        if key not in axes:
+            axes[key] = time_axis(times, step)
+        values[start:end] = axes[key]
+    return values
+
+
+def build_compact_frames(communes, responses, run_times=None):
+    """Construit directement les DataFrames concaténés de toutes les communes.
+
+    Représentation compacte : commune en ``category``, mesures en ``float32``,
+    dates et heures de lever/coucher en ``datetime64``. Chaque colonne est
+    préallouée à sa taille finale et remplie avec les tableaux JSON ; les axes
+    de temps sont générés à partir du premier instant et du pas.
+    """
+    codes, names = pd.factorize(pd.Index([ville["nom"] for ville in communes]))
+    daily_lengths, daily_offsets = section_offsets(responses, "daily")
+    hourly_lengths, hourly_offsets = section_offsets(responses, "hourly")
+    latitudes = np.array([ville["lat"] for ville in communes], dtype=np.float32)
+    longitudes = np.array([ville["lon"] for ville in communes], dtype=np.float32)
+    runs = pd.to_datetime(
+        [np.nan if run_time is None else run_time for run_time in (run_times or [None] * len(communes))], unit="s"
+    ).to_numpy()
+
+    daily = {
+        "Ville": pd.Categorical.from_codes(np.repeat(codes, daily_lengths), categories=names),
+        "Latitude": np.repeat(latitudes, daily_lengths),
+        "Longitude": np.repeat(longitudes, daily_lengths),
+        "Date": section_times(responses, "daily", daily_offsets, DAY),
+    }
+    for variable, column in DAILY_COLUMNS.items():
+        if variable in DAILY_TIME_VARIABLES:
+            daily[column] = section_column(responses, "daily", variable, daily_offsets, "datetime64[us]")
+        else:
+            daily[column] = section_column(responses, "daily", variable, daily_offsets, np.float32)
+    daily[RUN_COLUMN] = np.repeat(runs, daily_lengths)
+
+    hourly = {
+        "Ville": pd.Categorical.from_codes(np.repeat(codes, hourly_lengths), categories=names),
+        "Date et Heure": section_times(responses, "hourly", hourly_offsets, HOUR),
+    }
+    for variable, column in HOURLY_COLUMNS.items():
+        hourly[column] = section_column(responses, "hourly", variable, hourly_offsets, np.float32)
+    hourly[RUN_COLUMN] = np.repeat(runs, hourly_lengths)
+
+    return pd.DataFrame(daily), pd.DataFrame(hourly)
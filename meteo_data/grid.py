@@ -0,0 +1,42 @@
+"""Rattachement des communes aux mailles de la grille de chaque modèle."""
+
+import os
+
+from meteo_data.models import GRID_RESOLUTIONS
+
+# une requête par maille de modèle plutôt qu'une par commune ; approximation
+# pour les autres communes de la maille, donc désactivée par défaut
+GRID_DEDUP = os.environ.get("METEO_GRID_DEDUP", "0") == "1"
+
+
+def grid_cell(model_name, lat, lon, step=None):
+    """Indices (ligne, colonne) de la maille la plus proche sur la grille du modèle."""
+    step = GRID_RESOLUTIONS[model_name] if step is None else step
+    return round(lat / step), round(lon / step)
+
+
+def resolve_grid_cells(model_name, communes, step=None):
+    """Mailles distinctes couvrant ``communes`` et maille de chaque commune.
+
+    Chaque maille est représentée par sa commune la plus peuplée : la requête
+    porte sur ses coordonnées réelles (correction d'altitude d'Open-Meteo
+    comprise) et sa réponse est attribuée aux autres communes de la maille.
+    La grille (pas de ``GRID_RESOLUTIONS``, ou ``step`` pour les grilles
+    d'ensemble) n'est pas alignée sur celle du modèle : pour ces autres
+    communes, les valeurs sont celles d'un voisin proche, pas les leurs.
+    Renvoie ``(mailles, maille_par_commune)``, les mailles étant des éléments
+    de ``communes``.
+    """
+    step = GRID_RESOLUTIONS[model_name] if step is None else step
+    cells = []
+    positions = {}
+    cell_of = []
+    for ville in communes:
+        key = grid_cell(model_name, ville["lat"], ville["lon"], step)
+        if key not in positions:
+            positions[key] = len(cells)
+            cells.append(ville)
+        elif (ville.get("population") or 0) > (cells[positions[key]].get("population") or 0):
+            cells[positions[key]] = ville
+        cell_of.append(positions[key])
+    return cells, cell_of
@@ -0,0 +1,112 @@
+"""Index (date, commune) des prévisions, construit une fois par chargement.
+
+Les sélections de l'interface (date, plage de dates, communes) deviennent des
+recherches dans un dictionnaire de positions de lignes, suivies d'un ``take``
+proportionnel au résultat, au lieu de balayer toutes les lignes à chaque
+interaction.
+"""
+
+import datetime
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def _day_numbers(times):
+    return times.to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+def _group_positions(days, codes):
+    """``{(jour, code commune): positions}``, positions croissantes dans chaque groupe."""
+    if len(days) == 0:
+        return {}
+    keys = days * (int(codes.max()) + 1) + codes
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+    starts = np.concatenate(([0], boundaries))
+    groups = np.split(order, boundaries)
+    return {
+        (int(days[order[start]]), int(codes[order[start]])): group
+        for start, group in zip(starts, groups)
+    }
+
+
+def row_hashes(df):
+    """Empreinte 64 bits de chaque ligne (valeurs seules, sans l'index)."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def frames_version(df_long_term, df_hourly):
+    """Empreinte du contenu d'un chargement, pour les caches dérivés.
+
+    Calculée sur les valeurs et non sur les runs et tailles : une copie
+    périmée remplacée par une réponse du même run change aussi la version.
+    Un hachage complet (~0,1 s pour 2000 communes) : à calculer une fois par
+    chargement, pas à chaque rerun.
+    """
+    digest = hashlib.blake2b(digest_size=10)
+    for df in (df_long_term, df_hourly):
+        digest.update(row_hashes(df).tobytes())
+    return digest.hexdigest()
+
+
+class ForecastIndex:
+    def __init__(self, df_long_term, df_hourly):
+        self.df_long_term = df_long_term
+        self.df_hourly = df_hourly
+
+        villes = pd.concat([df_long_term["Ville"], df_hourly["Ville"]], ignore_index=True).astype("category")
+        self._codes = {nom: code for code, nom in enumerate(villes.cat.categories)}
+        daily_codes = villes.cat.codes.to_numpy()[:len(df_long_term)].astype(np.int64)
+        hourly_codes = villes.cat.codes.to_numpy()[len(df_long_term):].astype(np.int64)
+
+        daily_days = _day_numbers(df_long_term["Date"])
+        hourly_days = _day_numbers(df_hourly["Date et Heure"])
+        self._daily = _group_positions(daily_days, daily_codes)
+        self._hourly = _group_positions(hourly_days, hourly_codes)
+        self._daily_by_commune = {
+            code: np.flatnonzero(daily_codes == code) for code in range(len(self._codes))
+        }
+
+        self.dates = np.array(
+            [datetime.date.fromordinal(day + _EPOCH_ORDINAL) for day in np.unique(daily_days)], dtype=object
+        )
+        self.communes = sorted(self._codes)
+        self._all_codes = list(self._codes.values())
+
+    def _code_list(self, communes):
+        if communes is None:
+            return self._all_codes
+        return [self._codes[nom] for nom in communes if nom in self._codes]
+
+    @staticmethod
+    def _take(df, groups, keys):
+        parts = [groups[key] for key in keys if key in groups]
+        positions = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+        return df.take(positions)
+
+    @staticmethod
+    def _day(date):
+        return date.toordinal() - _EPOCH_ORDINAL
+
+    def daily(self, date, communes=None):
+        """Prévisions journalières d'une date (toutes les communes ou ``communes``)."""
+        day = self._day(date)
+        return self._take(self.df_long_term, self._daily, [(day, code) for code in self._code_list(communes)])
+
+    def hourly(self, dates, communes=None):
+        """Prévisions horaires des ``dates`` pour les communes demandées, dans l'ordre d'origine."""
+        codes = self._code_list(communes)
+        keys = [(self._day(date), code) for date in dates for code in codes]
+        return self._take(self.df_hourly, self._hourly, keys)
+
+    def daily_commune(self, commune):
+        """Toutes les prévisions journalières d'une commune."""
+        code = self._codes.get(commune)
+        positions = self._daily_by_commune.get(code, np.empty(0, dtype=np.int64))
+        return self.df_long_term.take(positions)
@@ -0,0 +1,359 @@
+"""Chargement des prévisions de toutes les communes pour un modèle."""
+
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from meteo_data import metrics
+from meteo_data.archive import get_archive
+from meteo_data.cache import get_cache, variables_signature
+from meteo_data.communes import COMMUNES_DEUX_SEVRES
+from meteo_data.fetch import BATCH_REQUESTS, build_forecast_url, chunk_communes, fetch_many
+from meteo_data.forecast import (
+    DAILY_VARIABLES,
+    FORECAST_DAYS,
+    HOURLY_VARIABLES,
+    build_compact_frames,
+    build_frames,
+    check_response,
+    empty_frames,
+    split_locations,
+)
+from meteo_data.grid import GRID_DEDUP, resolve_grid_cells
+from meteo_data.models import MODELS
+from meteo_data.runs import entry_expiry, latest_run
+from meteo_data.singleflight import get_single_flight
+
+logger = logging.getLogger(__name__)
+
+# sert la copie périmée pendant le rafraîchissement plutôt que de faire attendre
+STALE_WHILE_REVALIDATE = os.environ.get("METEO_STALE_WHILE_REVALIDATE", "1") == "1"
+
+
+def fetch_responses(model_key, communes, forecast_days=FORECAST_DAYS, batched=None,
+                    on_progress=None, on_error=None, done=0, total=None, model_name=None):
+    """Interroge l'API et renvoie les réponses par position dans ``communes``."""
+    batched = BATCH_REQUESTS if batched is None else batched
+    total = len(communes) if total is None else total
+
+    chunks = chunk_communes(communes) if batched else [[ville] for ville in communes]
+    starts = [0]
+    for chunk in chunks[:-1]:
+        starts.append(starts[-1] + len(chunk))
+    urls = [
+        build_forecast_url(chunk, model_key, DAILY_VARIABLES, HOURLY_VARIABLES, forecast_days)
+        for chunk in chunks
+    ]
+
+    responses = {}
+    # requêtes concurrentes, les réponses arrivent dans le désordre
+    for index, data, error in fetch_many(urls, model=model_name or model_key):
+        chunk = chunks[index]
+        done += len(chunk)
+        if on_progress is not None:
+            on_progress(done, total, chunk)
+
+        if error is None:
+            try:
+                data = split_locations(data, len(chunk))
+            except Exception as e:
+                error = e
+        if error is not None:
+            if on_error is not None:
+                on_error(chunk, error)
+            continue
+
+        for offset, result in enumerate(data):
+            responses[starts[index] + offset] = result
+    return responses
+
+
+def _cached_responses(cache, model_name, model_key, communes, signature):
+    """Lit le cache : ``(réponses valides, runs, entrées périmées)`` par position.
+
+    Les entrées expirées sont revalidées auprès de l'API ; celles dont le run
+    n'a pas changé sont prolongées, les autres sont renvoyées comme périmées.
+    """
+    if cache is None:
+        return {}, {}, {}
+    now = time.time()
+    entries = cache.get_many(model_key, communes, signature, include_expired=True)
+    responses = {position: entry.data for position, entry in entries.items() if entry.expires_at > now}
+    run_times = {position: entries[position].run_time for position in responses}
+    metrics.increment("cache_lookups_total", len(responses), model=model_name, result="hit")
+    metrics.increment("cache_lookups_total", len(communes) - len(entries), model=model_name, result="miss")
+
+    # entrées expirées : revalidation légère auprès de l'API avant de tout retélécharger
+    expired = {position: entry for position, entry in entries.items() if entry.expires_at <= now}
+    if not expired:
+        return responses, run_times, {}
+    current_run = latest_run(model_name)
+    unchanged = [
+        position for position, entry in expired.items()
+        if entry.run_time is not None and entry.run_time >= current_run.timestamp()
+    ]
+    if unchanged:
+        cache.touch(model_key, [communes[position] for position in unchanged], signature,
+                    entry_expiry(model_name, current_run))
+        for position in unchanged:
+            responses[position] = expired.pop(position).data
+            run_times[position] = entries[position].run_time
+    metrics.increment("cache_lookups_total", len(unchanged), model=model_name, result="revalidated")
+    metrics.increment("cache_lookups_total", len(expired), model=model_name, result="stale")
+    return responses, run_times, expired
+
+
+def _refresh(cache, model_name, model_key, communes, positions, signature, forecast_days, batched,
+             on_progress=None, on_error=None):
+    """Télécharge les communes ``positions`` et les enregistre dans le cache."""
+    current_run = latest_run(model_name)
+    fetched = fetch_responses(
+        model_key, [communes[position] for position in positions], forecast_days, batched,
+        on_progress, on_error, done=len(communes) - len(positions), total=len(communes), model_name=model_name,
+    )
+    fetched = {positions[index]: data for index, data in fetched.items()}
+    if cache is not None:
+        cache.put_many(
+            model_key, [(communes[position], data) for position, data in fetched.items()], signature,
+            expires_at=entry_expiry(model_name, current_run), run_time=current_run.timestamp(),
+        )
+    return fetched, current_run.timestamp()
+
+
+def _refresh_in_background(flight, cache, model_name, model_key, communes, positions, signature,
+                           forecast_days, batched):
+    """Lance un rafraîchissement si aucun autre chargeur n'est en cours pour ce modèle."""
+    handle = flight.acquire(f"{model_key}|{signature}", blocking=False)
+    if handle is None:
+        return False
+
+    def run():
+        try:
+            _refresh(cache, model_name, model_key, communes, positions, signature, forecast_days, batched)
+        except Exception:
+            logger.exception("Rafraîchissement en arrière-plan échoué pour %s", model_name)
+        finally:
+            handle.release()
+
+    threading.Thread(target=run, name=f"meteo-refresh-{model_name}", daemon=True).start()
+    return True
+
+
+def _archive_frames(archive, model_name, df_long_term, df_hourly):
+    """Ajoute un run encore inconnu à l'archive ; un échec n'empêche pas l'affichage."""
+    try:
+        with metrics.timer("archive", model=model_name):
+            archive.append(model_name, df_long_term, df_hourly)
+    except Exception:
+        logger.exception("Archivage impossible pour %s", model_name)
+
+
+# modèle : DataFrames en attente d'archivage (None : archivage en cours, rien
+# en attente ; absent : aucun thread d'archivage pour ce modèle)
+_archive_pending = {}
+_archive_threads = {}
+_archive_lock = threading.Lock()
+
+
+def _archive_in_background(model_name, df_long_term, df_hourly):
+    """Archive les DataFrames dans un thread, hors du chemin des requêtes.
+
+    Un thread par modèle au plus : les chargements arrivés pendant un
+    archivage ne gardent que les DataFrames les plus récents, archivés ensuite
+    (``append`` n'écrit que les couples run/commune encore absents). Le thread
+    n'est pas un démon : un processus court (CLI) attend la fin de l'écriture.
+    """
+    archive = get_archive()
+    if archive is None:
+        return
+    with _archive_lock:
+        running = model_name in _archive_pending
+        _archive_pending[model_name] = (df_long_term, df_hourly)
+        if running:
+            return
+
+        def run():
+            while True:
+                with _archive_lock:
+                    frames = _archive_pending[model_name]
+                    if frames is None:
+                        del _archive_pending[model_name]
+                        return
+                    _archive_pending[model_name] = None
+                _archive_frames(archive, model_name, *frames)
+
+        thread = _archive_threads[model_name] = threading.Thread(target=run, name=f"meteo-archive-{model_name}")
+        thread.start()
+
+
+def wait_for_archive(timeout=None):
+    """Attend la fin des archivages en arrière-plan (tests, scripts)."""
+    with _archive_lock:
+        threads = list(_archive_threads.values())
+    for thread in threads:
+        thread.join(timeout)
+
+
+def _fan_out(points, members, on_progress, on_error, served, total, fallback=(), on_stale=None):
+    """Rapporte la progression et les erreurs par commune plutôt que par maille.
+
+    ``members[position]`` : communes de la maille ``points[position]``. Les
+    rappels de ``fetch_responses`` reçoivent les mailles elles-mêmes, retrouvées
+    par identité puisque deux communes homonymes peuvent partager un nom.
+    Les mailles de ``fallback`` (positions) ont une copie périmée en cache :
+    leur échec est signalé à ``on_stale`` plutôt qu'à ``on_error``.
+    """
+    position_of = {id(point): position for position, point in enumerate(points)}
+    done = [served]
+
+    def progress(_, __, cells):
+        communes = [ville for cell in cells for ville in members[position_of[id(cell)]]]
+        done[0] += len(communes)
+        on_progress(done[0], total, communes)
+
+    def error(cells, e):
+        positions = [position_of[id(cell)] for cell in cells]
+        stale = [ville for position in positions if position in fallback for ville in members[position]]
+        lost = [ville for position in positions if position not in fallback for ville in members[position]]
+        if stale and on_stale is not None:
+            on_stale(stale, e)
+        if lost and on_error is not None:
+            on_error(lost, e)
+
+    return (progress if on_progress is not None else None,
+            error if on_error is not None or on_stale is not None else None)
+
+
+def load_forecasts(model_name="AROME", communes=None, forecast_days=FORECAST_DAYS,
+                   batched=None, use_cache=True, stale_while_revalidate=None, compact=True,
+                   grid_dedup=None, on_progress=None, on_error=None, on_stale=None):
+    """Récupère les prévisions journalières et horaires de toutes les communes.
+
+    Les entrées du cache disque restent valides jusqu'à la publication attendue
+    du run suivant ; passé ce délai, elles ne sont retéléchargées que si le
+    ``meta.json`` du modèle annonce effectivement un run plus récent.
+
+    Un seul chargeur par modèle interroge l'API à la fois (entre sessions et,
+    avec le backend ``file``, entre processus). Les autres attendent son
+    résultat ou, en mode ``stale_while_revalidate``, reçoivent immédiatement la
+    copie périmée pendant qu'un rafraîchissement tourne en arrière-plan.
+
+    Les DataFrames sont construits en représentation compacte (voir
+    ``build_compact_frames``) ; ``compact=False`` redonne les DataFrames
+    historiques (chaînes, ``float64``).
+
+    Avec ``grid_dedup``, les communes sont rattachées à la maille du modèle
+    (voir ``resolve_grid_cells``) : seule la commune la plus peuplée de chaque
+    maille est demandée et mise en cache, puis sa réponse est attribuée à
+    toutes les communes de la maille (valeurs approchées pour les autres).
+
+    Une commune dont le téléchargement échoue (après les nouvelles tentatives
+    de ``fetch_json``) garde sa dernière réponse en cache, même périmée, et est
+    signalée à ``on_stale(communes, erreur)`` ; sans copie en cache, elle est
+    signalée à ``on_error(communes, erreur)`` et absente des DataFrames. Les
+    communes servies périmées pendant un rafraîchissement en arrière-plan sont
+    signalées à ``on_stale(communes, None)`` : le résultat ne doit pas être
+    gardé en mémoire comme données du nouveau run.
+    ``on_progress(terminées, total, communes)`` et les deux rappels d'erreur
+    sont appelés dans le thread appelant.
+    """
+    model_key = MODELS[model_name]
+    communes = COMMUNES_DEUX_SEVRES if communes is None else communes
+    grid_dedup = GRID_DEDUP if grid_dedup is None else grid_dedup
+    if grid_dedup:
+        points, cell_of = resolve_grid_cells(model_name, communes)
+    else:
+        points, cell_of = communes, list(range(len(communes)))
+    members = [[] for _ in points]
+    for position, cell in enumerate(cell_of):
+        members[cell].append(communes[position])
+    cache = get_cache() if use_cache else None
+    stale_while_revalidate = STALE_WHILE_REVALIDATE if stale_while_revalidate is None else stale_while_revalidate
+    signature = variables_signature(DAILY_VARIABLES, HOURLY_VARIABLES, forecast_days)
+    flight = get_single_flight(cache.directory if cache is not None else None)
+    flight_key = f"{model_key}|{signature}"
+
+    with metrics.timer("cache", model=model_name):
+        responses, run_times, stale = _cached_responses(cache, model_name, model_key, points, signature)
+    missing = [position for position in range(len(points)) if position not in responses]
+
+    if missing and stale_while_revalidate and all(position in stale for position in missing):
+        # copie périmée servie tout de suite, un seul rafraîchissement en arrière-plan
+        _refresh_in_background(flight, cache, model_name, model_key, points, missing, signature,
+                               forecast_days, batched)
+        for position in missing:
+            responses[position] = stale[position].data
+            run_times[position] = stale[position].run_time
+        if on_stale is not None:
+            on_stale([ville for position in missing for ville in members[position]], None)
+    elif missing:
+        with flight.hold(flight_key):
+            # un autre chargeur a pu remplir le cache pendant l'attente du verrou
+            if cache is not None:
+                subset = [points[position] for position in missing]
+                filled, filled_runs, _ = _cached_responses(cache, model_name, model_key, subset, signature)
+                responses.update((missing[index], data) for index, data in filled.items())
+                run_times.update((missing[index], run) for index, run in filled_runs.items())
+                missing = [position for position in missing if position not in responses]
+            if missing:
+                served = len(communes) - sum(len(members[position]) for position in missing)
+                fallback = {position for position in missing if position in stale}
+                progress, error = _fan_out(points, members, on_progress, on_error, served, len(communes),
+                                           fallback, on_stale)
+                with metrics.timer("fetch", model=model_name):
+                    fetched, fetched_run = _refresh(cache, model_name, model_key, points, missing, signature,
+                                                    forecast_days, batched, progress, error)
+                responses.update(fetched)
+                run_times.update((position, fetched_run) for position in fetched)
+                # échec du téléchargement : dernière réponse connue plutôt qu'une commune manquante
+                for position in missing:
+                    if position not in fetched and position in stale:
+                        responses[position] = stale[position].data
+                        run_times[position] = stale[position].run_time
+
+    valid = set()
+    # contrôle maille par maille, pour ne perdre que les réponses invalides
+    for position in sorted(responses):
+        try:
+            check_response(responses[position])
+        except Exception as e:
+            if on_error is not None:
+                on_error(members[position], e)
+            continue
+        valid.add(position)
+
+    # chaque commune reçoit la réponse de sa maille
+    positions = [position for position, cell in enumerate(cell_of) if cell in valid]
+    responses = {position: responses[cell_of[position]] for position in positions}
+    run_times = {position: run_times[cell_of[position]] for position in positions}
+
+    # assemble les données dans l'ordre des communes
+    if compact:
+        with metrics.timer("parse", model=model_name):
+            df_long_term, df_hourly = build_compact_frames(
+                [communes[position] for position in positions],
+                [responses[position] for position in positions],
+                [run_times[position] for position in positions],
+            )
+        _archive_in_background(model_name, df_long_term, df_hourly)
+        return df_long_term, df_hourly
+
+    with metrics.timer("parse", model=model_name):
+        frames = [build_frames(communes[position], responses[position], run_times[position])
+                  for position in positions]
+        if frames:
+            df_long_term = pd.concat([frame[0] for frame in frames], ignore_index=True)
+            df_hourly = pd.concat([frame[1] for frame in frames], ignore_index=True)
+        else:
+            # aucune commune disponible : DataFrames vides plutôt qu'une exception
+            df_long_term, df_hourly = empty_frames()
+
+        # Conversion des dates
+        df_long_term["Date"] = pd.to_datetime(df_long_term["Date"])
+        df_hourly["Date et Heure"] = pd.to_datetime(df_hourly["Date et Heure"])
+
+    _archive_in_background(model_name, df_long_term, df_hourly)
+    return df_long_term, df_hourly
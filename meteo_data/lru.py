@@ -0,0 +1,67 @@
+"""Cache LRU borné en nombre d'entrées et en taille totale, partagé entre threads."""
+
+import threading
+from collections import OrderedDict
+
+
+class SizedLRUCache:
+    """LRU dont chaque entrée a une taille (``sizeof(valeur)``, en octets).
+
+    Au-delà de ``max_entries`` ou de ``max_bytes``, les entrées les moins
+    récemment utilisées sont évincées. Une valeur plus grande que
+    ``max_bytes`` n'est pas conservée.
+    """
+
+    def __init__(self, max_bytes, max_entries=None, sizeof=len):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._entries and (
+                self._bytes > self.max_bytes
+                or (self.max_entries is not None and len(self._entries) > self.max_entries)
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def get_or_build(self, key, build):
+        """Valeur en cache, sinon ``build()`` puis mise en cache."""
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,50 @@
+"""Rapport mémoire : représentation compacte contre DataFrames historiques.
+
+    python -m meteo_data.memory --model AROME
+"""
+
+import argparse
+
+import pandas as pd
+
+from meteo_data.loader import load_forecasts
+from meteo_data.models import MODELS
+
+
+def memory_report(legacy_frames, compact_frames):
+    """Octets par colonne (mémoire profonde) des deux représentations, par table."""
+    rows = []
+    for table, legacy, compact in zip(("jour", "heure"), legacy_frames, compact_frames):
+        legacy_usage = legacy.memory_usage(deep=True, index=False)
+        compact_usage = compact.memory_usage(deep=True, index=False)
+        for column in legacy.columns:
+            rows.append({
+                "Table": table,
+                "Colonne": column,
+                "Type historique": str(legacy[column].dtype),
+                "Type compact": str(compact[column].dtype),
+                "Octets historique": int(legacy_usage[column]),
+                "Octets compact": int(compact_usage[column]),
+            })
+    report = pd.DataFrame(rows)
+    totals = report.groupby("Table", sort=False)[["Octets historique", "Octets compact"]].sum().reset_index()
+    totals["Colonne"] = "TOTAL"
+    report = pd.concat([report, totals], ignore_index=True)
+    report["Gain (x)"] = (report["Octets historique"] / report["Octets compact"]).round(1)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare la mémoire des représentations de prévisions.")
+    parser.add_argument("--model", choices=list(MODELS), default="AROME")
+    args = parser.parse_args(argv)
+
+    legacy = load_forecasts(args.model, compact=False)
+    compact = load_forecasts(args.model)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(memory_report(legacy, compact).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,266 @@
+"""Instrumentation légère : minuteurs par étape, compteurs et histogrammes.
+
+Les mesures restent en mémoire dans le processus et s'exportent au format
+texte Prometheus, dans un fichier (``METEO_METRICS_FILE``, pour le collecteur
+« textfile » de node_exporter) ou sur un port HTTP (``METEO_METRICS_PORT``,
+chemin ``/metrics``). Avec ``METEO_METRICS=0``, ``timer`` renvoie un contexte
+vide partagé et ``timed`` laisse la fonction intacte : coût quasi nul.
+
+    with timer("parse", model="AROME"):
+        ...
+    increment("cache_lookups_total", result="hit", model="AROME")
+"""
+
+import bisect
+import contextlib
+import functools
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.environ.get("METEO_METRICS", "1") == "1"
+METRICS_FILE = os.environ.get("METEO_METRICS_FILE", "")
+METRICS_PORT = int(os.environ.get("METEO_METRICS_PORT", "0"))
+# interface d'écoute du serveur /metrics (0.0.0.0 : collecteur distant)
+METRICS_HOST = os.environ.get("METEO_METRICS_HOST", "127.0.0.1")
+# intervalle minimal entre deux écritures du fichier (s)
+METRICS_FILE_INTERVAL = 15
+
+PREFIX = "meteo_"
+# bornes des histogrammes (s), celles des clients Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimation par interpolation dans les classes, comme ``histogram_quantile``."""
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        cumulated = 0
+        for index, count in enumerate(self.counts):
+            if cumulated + count >= rank and count:
+                if index == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[index - 1] if index else 0.0
+                return lower + (BUCKETS[index] - lower) * (rank - cumulated) / count
+            cumulated += count
+        return BUCKETS[-1]
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Compteurs et histogrammes étiquetés, partagés entre threads."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def increment(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, stage, **labels):
+        """Contexte chronométrant une étape dans l'histogramme ``stage_seconds``."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, "stage_seconds", {"stage": stage, **labels})
+
+    def timed(self, stage, **labels):
+        """Décorateur équivalent à ``timer`` ; sans effet si les mesures sont désactivées."""
+        def decorate(function):
+            if not self.enabled:
+                return function
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage, **labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def counters(self):
+        """Lignes ``{"nom", étiquettes..., "valeur"}`` des compteurs."""
+        with self._lock:
+            items = sorted(self._counters.items())
+        return [{"nom": name, **dict(labels), "valeur": value} for (name, labels), value in items]
+
+    def histograms(self):
+        """Lignes ``{"nom", étiquettes..., "n", "total (s)", "moyenne (s)", "p50 (s)", "p95 (s)"}``."""
+        with self._lock:
+            items = sorted((key, (list(h.counts), h.count, h.sum)) for key, h in self._histograms.items())
+        rows = []
+        for (name, labels), (counts, count, total) in items:
+            histogram = Histogram()
+            histogram.counts, histogram.count, histogram.sum = counts, count, total
+            rows.append({
+                "nom": name, **dict(labels), "n": count, "total (s)": round(total, 4),
+                "moyenne (s)": round(total / count, 4) if count else None,
+                "p50 (s)": round(histogram.quantile(0.5), 4), "p95 (s)": round(histogram.quantile(0.95), 4),
+            })
+        return rows
+
+    def prometheus_text(self):
+        """Exposition au format texte Prometheus (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h.counts), h.count, h.sum)) for key, h in self._histograms.items())
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                declared.add(name)
+            lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+        for (name, labels), (counts, count, total) in histograms:
+            if name not in declared:
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                declared.add(name)
+            cumulated = 0
+            for bound, bucket in zip((*BUCKETS, "+Inf"), counts):
+                cumulated += bucket
+                lines.append(f"{PREFIX}{name}_bucket{_labels(labels, [('le', bound)])} {cumulated}")
+            lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{PREFIX}{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+registry = MetricsRegistry(METRICS_ENABLED)
+increment = registry.increment
+observe = registry.observe
+timer = registry.timer
+timed = registry.timed
+
+_last_write = 0.0
+_export_lock = threading.Lock()
+_server = None
+# échec d'ouverture du port, retenu pour ne pas réessayer à chaque exécution du script
+_server_failed = False
+
+
+def write_textfile(path=None, force=False):
+    """Écrit l'exposition Prometheus dans ``path`` (``METEO_METRICS_FILE``), au plus toutes les 15 s."""
+    global _last_write
+    path = path or METRICS_FILE
+    if not path or not registry.enabled:
+        return False
+    with _export_lock:
+        now = time.monotonic()
+        if not force and now - _last_write < METRICS_FILE_INTERVAL:
+            return False
+        _last_write = now
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        fh.write(registry.prometheus_text())
+    os.replace(tmp_path, path)
+    return True
+
+
+def serve_metrics(port=None, host=None):
+    """Démarre (une fois par processus) un serveur HTTP exposant ``/metrics``.
+
+    Un port indisponible n'est tenté qu'une fois par processus.
+    """
+    global _server, _server_failed
+    port = METRICS_PORT if port is None else port
+    host = METRICS_HOST if host is None else host
+    if not port or not registry.enabled:
+        return None
+    with _export_lock:
+        if _server is not None or _server_failed:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            _server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            # port déjà pris, par exemple par un autre processus de l'application
+            logger.warning("Export des mesures impossible sur %s:%s : %s", host, port, e)
+            _server_failed = True
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="meteo-metrics", daemon=True).start()
+    return _server
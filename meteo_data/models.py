@@ -0,0 +1,39 @@
+"""Modèles météorologiques disponibles sur Open-Meteo."""
+
+# Modèles météo connus
+MODELS = {
+    "AROME": "arome_france",
+    "ARPEGE": "arpege_europe",
+    "ICON_EU": "icon_eu",
+    "GFS": "gfs_global"
+}
+
+# Calendrier des runs (heures UTC), délai de publication sur Open-Meteo (s)
+# et identifiant du fichier meta.json exposant le dernier run disponible.
+RUN_SCHEDULES = {
+    "AROME": {"hours": (0, 3, 6, 9, 12, 15, 18, 21), "delay": 2 * 3600, "meta": "meteofrance_arome_france0025"},
+    "ARPEGE": {"hours": (0, 6, 12, 18), "delay": 4 * 3600, "meta": "meteofrance_arpege_europe"},
+    "ICON_EU": {"hours": (0, 3, 6, 9, 12, 15, 18, 21), "delay": 3 * 3600, "meta": "dwd_icon_eu"},
+    "GFS": {"hours": (0, 6, 12, 18), "delay": 4 * 3600, "meta": "ncep_gfs025"},
+}
+
+# Pas de la grille de chaque modèle (degrés) : les communes d'une même maille
+# reçoivent des prévisions identiques et ne sont demandées qu'une fois.
+GRID_RESOLUTIONS = {
+    "AROME": 0.025,
+    "ARPEGE": 0.1,
+    "ICON_EU": 0.0625,
+    "GFS": 0.25,
+}
+
+# Modèles d'ensemble (API ensemble d'Open-Meteo) et pas de leur grille (degrés)
+ENSEMBLE_MODELS = {
+    "ICON_EU": "icon_eu",
+    "GFS": "gfs025",
+    "ECMWF": "ecmwf_ifs025",
+}
+ENSEMBLE_GRID_RESOLUTIONS = {
+    "ICON_EU": 0.125,
+    "GFS": 0.25,
+    "ECMWF": 0.25,
+}
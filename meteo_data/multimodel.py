@@ -0,0 +1,164 @@
+"""Chargement simultané de tous les modèles et comparaison entre modèles."""
+
+import hashlib
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from meteo_data import metrics
+from meteo_data.forecast import RUN_COLUMN
+from meteo_data.index import row_hashes
+from meteo_data.loader import load_forecasts
+from meteo_data.models import MODELS
+
+logger = logging.getLogger(__name__)
+
+MODEL_COLUMN = "Modèle"
+
+# variables horaires proposées dans la comparaison
+COMPARISON_COLUMNS = ["Température (°C)", "Humidité (%)", "Vitesse du vent (km/h)",
+                      "Couverture nuageuse (%)", "Probabilité de Précipitations (%)"]
+
+
+def _shared_categories(frames, column):
+    """Catégories communes, pour que la concaténation reste catégorielle."""
+    categories = pd.Index([])
+    for frame in frames:
+        categories = categories.union(frame[column].cat.categories, sort=False)
+    return pd.CategoricalDtype(categories)
+
+
+def combine_models(frames_by_model):
+    """Concatène des DataFrames ``{modèle: df}`` avec une colonne ``MODEL_COLUMN`` catégorielle."""
+    names = list(frames_by_model)
+    frames = [frames_by_model[name] for name in names]
+    if not frames:
+        return pd.DataFrame({MODEL_COLUMN: pd.Categorical([], categories=list(MODELS))})
+    ville_dtype = _shared_categories(frames, "Ville") if all(
+        isinstance(frame["Ville"].dtype, pd.CategoricalDtype) for frame in frames) else None
+    parts = []
+    for name, frame in zip(names, frames):
+        if ville_dtype is not None:
+            frame = frame.assign(Ville=frame["Ville"].astype(ville_dtype))
+        parts.append(frame)
+    combined = pd.concat(parts, ignore_index=True)
+    codes = np.repeat([list(MODELS).index(name) for name in names], [len(frame) for frame in frames])
+    combined.insert(0, MODEL_COLUMN, pd.Categorical.from_codes(codes, categories=list(MODELS)))
+    return combined
+
+
+def model_slice(df, model_name):
+    """Lignes d'un modèle, sans la colonne ``MODEL_COLUMN``."""
+    subset = df[(df[MODEL_COLUMN] == model_name).to_numpy()].drop(columns=MODEL_COLUMN).reset_index(drop=True)
+    if isinstance(subset["Ville"].dtype, pd.CategoricalDtype):
+        subset["Ville"] = subset["Ville"].cat.remove_unused_categories()
+    return subset
+
+
+def models_version(df_long_term, df_hourly):
+    """Empreinte du contenu de chaque modèle (voir ``frames_version``), pour les caches dérivés."""
+    if RUN_COLUMN not in df_long_term:
+        return ""
+    hashed = [(df[MODEL_COLUMN].cat.codes.to_numpy(), row_hashes(df)) for df in (df_long_term, df_hourly)]
+    parts = []
+    for code, name in enumerate(df_long_term[MODEL_COLUMN].cat.categories):
+        digest = hashlib.blake2b(digest_size=10)
+        for codes, hashes in hashed:
+            digest.update(hashes[codes == code].tobytes())
+        if (hashed[0][0] == code).any():
+            parts.append(f"{name}:{digest.hexdigest()}")
+    return ";".join(parts)
+
+
+def load_all_models(model_names=None, communes=None, on_progress=None, on_error=None, on_stale=None,
+                    **options):
+    """Charge tous les modèles en parallèle, en deux DataFrames longs indexés par modèle.
+
+    Chaque modèle passe par ``load_forecasts`` (cache disque, un seul
+    téléchargement par modèle) ; le limiteur de débit et la session HTTP
+    restent partagés. ``on_progress(modèle, terminées, total, communes)``,
+    ``on_error(modèle, communes, erreur)`` et ``on_stale(modèle, communes,
+    erreur)`` sont appelés dans le thread appelant au fil du chargement : les
+    threads déposent leurs évènements dans une file que ce thread vide
+    pendant que les modèles se chargent. Un modèle en échec est ignoré.
+    """
+    model_names = list(MODELS) if model_names is None else list(model_names)
+    events = queue.Queue()
+    callbacks = {"progress": on_progress, "error": on_error, "stale": on_stale}
+
+    def load(name):
+        # les threads n'ont pas accès à l'interface : évènements transmis par la file
+        with metrics.timer("load_model", model=name):
+            return load_forecasts(
+                name, communes=communes,
+                on_progress=lambda done, total, chunk: events.put((name, "progress", (done, total, chunk))),
+                on_error=lambda chunk, error: events.put((name, "error", (chunk, error))),
+                on_stale=lambda chunk, error: events.put((name, "stale", (chunk, error))),
+                **options,
+            )
+
+    def dispatch(timeout=0):
+        try:
+            name, kind, args = events.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        if callbacks[kind] is not None:
+            callbacks[kind](name, *args)
+        return True
+
+    daily, hourly = {}, {}
+    with ThreadPoolExecutor(max_workers=len(model_names) or 1, thread_name_prefix="meteo-model") as pool:
+        futures = {name: pool.submit(load, name) for name in model_names}
+        pending = set(futures.values())
+        while pending:
+            dispatch(timeout=0.05)
+            pending = {future for future in pending if not future.done()}
+        for name, future in futures.items():
+            try:
+                daily[name], hourly[name] = future.result()
+            except Exception as e:
+                logger.warning("%s : chargement impossible : %s", name, e)
+                events.put((name, "error", ([], e)))
+    # évènements restants, déposés juste avant la fin des chargements
+    while dispatch():
+        pass
+    return combine_models(daily), combine_models(hourly)
+
+
+def model_spread(df_hourly, column):
+    """Moyenne départementale par modèle et écart entre modèles, heure par heure.
+
+    Renvoie un tableau indexé par ``Date et Heure`` : une colonne par modèle,
+    ``Écart (max - min)`` entre les moyennes des modèles et ``Désaccord moyen``,
+    l'écart-type entre modèles calculé commune par commune puis moyenné. Les
+    écarts ne sont définis qu'aux heures couvertes par au moins deux modèles.
+    """
+    values = df_hourly[column].astype(np.float64)
+    keys = [df_hourly["Date et Heure"], df_hourly[MODEL_COLUMN]]
+    means = values.groupby(keys, observed=True).mean().unstack(MODEL_COLUMN)
+    means.columns = list(means.columns.astype(str))
+    counts = means.notna().sum(axis=1)
+    table = means.round(1)
+    table["Écart (max - min)"] = (means.max(axis=1) - means.min(axis=1)).where(counts >= 2).round(1)
+
+    by_commune = values.groupby(keys + [df_hourly["Ville"]], observed=True).mean().unstack(MODEL_COLUMN)
+    disagreement = by_commune.std(axis=1, ddof=0).where(by_commune.notna().sum(axis=1) >= 2)
+    table["Désaccord moyen"] = disagreement.groupby(level="Date et Heure").mean().round(2)
+    return table
+
+
+def spread_summary(df_hourly, columns=COMPARISON_COLUMNS):
+    """Écart entre modèles résumé par variable (moyen, maximal et heure du maximum)."""
+    rows = []
+    for column in columns:
+        spread = model_spread(df_hourly, column)["Écart (max - min)"].dropna()
+        rows.append({
+            "Variable": column,
+            "Écart moyen": round(spread.mean(), 1) if len(spread) else np.nan,
+            "Écart maximal": spread.max() if len(spread) else np.nan,
+            "Heure de l'écart maximal": spread.idxmax() if len(spread) else pd.NaT,
+        })
+    return pd.DataFrame(rows).set_index("Variable")
@@ -0,0 +1,90 @@
+"""Worker de préchargement : rafraîchit tous les modèles hors du chemin des requêtes.
+
+    python -m meteo_data.prefetch               # boucle, toutes les 5 minutes
+    python -m meteo_data.prefetch --once        # un seul passage (cron, systemd timer…)
+    python -m meteo_data.prefetch --models AROME GFS --interval 120
+
+Chaque passage charge les modèles via le cache disque (qui ne retélécharge
+qu'à la publication d'un nouveau run) et publie dans le magasin local les
+modèles dont le run a changé. L'application Streamlit ne fait que lire ce
+magasin. Les mesures du worker sont exportées comme celles de l'application
+(``METEO_METRICS_FILE``, ``METEO_METRICS_PORT``).
+"""
+
+import argparse
+import logging
+import time
+
+import pandas as pd
+
+from meteo_data import metrics
+from meteo_data.forecast import RUN_COLUMN
+from meteo_data.loader import load_forecasts
+from meteo_data.models import MODELS
+from meteo_data.store import get_store
+
+logger = logging.getLogger("meteo_data.prefetch")
+
+DEFAULT_INTERVAL = 300
+
+
+def prefetch_model(store, model_name):
+    """Charge un modèle et le publie si son run diffère de la version en magasin."""
+    def on_error(communes, error):
+        for ville in communes:
+            logger.warning("%s : erreur pour %s : %s", model_name, ville["nom"], error)
+
+    def on_stale(communes, error):
+        logger.warning("%s : %d commune(s) servie(s) depuis une copie périmée : %s", model_name, len(communes), error)
+
+    df_long_term, df_hourly = load_forecasts(model_name, stale_while_revalidate=False, on_error=on_error,
+                                             on_stale=on_stale)
+    if df_long_term.empty:
+        # la version en magasin reste servie plutôt qu'une version vide
+        logger.warning("%s : aucune commune chargée, rien à publier", model_name)
+        return None
+    run_time = df_long_term[RUN_COLUMN].max()
+    run_label = None if pd.isna(run_time) else run_time.isoformat()
+    rows = {"daily": len(df_long_term), "hourly": len(df_hourly)}
+    manifest = store.manifest(model_name)
+    if manifest is not None and manifest["run_time"] == run_label and manifest["rows"] == rows:
+        logger.info("%s : run %s déjà publié", model_name, run_time)
+        return None
+    version = store.write(model_name, df_long_term, df_hourly, run_time)
+    logger.info("%s : version %s publiée (%d communes)", model_name, version, df_long_term["Ville"].nunique())
+    return version
+
+
+def prefetch_all(store, model_names):
+    for model_name in model_names:
+        try:
+            with metrics.timer("prefetch", model=model_name):
+                prefetch_model(store, model_name)
+        except Exception:
+            logger.exception("%s : préchargement échoué", model_name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Précharge les prévisions Open-Meteo dans le magasin local.")
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL, help="secondes entre deux passages")
+    parser.add_argument("--once", action="store_true", help="un seul passage puis sortie")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    store = get_store()
+    if store is None:
+        parser.error("METEO_STORE_DIR (ou METEO_CACHE_DIR) doit désigner un répertoire")
+
+    metrics.serve_metrics()
+    while True:
+        started = time.monotonic()
+        prefetch_all(store, args.models)
+        metrics.write_textfile(force=True)
+        if args.once:
+            return 0
+        time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,56 @@
+"""Régénération du registre des communes depuis l'API Découpage administratif.
+
+    python -m meteo_data.registry --departements 79 --output meteo_data/communes.csv
+    python -m meteo_data.registry --departements 79 85 86 17 --output communes.csv
+
+Une ligne par commune : code INSEE, nom, département, région, centre et
+population légale, au format lu par ``meteo_data.communes``.
+"""
+
+import argparse
+import os
+
+import pandas as pd
+
+from meteo_data.communes import DEPARTEMENTS, REGISTRY_COLUMNS, REGISTRY_FILE
+from meteo_data.fetch import fetch_json
+
+GEO_API_URL = os.environ.get("METEO_GEO_API_URL", "https://geo.api.gouv.fr")
+
+
+def download_registry(departements, session=None):
+    """Registre officiel des communes des départements donnés."""
+    rows = []
+    for code in departements:
+        url = (f"{GEO_API_URL}/departements/{code}/communes"
+               "?fields=nom,code,centre,population,codeDepartement,region&format=json")
+        for commune in fetch_json(url, session=session):
+            lon, lat = commune["centre"]["coordinates"][:2]
+            rows.append({
+                "code_insee": commune["code"],
+                "nom": commune["nom"],
+                "departement": commune["codeDepartement"],
+                "region": (commune.get("region") or {}).get("nom"),
+                "lat": round(lat, 4),
+                "lon": round(lon, 4),
+                "population": commune.get("population"),
+            })
+    table = pd.DataFrame(rows, columns=REGISTRY_COLUMNS)
+    table["population"] = table["population"].astype("Int64")
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Régénère le registre des communes depuis geo.api.gouv.fr.")
+    parser.add_argument("--departements", nargs="+", default=DEPARTEMENTS, help="codes des départements")
+    parser.add_argument("--output", default=REGISTRY_FILE, help="fichier CSV écrit")
+    args = parser.parse_args(argv)
+
+    table = download_registry(args.departements)
+    table.to_csv(args.output, index=False)
+    print(f"{args.output} : {len(table)} communes ({', '.join(args.departements)})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,98 @@
+"""Runs des modèles : calendrier de publication et vérification de fraîcheur.
+
+Une prévision ne change qu'à la publication d'un nouveau run. Le calendrier
+de chaque modèle (heures de run + délai de publication) donne l'instant où un
+run plus récent devrait être disponible ; à cet instant, une requête légère
+sur le ``meta.json`` du modèle confirme si l'amont a réellement changé avant
+de relancer le téléchargement complet.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from meteo_data.fetch import fetch_json
+from meteo_data.models import RUN_SCHEDULES
+
+META_URL = os.environ.get("METEO_META_URL", "https://api.open-meteo.com/data/{meta}/static/meta.json")
+META_TIMEOUT = 3
+# délai entre deux vérifications quand le run attendu n'est pas encore publié
+RECHECK_INTERVAL = 15 * 60
+# durée pendant laquelle une réponse meta.json est réutilisée dans le processus
+META_MEMO_SECONDS = 60
+
+_meta_memo = {}
+_meta_lock = threading.Lock()
+
+
+def _as_datetime(now):
+    if now is None:
+        return datetime.now(timezone.utc)
+    if isinstance(now, (int, float)):
+        return datetime.fromtimestamp(now, timezone.utc)
+    return now
+
+
+def expected_run(model_name, now=None):
+    """Dernier run censé être publié à l'instant ``now`` (datetime UTC)."""
+    schedule = RUN_SCHEDULES[model_name]
+    published_before = _as_datetime(now) - timedelta(seconds=schedule["delay"])
+    day = published_before.replace(hour=0, minute=0, second=0, microsecond=0)
+    for offset in range(2):
+        candidates = [day - timedelta(days=offset) + timedelta(hours=h) for h in schedule["hours"]]
+        candidates = [run for run in candidates if run <= published_before]
+        if candidates:
+            return max(candidates)
+    raise ValueError(f"Calendrier de runs vide pour {model_name}")
+
+
+def next_run_available_at(model_name, run_time):
+    """Instant (datetime UTC) où le run suivant ``run_time`` devrait être publié."""
+    schedule = RUN_SCHEDULES[model_name]
+    day = run_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    for offset in range(2):
+        for hour in sorted(schedule["hours"]):
+            candidate = day + timedelta(days=offset, hours=hour)
+            if candidate > run_time:
+                return candidate + timedelta(seconds=schedule["delay"])
+    raise ValueError(f"Calendrier de runs vide pour {model_name}")
+
+
+def entry_expiry(model_name, run_time, now=None):
+    """Expiration (epoch) d'une donnée issue de ``run_time``.
+
+    Si le run suivant aurait déjà dû paraître (publication en retard), on
+    revérifie après ``RECHECK_INTERVAL`` plutôt qu'à chaque chargement.
+    """
+    now = _as_datetime(now).timestamp()
+    available_at = next_run_available_at(model_name, run_time).timestamp()
+    return max(available_at, now + RECHECK_INTERVAL)
+
+
+def upstream_run(model_name):
+    """Dernier run publié selon Open-Meteo (datetime UTC), ``None`` si indisponible."""
+    now = time.monotonic()
+    with _meta_lock:
+        memo = _meta_memo.get(model_name)
+        if memo is not None and now - memo[0] < META_MEMO_SECONDS:
+            return memo[1]
+    try:
+        meta = fetch_json(META_URL.format(meta=RUN_SCHEDULES[model_name]["meta"]), timeout=META_TIMEOUT,
+                          retries=0, model="meta")
+        run = datetime.fromtimestamp(meta["last_run_initialisation_time"], timezone.utc)
+    except Exception:
+        run = None
+    with _meta_lock:
+        _meta_memo[model_name] = (now, run)
+    return run
+
+
+def latest_run(model_name, now=None):
+    """Run le plus récent : celui annoncé par l'API, sinon celui du calendrier."""
+    return upstream_run(model_name) or expected_run(model_name, now)
+
+
+def run_key(model_name, now=None):
+    """Identifiant du run attendu, utilisable comme clé de cache en mémoire."""
+    return expected_run(model_name, now).strftime("%Y%m%d%H")
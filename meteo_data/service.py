@@ -0,0 +1,321 @@
+"""Service HTTP local des prévisions en Arrow IPC ou Parquet.
+
+    python -m meteo_data.service --port 8600
+    curl -o arome.arrow "http://127.0.0.1:8600/v1/hourly?models=AROME&communes=Niort,Parthenay&start=2026-03-01&end=2026-03-03"
+
+Les données sont celles de l'application : magasin préchargé s'il contient
+le modèle, sinon ``load_forecasts`` (cache disque, un seul téléchargement par
+modèle). Chaque modèle est converti une fois en table Arrow, conservée
+jusqu'au run suivant ; une requête n'en sélectionne que les colonnes
+(sans copie) et les lignes demandées.
+
+    GET /v1/models                  modèles, versions, colonnes (JSON)
+    GET /v1/daily | /v1/hourly      ?models=&communes=&start=&end=&variables=&format=arrow|parquet
+    GET /metrics                    mesures au format Prometheus
+
+Les réponses portent un ``ETag`` (versions des modèles et sélection) : avec
+``If-None-Match``, un client ne retélécharge que des données changées (304).
+"""
+
+import argparse
+import hashlib
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from meteo_data import fastjson, metrics
+from meteo_data.index import frames_version
+from meteo_data.loader import load_forecasts
+from meteo_data.lru import SizedLRUCache
+from meteo_data.models import MODELS
+from meteo_data.multimodel import MODEL_COLUMN, combine_models
+from meteo_data.runs import RECHECK_INTERVAL, run_key
+from meteo_data.store import DATA_SOURCE, get_store
+
+logger = logging.getLogger("meteo_data.service")
+
+DEFAULT_PORT = 8600
+# réponses encodées gardées en mémoire, par ETag
+RESPONSE_CACHE_MB = 64
+
+TABLES = {"daily": "Date", "hourly": "Date et Heure"}
+FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+# dictionnaires d'index identiques d'un modèle à l'autre, pour concaténer les tables
+DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.large_string())
+
+
+class RequestError(Exception):
+    """Requête invalide (400) ou données indisponibles (``status``)."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ModelTables:
+    """Tables Arrow journalière et horaire d'un modèle, et leur version."""
+
+    __slots__ = ("key", "version", "daily", "hourly", "loaded_at")
+
+    def __init__(self, key, version, daily, hourly):
+        self.key = key
+        self.version = version
+        self.daily = daily
+        self.hourly = hourly
+        self.loaded_at = time.monotonic()
+
+
+def to_arrow(model_name, df):
+    """Table Arrow d'un modèle, colonne ``MODEL_COLUMN`` comprise, sans métadonnées pandas."""
+    table = pa.Table.from_pandas(combine_models({model_name: df}), preserve_index=False)
+    for name in (MODEL_COLUMN, "Ville"):
+        index = table.schema.get_field_index(name)
+        table = table.set_column(index, name, table[name].cast(DICTIONARY_TYPE))
+    return table.replace_schema_metadata(None)
+
+
+def _values(query, name):
+    """Valeurs d'un paramètre répété ou séparé par des virgules."""
+    return [value.strip() for raw in query.get(name, []) for value in raw.split(",") if value.strip()]
+
+
+def _date(query, name):
+    values = query.get(name)
+    if not values:
+        return None
+    try:
+        return pd.Timestamp(values[-1])
+    except ValueError:
+        raise RequestError(f"date invalide pour {name} : {values[-1]}") from None
+
+
+def select_rows(table, date_column, communes=None, start=None, end=None, variables=None):
+    """Sélection des colonnes (sans copie) puis des lignes demandées ; ``end`` inclus (jour entier)."""
+    if variables:
+        unknown = [variable for variable in variables if variable not in table.column_names]
+        if unknown:
+            raise RequestError(f"variables inconnues : {', '.join(unknown)}")
+        keys = [MODEL_COLUMN, "Ville", date_column]
+        table = table.select(keys + [variable for variable in variables if variable not in keys])
+    masks = []
+    if communes:
+        masks.append(pc.is_in(table["Ville"], value_set=pa.array(communes, pa.large_string())))
+    dates = table[date_column]
+    if start is not None:
+        masks.append(pc.greater_equal(dates, pa.scalar(start, type=dates.type)))
+    if end is not None:
+        masks.append(pc.less(dates, pa.scalar(end.normalize() + pd.Timedelta(days=1), type=dates.type)))
+    if not masks:
+        return table
+    mask = masks[0]
+    for other in masks[1:]:
+        mask = pc.and_(mask, other)
+    return table.filter(mask)
+
+
+def encode(table, fmt):
+    """Corps de la réponse : buffer Arrow écrit directement depuis les colonnes."""
+    sink = pa.BufferOutputStream()
+    if fmt == "parquet":
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue()
+
+
+class ForecastService:
+    """Tables Arrow par modèle, rechargées au run suivant, et réponses encodées par ETag."""
+
+    def __init__(self, source=DATA_SOURCE, response_cache_mb=RESPONSE_CACHE_MB):
+        self.source = source
+        self.responses = SizedLRUCache(int(response_cache_mb * 1024 * 1024), sizeof=lambda body: body.size)
+        self._models = {}
+        self._locks = {model_name: threading.Lock() for model_name in MODELS}
+
+    def _current_key(self, model_name):
+        store = get_store() if self.source != "api" else None
+        version = store.version(model_name) if store is not None else None
+        if version is not None:
+            return f"store:{version}"
+        if self.source == "store":
+            raise RequestError(f"aucune donnée préchargée pour {model_name}", status=503)
+        return f"api:{run_key(model_name)}"
+
+    def model_tables(self, model_name):
+        """Tables du modèle, rechargées quand le magasin publie ou qu'un run est attendu."""
+        with self._locks[model_name]:
+            key = self._current_key(model_name)
+            tables = self._models.get(model_name)
+            # côté API, revalidation périodique comme l'interface (RECHECK_INTERVAL)
+            if tables is not None and tables.key == key and (
+                    key.startswith("store:") or time.monotonic() - tables.loaded_at < RECHECK_INTERVAL):
+                return tables
+            revalidating = []
+
+            def on_stale(communes, error):
+                if error is None:
+                    revalidating.append(communes)
+
+            with metrics.timer("service_load", model=model_name):
+                if key.startswith("store:"):
+                    df_long_term, df_hourly = get_store().read(model_name)
+                else:
+                    df_long_term, df_hourly = load_forecasts(model_name, on_stale=on_stale)
+            if df_long_term is None or df_long_term.empty:
+                raise RequestError(f"prévisions {model_name} indisponibles", status=503)
+            if key.startswith("store:"):
+                version = key.split(":", 1)[1]
+            else:
+                # empreinte du contenu : stable si un rechargement rend les mêmes données
+                version = frames_version(df_long_term, df_hourly)
+            daily, hourly = to_arrow(model_name, df_long_term), to_arrow(model_name, df_hourly)
+            # copie périmée pendant le téléchargement du nouveau run : rechargée à la requête suivante
+            tables = self._models[model_name] = ModelTables(None if revalidating else key, version, daily, hourly)
+            logger.info("%s : tables chargées (%s, %d + %d lignes)", model_name, version, len(daily), len(hourly))
+            return tables
+
+    def models(self):
+        rows = []
+        for model_name in MODELS:
+            try:
+                tables = self.model_tables(model_name)
+            except RequestError as e:
+                rows.append({"model": model_name, "available": False, "error": str(e)})
+                continue
+            rows.append({
+                "model": model_name, "available": True, "version": tables.version,
+                "rows": {"daily": tables.daily.num_rows, "hourly": tables.hourly.num_rows},
+                "columns": {"daily": tables.daily.column_names, "hourly": tables.hourly.column_names},
+            })
+        return rows
+
+    def query(self, table_name, query, if_none_match=None, accept=""):
+        """``(statut, corps, en-têtes)`` d'une requête ``/v1/daily`` ou ``/v1/hourly``."""
+        model_names = _values(query, "models") or list(MODELS)
+        unknown = [model_name for model_name in model_names if model_name not in MODELS]
+        if unknown:
+            raise RequestError(f"modèles inconnus : {', '.join(unknown)}")
+        fmt = (query.get("format") or [""])[-1] or ("parquet" if FORMATS["parquet"] in accept else "arrow")
+        if fmt not in FORMATS:
+            raise RequestError(f"format inconnu : {fmt} (arrow ou parquet)")
+        communes = _values(query, "communes")
+        variables = _values(query, "variables")
+        start, end = _date(query, "start"), _date(query, "end")
+
+        loaded = [self.model_tables(model_name) for model_name in model_names]
+        selection = (table_name, fmt, tuple(model_names), tuple(sorted(communes)), str(start), str(end),
+                     tuple(variables), tuple(entry.version for entry in loaded))
+        etag = '"' + hashlib.sha1(repr(selection).encode("utf-8")).hexdigest()[:20] + '"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match and etag in {tag.strip() for tag in if_none_match.split(",")}:
+            return 304, b"", headers
+
+        body = self.responses.get(etag)
+        metrics.increment("service_responses_total", result="hit" if body is not None else "miss")
+        if body is None:
+            date_column = TABLES[table_name]
+            parts = [select_rows(getattr(entry, table_name), date_column, communes, start, end, variables)
+                     for entry in loaded]
+            table = parts[0] if len(parts) == 1 else pa.concat_tables(parts).unify_dictionaries()
+            body = encode(table, fmt)
+            self.responses.put(etag, body)
+        headers["Content-Type"] = FORMATS[fmt]
+        return 200, body, headers
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body, headers):
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            if status == 304:
+                # ni corps ni Content-Length : ETag et Cache-Control seuls
+                self.end_headers()
+                return
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            # buffer Arrow envoyé tel quel, sans conversion en bytes
+            self.wfile.write(memoryview(body))
+
+        def _send_json(self, status, content):
+            self._send(status, fastjson.dumps(content), {"Content-Type": "application/json"})
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            endpoint = parts.path.rstrip("/").rsplit("/", 1)[-1] or "/"
+            status = 500
+            try:
+                with metrics.timer("service", endpoint=endpoint):
+                    if parts.path == "/metrics":
+                        status = 200
+                        self._send(200, metrics.registry.prometheus_text().encode("utf-8"),
+                                   {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+                    elif parts.path == "/v1/models":
+                        status = 200
+                        self._send_json(200, service.models())
+                    elif parts.path in ("/v1/daily", "/v1/hourly"):
+                        status, body, headers = service.query(
+                            endpoint, parse_qs(parts.query), self.headers.get("If-None-Match"),
+                            self.headers.get("Accept", ""))
+                        self._send(status, body, headers)
+                    else:
+                        status = 404
+                        self._send_json(404, {"error": f"chemin inconnu : {parts.path}"})
+            except RequestError as e:
+                status = e.status
+                self._send_json(status, {"error": str(e)})
+            except Exception as e:
+                logger.exception("Erreur sur %s", self.path)
+                self._send_json(500, {"error": str(e)})
+            finally:
+                metrics.increment("service_requests_total", endpoint=endpoint, status=status)
+
+        def log_message(self, format, *args):
+            logger.debug("%s %s", self.address_string(), format % args)
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, source=DATA_SOURCE):
+    """Serveur prêt à démarrer (``serve_forever``) ; ``port=0`` choisit un port libre."""
+    httpd = ThreadingHTTPServer((host, port), make_handler(ForecastService(source)))
+    httpd.daemon_threads = True
+    return httpd
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service local des prévisions (Arrow IPC ou Parquet).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--source", choices=("auto", "store", "api"), default=DATA_SOURCE,
+                        help="magasin préchargé, API, ou magasin puis API (auto)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    httpd = serve(args.host, args.port, args.source)
+    logger.info("Service des prévisions sur http://%s:%s/v1/models", *httpd.server_address[:2])
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+"""Coalescence des chargements : un seul téléchargement par modèle à la fois.
+
+Les sessions Streamlit d'un même processus sont des threads : un verrou par
+clé suffit à les coordonner. Avec le backend ``file``, un verrou ``flock`` sur
+un fichier du répertoire de cache étend l'exclusion aux processus de la
+machine (plusieurs réplicas, worker de préchargement…).
+"""
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows : coordination limitée au processus
+    fcntl = None
+
+LOCK_BACKEND = os.environ.get("METEO_LOCK_BACKEND", "file")
+
+
+class FlightHandle:
+    """Verrou détenu sur une clé ; ``release`` peut être appelé depuis un autre thread."""
+
+    def __init__(self, thread_lock, lock_file=None):
+        self._thread_lock = thread_lock
+        self._lock_file = lock_file
+
+    def release(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+        self._thread_lock.release()
+
+
+class SingleFlight:
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _thread_lock(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _lock_path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.lock_dir, f"{digest}.lock")
+
+    def acquire(self, key, blocking=True):
+        """Prend le verrou de ``key`` ; renvoie un ``FlightHandle`` ou ``None`` si occupé."""
+        thread_lock = self._thread_lock(key)
+        if not thread_lock.acquire(blocking):
+            return None
+        if self.lock_dir is None:
+            return FlightHandle(thread_lock)
+        try:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            lock_file = open(self._lock_path(key), "a+")
+        except Exception:
+            thread_lock.release()
+            raise
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            lock_file.close()
+            thread_lock.release()
+            return None
+        except Exception:
+            lock_file.close()
+            thread_lock.release()
+            raise
+        return FlightHandle(thread_lock, lock_file)
+
+    @contextmanager
+    def hold(self, key):
+        handle = self.acquire(key)
+        try:
+            yield handle
+        finally:
+            handle.release()
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def get_single_flight(lock_dir=None):
+    """Coordinateur partagé ; ``lock_dir`` n'est utilisé qu'avec le backend ``file``."""
+    lock_dir = lock_dir if LOCK_BACKEND == "file" else None
+    with _flights_lock:
+        if lock_dir not in _flights:
+            _flights[lock_dir] = SingleFlight(lock_dir)
+        return _flights[lock_dir]
@@ -0,0 +1,97 @@
+"""Index spatial des communes : grille régulière en degrés."""
+
+import math
+
+import numpy as np
+
+GRID_STEP = 0.1  # taille d'une maille en degrés (~11 km en latitude)
+MAX_RING = 50  # au-delà, la recherche du plus proche voisin balaie tout
+
+
+def grid_cells(lats, lons, step):
+    """Identifiant de maille (ligne, colonne) de chaque point."""
+    rows = np.floor(np.asarray(lats, dtype=np.float64) / step).astype(np.int64)
+    cols = np.floor(np.asarray(lons, dtype=np.float64) / step).astype(np.int64)
+    return rows, cols
+
+
+class SpatialIndex:
+    """Regroupe les points par maille pour des recherches sans balayage complet."""
+
+    def __init__(self, lats, lons, step=GRID_STEP):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.step = step
+        rows, cols = grid_cells(self.lats, self.lons, step)
+        self.cells = {}
+        if len(rows):
+            cells, inverse = np.unique(np.stack([rows, cols], axis=1), axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            order = np.argsort(inverse, kind="stable")
+            bounds = np.searchsorted(inverse[order], np.arange(len(cells) + 1))
+            for i, (row, col) in enumerate(cells):
+                self.cells[(int(row), int(col))] = order[bounds[i]:bounds[i + 1]]
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _box(self, row_min, row_max, col_min, col_max):
+        """Positions des points des mailles comprises dans le rectangle."""
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.cells):
+            found = [positions for (row, col), positions in self.cells.items()
+                     if row_min <= row <= row_max and col_min <= col <= col_max]
+        else:
+            found = [self.cells[(row, col)]
+                     for row in range(row_min, row_max + 1)
+                     for col in range(col_min, col_max + 1)
+                     if (row, col) in self.cells]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def within(self, lat_min, lat_max, lon_min, lon_max):
+        """Positions (triées) des points situés dans l'emprise donnée."""
+        row_min, col_min = (int(v[0]) for v in grid_cells([lat_min], [lon_min], self.step))
+        row_max, col_max = (int(v[0]) for v in grid_cells([lat_max], [lon_max], self.step))
+        positions = self._box(row_min, row_max, col_min, col_max)
+        keep = ((self.lats[positions] >= lat_min) & (self.lats[positions] <= lat_max)
+                & (self.lons[positions] >= lon_min) & (self.lons[positions] <= lon_max))
+        return np.sort(positions[keep])
+
+    def _distances(self, positions, lat, lon):
+        # distance équirectangulaire, en degrés de latitude
+        scale = math.cos(math.radians(lat))
+        return np.hypot(self.lats[positions] - lat, (self.lons[positions] - lon) * scale)
+
+    def nearest(self, lat, lon):
+        """Position du point le plus proche, ``None`` si l'index est vide."""
+        if not len(self):
+            return None
+        row, col = (int(v[0]) for v in grid_cells([lat], [lon], self.step))
+        candidates = np.empty(0, dtype=np.int64)
+        for radius in range(MAX_RING + 1):
+            candidates = self._box(row - radius, row + radius, col - radius, col + radius)
+            if len(candidates):
+                break
+        if not len(candidates):
+            candidates = np.arange(len(self))
+        # un point d'une maille voisine peut être plus proche que le premier trouvé :
+        # on élargit la recherche au rayon de ce premier candidat
+        best = self._distances(candidates, lat, lon).min()
+        scale = max(math.cos(math.radians(lat)), 1e-6)
+        row_radius = math.ceil(best / self.step)
+        col_radius = math.ceil(best / (scale * self.step))
+        candidates = self._box(row - row_radius, row + row_radius, col - col_radius, col + col_radius)
+        return int(candidates[np.argmin(self._distances(candidates, lat, lon))])
+
+
+def thin_points(lats, lons, max_points, step=GRID_STEP):
+    """Regroupe les points par maille, en doublant la maille jusqu'à ``max_points`` groupes.
+
+    Renvoie le numéro de groupe de chaque point et la taille de maille retenue.
+    """
+    while True:
+        rows, cols = grid_cells(lats, lons, step)
+        _, groups = np.unique(np.stack([rows, cols], axis=1), axis=0, return_inverse=True)
+        groups = groups.reshape(-1)
+        if not len(groups) or groups.max() + 1 <= max_points:
+            return groups, step
+        step *= 2
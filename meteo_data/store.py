@@ -0,0 +1,109 @@
+"""Magasin local des prévisions normalisées, alimenté par le worker de préchargement.
+
+Pour chaque modèle, les DataFrames jour/heure sont écrits en Parquet sous un
+nom versionné, puis un ``manifest.json`` est remplacé atomiquement pour
+pointer vers la nouvelle version : un lecteur voit toujours une paire de
+fichiers cohérente, même pendant une écriture.
+"""
+
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from meteo_data.cache import CACHE_DIR
+
+STORE_DIR = os.environ.get("METEO_STORE_DIR", os.path.join(CACHE_DIR, "store") if CACHE_DIR else "")
+# auto : magasin si disponible, sinon API ; store : magasin uniquement ; api : API uniquement
+DATA_SOURCE = os.environ.get("METEO_DATA_SOURCE", "auto")
+# versions conservées par modèle (la précédente reste lisible pendant la bascule)
+KEEP_VERSIONS = 2
+
+
+def _write_json(path, content):
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(content, fh, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class ForecastStore:
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _model_dir(self, model_name):
+        return os.path.join(self.directory, model_name)
+
+    def manifest(self, model_name):
+        """Description de la dernière version écrite, ou ``None``."""
+        try:
+            with open(os.path.join(self._model_dir(model_name), "manifest.json"), encoding="utf-8") as fh:
+                return json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def version(self, model_name):
+        manifest = self.manifest(model_name)
+        return manifest["version"] if manifest else None
+
+    def read(self, model_name):
+        """``(df_long_term, df_hourly)`` de la dernière version, ou ``(None, None)``."""
+        manifest = self.manifest(model_name)
+        if manifest is None:
+            return None, None
+        model_dir = self._model_dir(model_name)
+        df_long_term = pd.read_parquet(os.path.join(model_dir, manifest["daily"]))
+        df_hourly = pd.read_parquet(os.path.join(model_dir, manifest["hourly"]))
+        return df_long_term, df_hourly
+
+    def write(self, model_name, df_long_term, df_hourly, run_time=None):
+        """Publie une nouvelle version et renvoie son identifiant."""
+        model_dir = self._model_dir(model_name)
+        os.makedirs(model_dir, exist_ok=True)
+        fetched_at = time.time()
+        run_label = pd.Timestamp(run_time).strftime("%Y%m%d%H") if run_time is not None and pd.notna(run_time) else "norun"
+        version = f"{run_label}-{int(fetched_at * 1000)}"
+
+        daily_name = f"daily-{version}.parquet"
+        hourly_name = f"hourly-{version}.parquet"
+        df_long_term.to_parquet(os.path.join(model_dir, daily_name), index=False)
+        df_hourly.to_parquet(os.path.join(model_dir, hourly_name), index=False)
+        _write_json(os.path.join(model_dir, "manifest.json"), {
+            "model": model_name,
+            "version": version,
+            "run_time": None if run_label == "norun" else pd.Timestamp(run_time).isoformat(),
+            "fetched_at": fetched_at,
+            "daily": daily_name,
+            "hourly": hourly_name,
+            "rows": {"daily": len(df_long_term), "hourly": len(df_hourly)},
+        })
+        self._prune(model_dir)
+        return version
+
+    def _prune(self, model_dir):
+        versions = sorted(
+            {name.split("-", 1)[1].rsplit(".", 1)[0] for name in os.listdir(model_dir) if name.endswith(".parquet")},
+            key=lambda version: int(version.rsplit("-", 1)[1]),
+        )
+        for version in versions[:-KEEP_VERSIONS]:
+            for prefix in ("daily", "hourly"):
+                try:
+                    os.remove(os.path.join(model_dir, f"{prefix}-{version}.parquet"))
+                except FileNotFoundError:
+                    pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Magasin partagé du processus, ou ``None`` si ``METEO_STORE_DIR`` est vide."""
+    global _store
+    with _store_lock:
+        if _store is None and STORE_DIR:
+            _store = ForecastStore()
+    return _store
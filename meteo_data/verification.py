@@ -0,0 +1,241 @@
+"""Vérification des prévisions archivées contre les observations.
+
+Les observations horaires viennent de l'API archive d'Open-Meteo (adresse
+remplaçable par ``METEO_OBSERVATIONS_URL``, par exemple un serveur de
+données de test). Pour chaque date prévue close (observations publiées, plus
+aucun run à venir), les écarts prévision - observation sont réduits en
+sommes partielles par modèle, échéance, variable, commune et date, stockées
+en Parquet : une mise à jour ne traite que les nouvelles dates (et les
+communes dont les observations manquaient au passage précédent), et les scores
+(MAE, RMSE, biais) s'obtiennent en agrégeant ces sommes.
+"""
+
+import datetime
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from meteo_data import metrics
+from meteo_data.archive import MODEL_COLUMN
+from meteo_data.communes import COMMUNES_DEUX_SEVRES
+from meteo_data.fetch import chunk_communes, fetch_many
+from meteo_data.forecast import HOUR, RUN_COLUMN, section_column, section_offsets, section_times, split_locations
+from meteo_data.singleflight import get_single_flight
+
+OBSERVATIONS_URL = os.environ.get("METEO_OBSERVATIONS_URL", "https://archive-api.open-meteo.com/v1/archive")
+# délai de publication des observations (réanalyse) en jours
+OBSERVATION_DELAY_DAYS = int(os.environ.get("METEO_OBSERVATION_DELAY_DAYS", "5"))
+# dates traitées par passage (une requête d'observations par paquet de communes)
+MAX_DAYS_PER_UPDATE = 31
+
+# colonne de prévision -> variable observée
+VERIFIED_COLUMNS = {
+    "Température (°C)": "temperature_2m",
+    "Humidité (%)": "relative_humidity_2m",
+    "Vitesse du vent (km/h)": "wind_speed_10m",
+    "Couverture nuageuse (%)": "cloud_cover",
+}
+
+LEAD_COLUMN = "Échéance (j)"
+VARIABLE_COLUMN = "Variable"
+SCORE_KEYS = [MODEL_COLUMN, LEAD_COLUMN, VARIABLE_COLUMN, "Ville", "Date"]
+
+
+def build_observations_url(communes, start, end, variables):
+    latitudes = ",".join(str(ville["lat"]) for ville in communes)
+    longitudes = ",".join(str(ville["lon"]) for ville in communes)
+    return (
+        f"{OBSERVATIONS_URL}?latitude={latitudes}&longitude={longitudes}"
+        f"&start_date={start}&end_date={end}&hourly={','.join(variables)}&timezone=Europe/Paris"
+    )
+
+
+def fetch_observations(communes, start, end, columns=VERIFIED_COLUMNS, on_error=None):
+    """Observations horaires ``[start, end]`` (dates ``YYYY-MM-DD``) de chaque commune.
+
+    Même décodage que les prévisions : colonnes préallouées, remplies
+    directement avec les listes JSON de chaque réponse.
+    """
+    variables = list(columns.values())
+    chunks = chunk_communes(communes)
+    urls = [build_observations_url(chunk, start, end, variables) for chunk in chunks]
+    located, results = [], []
+    for index, data, error in fetch_many(urls, model="observations"):
+        chunk = chunks[index]
+        if error is None:
+            try:
+                data = split_locations(data, len(chunk))
+            except Exception as e:
+                error = e
+        if error is not None:
+            if on_error is not None:
+                on_error(chunk, error)
+            continue
+        located.extend(chunk)
+        results.extend(data)
+    if not results:
+        return pd.DataFrame(columns=["Ville", "Date et Heure", *columns])
+    codes, names = pd.factorize(pd.Index([ville["nom"] for ville in located]))
+    lengths, offsets = section_offsets(results, "hourly")
+    return pd.DataFrame({
+        "Ville": pd.Categorical.from_codes(np.repeat(codes, lengths), categories=names),
+        "Date et Heure": section_times(results, "hourly", offsets, HOUR),
+        **{column: section_column(results, "hourly", variable, offsets, np.float32, missing=np.nan)
+           for column, variable in columns.items()},
+    })
+
+
+def error_sums(forecasts, observations, columns=VERIFIED_COLUMNS):
+    """Sommes partielles des écarts prévision - observation.
+
+    Une ligne par (modèle, échéance en jours, variable, commune, date prévue)
+    avec ``n``, ``somme``, ``somme_abs`` et ``somme_carres``. Les heures
+    prévues avant le run (analyses) et les valeurs manquantes sont ignorées.
+    """
+    columns = [column for column in columns if column in forecasts and column in observations]
+    merged = forecasts.merge(observations, on=["Ville", "Date et Heure"], suffixes=("", " (observé)"))
+    # heures locales (Europe/Paris) ramenées en UTC, comme les runs
+    target_utc = (merged["Date et Heure"].dt.tz_localize("Europe/Paris", ambiguous="NaT", nonexistent="NaT")
+                  .dt.tz_convert("UTC").dt.tz_localize(None))
+    lead_hours = (target_utc - merged[RUN_COLUMN]) / pd.Timedelta(hours=1)
+    valid_lead = (lead_hours >= 0).to_numpy()
+
+    rows = len(merged)
+    predicted = np.concatenate([merged[column].to_numpy(dtype=np.float64) for column in columns])
+    observed = np.concatenate([merged[f"{column} (observé)"].to_numpy(dtype=np.float64) for column in columns])
+    errors = predicted - observed
+    keep = np.tile(valid_lead, len(columns)) & ~np.isnan(errors)
+
+    long = pd.DataFrame({
+        MODEL_COLUMN: np.tile(merged[MODEL_COLUMN].astype(str).to_numpy(), len(columns))[keep],
+        LEAD_COLUMN: np.tile((lead_hours.fillna(-1).to_numpy() // 24).astype(np.int16), len(columns))[keep],
+        VARIABLE_COLUMN: np.repeat(np.array(columns, dtype=object), rows)[keep],
+        "Ville": np.tile(merged["Ville"].astype(str).to_numpy(), len(columns))[keep],
+        "Date": np.tile(merged["Date et Heure"].dt.normalize().to_numpy(), len(columns))[keep],
+        "somme": errors[keep],
+        "somme_abs": np.abs(errors[keep]),
+        "somme_carres": errors[keep] ** 2,
+    })
+    sums = long.groupby(SCORE_KEYS, sort=False).agg(
+        n=("somme", "size"), somme=("somme", "sum"), somme_abs=("somme_abs", "sum"),
+        somme_carres=("somme_carres", "sum"),
+    )
+    return sums.reset_index()
+
+
+def scores_from_sums(sums, by=(MODEL_COLUMN, LEAD_COLUMN, VARIABLE_COLUMN)):
+    """MAE, RMSE et biais à partir des sommes partielles, regroupées par ``by``."""
+    totals = sums.groupby(list(by), observed=True)[["n", "somme", "somme_abs", "somme_carres"]].sum()
+    return pd.DataFrame({
+        "n": totals["n"],
+        "MAE": totals["somme_abs"] / totals["n"],
+        "RMSE": np.sqrt(totals["somme_carres"] / totals["n"]),
+        "Biais": totals["somme"] / totals["n"],
+    }).reset_index()
+
+
+class VerificationEngine:
+    """Met à jour les sommes d'écarts date par date et calcule les scores."""
+
+    def __init__(self, archive, directory=None, communes=None):
+        self.archive = archive
+        self.directory = directory or os.path.join(archive.directory, "verification")
+        self.communes = COMMUNES_DEUX_SEVRES if communes is None else communes
+        os.makedirs(self.directory, exist_ok=True)
+        self._flight = get_single_flight(archive.directory)
+
+    def _processed_path(self):
+        return os.path.join(self.directory, "processed.json")
+
+    def _load_processed(self):
+        """``(dates vérifiées pour toutes les communes, {date: communes déjà vérifiées})``."""
+        try:
+            with open(self._processed_path(), encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return set(), {}
+        if isinstance(data, list):
+            # format antérieur : liste des dates complètes
+            return set(data), {}
+        return set(data.get("dates", ())), {date: set(villes) for date, villes in data.get("partial", {}).items()}
+
+    def processed_dates(self):
+        return self._load_processed()[0]
+
+    def pending_dates(self, today=None):
+        """Dates prévues archivées, closes et pas encore vérifiées pour toutes les communes."""
+        today = today or datetime.date.today()
+        closed = (today - datetime.timedelta(days=OBSERVATION_DELAY_DAYS)).isoformat()
+        processed = self.processed_dates()
+        return [date for date in self.archive.dates("hourly") if date < closed and date not in processed]
+
+    @metrics.timed("verification")
+    def update(self, today=None, on_error=None):
+        """Vérifie les nouvelles dates closes ; renvoie le nombre de couples (commune, date) traités.
+
+        Une date n'est close que lorsque toutes les communes ont leurs
+        observations : celles qui ont manqué sont redemandées aux passages
+        suivants, sans recompter les autres.
+        """
+        # une seule mise à jour à la fois, entre threads et entre processus
+        with self._flight.hold("verification"):
+            complete, partial = self._load_processed()
+            pending = self.pending_dates(today)
+            # dates jamais traitées d'abord : une commune dont les observations
+            # manquent durablement ne bloque pas les dates suivantes
+            fresh = [date for date in pending if date not in partial]
+            pending = (fresh or pending)[:MAX_DAYS_PER_UPDATE]
+            if not pending:
+                return 0
+            communes = [ville for ville in self.communes
+                        if any(ville["nom"] not in partial.get(date, ()) for date in pending)]
+            start, end = pending[0], pending[-1]
+            observations = fetch_observations(communes, start, end, on_error=on_error)
+            observed = observations.dropna(subset=list(VERIFIED_COLUMNS), how="all")
+            observed = set(zip(observed["Ville"].astype(str), observed["Date et Heure"].dt.strftime("%Y-%m-%d")))
+            verified = {}
+            for date in pending:
+                names = {ville["nom"] for ville in communes if (ville["nom"], date) in observed}
+                names -= partial.get(date, set())
+                if names:
+                    verified[date] = names
+            if not verified:
+                return 0
+            forecasts = self.archive.query(
+                "hourly", start, f"{end} 23:59", communes=[ville["nom"] for ville in communes],
+                variables=list(VERIFIED_COLUMNS),
+            )
+            keys = pd.MultiIndex.from_arrays([forecasts["Ville"].astype(str),
+                                              forecasts["Date et Heure"].dt.strftime("%Y-%m-%d")])
+            forecasts = forecasts[keys.isin([(nom, date) for date, names in verified.items() for nom in names])]
+            sums = error_sums(forecasts, observations)
+            if len(sums):
+                path = os.path.join(self.directory, f"sums-{int(time.time() * 1000)}.parquet")
+                sums.to_parquet(f"{path}.tmp-{os.getpid()}", index=False)
+                os.replace(f"{path}.tmp-{os.getpid()}", path)
+            all_names = {ville["nom"] for ville in self.communes}
+            for date, names in verified.items():
+                done = names | partial.pop(date, set())
+                if all_names <= done:
+                    complete.add(date)
+                else:
+                    partial[date] = done
+            tmp_path = f"{self._processed_path()}.tmp-{os.getpid()}"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump({"dates": sorted(complete),
+                           "partial": {date: sorted(names) for date, names in sorted(partial.items())}}, fh)
+            os.replace(tmp_path, self._processed_path())
+            return sum(len(names) for names in verified.values())
+
+    def sums(self):
+        files = sorted(name for name in os.listdir(self.directory) if name.startswith("sums-"))
+        if not files:
+            return pd.DataFrame(columns=[*SCORE_KEYS, "n", "somme", "somme_abs", "somme_carres"])
+        return pd.concat([pd.read_parquet(os.path.join(self.directory, name)) for name in files],
+                         ignore_index=True)
+
+    def scores(self, by=(MODEL_COLUMN, LEAD_COLUMN, VARIABLE_COLUMN)):
+        return scores_from_sums(self.sums(), by)
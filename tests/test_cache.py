@@ -0,0 +1,101 @@
+import pytest
+
+from meteo_data import cache as cache_module
+from meteo_data.cache import ForecastCache, variables_signature
+
+SIGNATURE = variables_signature(["temperature_2m_max"], ["temperature_2m"], 16)
+NIORT = {"nom": "Niort", "lat": 46.3239, "lon": -0.4615}
+FORS = {"nom": "Fors", "lat": 46.2372, "lon": -0.4094}
+PARTHENAY = {"nom": "Parthenay", "lat": 46.6486, "lon": -0.2475}
+
+
+class Clock:
+    """Remplace ``time`` dans ``meteo_data.cache`` : instants maîtrisés par le test."""
+
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def response(seed, size=200):
+    return {"hourly": {"temperature_2m": [(seed * 7919 + i * 104729) % 1000 / 10 for i in range(size)]}}
+
+
+def test_round_trip_by_position(tmp_path, clock):
+    cache = ForecastCache(str(tmp_path))
+    cache.put_many("meteofrance_arome_france", [(NIORT, response(1)), (PARTHENAY, response(2))], SIGNATURE,
+                   run_time=1_799_990_000.0)
+    entries = cache.get_many("meteofrance_arome_france", [FORS, PARTHENAY, NIORT], SIGNATURE)
+    assert sorted(entries) == [1, 2]
+    assert entries[2].data == response(1)
+    assert entries[1].run_time == 1_799_990_000.0
+    # autre modèle, autre jeu de variables : pas de collision
+    assert cache.get_many("gfs_seamless", [NIORT], SIGNATURE) == {}
+    assert cache.get_many("meteofrance_arome_france", [NIORT], SIGNATURE + "x") == {}
+
+
+def test_homonyms_distinguished_by_coordinates(tmp_path, clock):
+    cache = ForecastCache(str(tmp_path))
+    other = {"nom": "Niort", "lat": 46.9, "lon": 0.1}
+    cache.put_many("gfs_seamless", [(NIORT, response(1)), (other, response(2))], SIGNATURE)
+    entries = cache.get_many("gfs_seamless", [NIORT, other], SIGNATURE)
+    assert entries[0].data == response(1) and entries[1].data == response(2)
+
+
+def test_expiry_revalidation_and_touch(tmp_path, clock):
+    cache = ForecastCache(str(tmp_path), ttl=3600)
+    cache.put_many("gfs_seamless", [(NIORT, response(1))], SIGNATURE)
+    clock.now += 3601
+    assert cache.get_many("gfs_seamless", [NIORT], SIGNATURE) == {}
+    # expirée mais conservée : disponible pour revalidation
+    stale = cache.get_many("gfs_seamless", [NIORT], SIGNATURE, include_expired=True)
+    assert stale[0].data == response(1) and stale[0].expires_at < clock.now
+    cache.touch("gfs_seamless", [NIORT], SIGNATURE, clock.now + 600)
+    assert cache.get_many("gfs_seamless", [NIORT], SIGNATURE)[0].expires_at == clock.now + 600
+
+
+def test_stale_entries_dropped_after_retention(tmp_path, clock):
+    cache = ForecastCache(str(tmp_path), ttl=60, stale_retention=3600)
+    cache.put_many("gfs_seamless", [(NIORT, response(1))], SIGNATURE)
+    clock.now += 60 + 3600 + 1
+    # l'éviction a lieu à l'écriture suivante
+    cache.put_many("gfs_seamless", [(FORS, response(2))], SIGNATURE)
+    assert cache.get_many("gfs_seamless", [NIORT], SIGNATURE, include_expired=True) == {}
+    assert cache.stats()["entries"] == 1
+
+
+def test_lru_eviction_keeps_recently_read(tmp_path, clock):
+    probe = ForecastCache(str(tmp_path / "probe"))
+    probe.put_many("gfs_seamless", [(NIORT, response(1))], SIGNATURE)
+    size = probe.stats()["bytes"]
+
+    cache = ForecastCache(str(tmp_path / "lru"), max_bytes=int(size * 2.5))
+    cache.put_many("gfs_seamless", [(NIORT, response(1))], SIGNATURE)
+    clock.now += 1
+    cache.put_many("gfs_seamless", [(FORS, response(2))], SIGNATURE)
+    clock.now += 1
+    cache.get_many("gfs_seamless", [NIORT], SIGNATURE)
+    clock.now += 1
+    cache.put_many("gfs_seamless", [(PARTHENAY, response(3))], SIGNATURE)
+
+    kept = cache.get_many("gfs_seamless", [NIORT, FORS, PARTHENAY], SIGNATURE)
+    assert sorted(kept) == [0, 2]
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_invalidate_one_model(tmp_path, clock):
+    cache = ForecastCache(str(tmp_path))
+    cache.put_many("gfs_seamless", [(NIORT, response(1))], SIGNATURE)
+    cache.put_many("icon_eu", [(NIORT, response(2))], SIGNATURE)
+    cache.invalidate("gfs_seamless")
+    assert cache.get_many("gfs_seamless", [NIORT], SIGNATURE) == {}
+    assert cache.get_many("icon_eu", [NIORT], SIGNATURE)[0].data == response(2)
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from meteo_data.communes import COMMUNES_DEUX_SEVRES
+from meteo_data.decimate import (
+    MAX_POINTS_PER_CHART,
+    MIN_POINTS_PER_SERIES,
+    decimate_frame,
+    decimate_indices,
+    lttb_indices,
+    series_max_points,
+)
+
+
+def hourly_frame(communes, days):
+    """Séries horaires synthétiques, une par commune, au format de ``df_hourly``."""
+    times = pd.date_range("2026-03-27", periods=24 * days, freq="h")
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "Ville": pd.Categorical(np.repeat(communes, len(times))),
+        "Date et Heure": np.tile(times, len(communes)),
+        "Température (°C)": rng.normal(12, 5, len(times) * len(communes)).astype("float32"),
+    })
+
+
+def test_lttb_keeps_endpoints_and_threshold():
+    x = np.arange(1000)
+    y = np.sin(x / 30)
+    selected = lttb_indices(x, y, 100)
+    assert len(selected) == 100
+    assert selected[0] == 0 and selected[-1] == 999
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_short_series_untouched():
+    y = np.arange(50, dtype=float)
+    assert np.array_equal(decimate_indices(np.arange(50), y, max_points=100), np.arange(50))
+
+
+def test_extrema_and_nan_handling():
+    y = np.zeros(500)
+    y[123], y[321] = 40.0, -20.0
+    y[10:20] = np.nan
+    kept = decimate_indices(np.arange(500), y, max_points=50)
+    assert 123 in kept and 321 in kept
+    assert not np.isnan(y[kept]).any()
+
+
+def test_budget_shared_between_series():
+    assert series_max_points(1) == MAX_POINTS_PER_CHART
+    assert series_max_points(10) == MAX_POINTS_PER_CHART // 10
+    assert series_max_points(10_000) == MIN_POINTS_PER_SERIES
+
+
+def test_single_commune_week_not_decimated():
+    df = hourly_frame(["Niort"], days=7)
+    assert len(decimate_frame(df, "Date et Heure", "Température (°C)", "Ville")) == len(df)
+
+
+def test_all_communes_decimated():
+    # « Toutes les communes » sur la plage par défaut (3 jours) : budget dépassé
+    communes = [ville["nom"] for ville in COMMUNES_DEUX_SEVRES]
+    df = hourly_frame(communes, days=3)
+    assert len(df) > MAX_POINTS_PER_CHART
+    decimated = decimate_frame(df, "Date et Heure", "Température (°C)", "Ville")
+    assert len(decimated) < len(df)
+    per_series = decimated.groupby("Ville", observed=True).size()
+    assert len(per_series) == len(communes)
+    assert per_series.max() <= series_max_points(len(communes)) + 2
+    # extrema de chaque commune conservés
+    full = df.groupby("Ville", observed=True)["Température (°C)"].agg(["min", "max"])
+    kept = decimated.groupby("Ville", observed=True)["Température (°C)"].agg(["min", "max"])
+    pd.testing.assert_frame_equal(full, kept)
@@ -0,0 +1,34 @@
+import numpy as np
+
+from meteo_data.ensemble import exceedance_probability, member_keys, member_percentiles
+
+
+def test_member_percentiles_match_nanpercentile():
+    rng = np.random.default_rng(17)
+    values = rng.normal(12, 4, (21, 5, 48)).astype(np.float32)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    q = (10, 50, 90)
+    result = member_percentiles(values, q)
+    assert result.shape == (3, 5, 48) and result.dtype == np.float32
+    np.testing.assert_allclose(result, np.nanpercentile(values, q, axis=0), rtol=1e-5, atol=1e-5)
+
+
+def test_member_percentiles_with_missing_members():
+    values = np.array([[1.0, np.nan], [3.0, np.nan], [np.nan, np.nan]], dtype=np.float32)
+    result = member_percentiles(values, (0, 50, 100))
+    np.testing.assert_array_equal(result[:, 0], [1.0, 2.0, 3.0])
+    # aucune valeur pour cette série : NaN plutôt qu'une erreur
+    assert np.isnan(result[:, 1]).all()
+
+
+def test_exceedance_probability_excludes_missing():
+    values = np.array([[1.0, 5.0], [2.0, np.nan], [3.0, 9.0], [4.0, np.nan]], dtype=np.float32)
+    np.testing.assert_allclose(exceedance_probability(values, (2.5, 6.0)), [[0.5, 1.0], [0.0, 0.5]])
+
+
+def test_member_keys_puts_control_first():
+    hourly = {"time": [], "temperature_2m_member02": [], "temperature_2m": [], "temperature_2m_member01": [],
+              "precipitation_member01": []}
+    assert member_keys(hourly, "temperature_2m") == [
+        "temperature_2m", "temperature_2m_member01", "temperature_2m_member02"]
+    assert member_keys(hourly, "wind_gusts_10m") == []
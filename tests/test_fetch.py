@@ -0,0 +1,36 @@
+import pytest
+
+from meteo_data.fetch import build_forecast_url, chunk_communes
+from meteo_data.forecast import DAILY_VARIABLES, HOURLY_VARIABLES, split_locations
+
+
+def communes(count):
+    return [{"nom": f"C{i}", "lat": round(46 + i / 1000, 4), "lon": round(-0.5 + i / 1000, 4)} for i in range(count)]
+
+
+def test_chunks_keep_order_and_size():
+    villes = communes(250)
+    chunks = chunk_communes(villes, max_locations=100)
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    assert [ville for chunk in chunks for ville in chunk] == villes
+
+
+def test_chunks_respect_url_length():
+    villes = communes(500)
+    chunks = chunk_communes(villes, max_locations=1000, max_url_length=2000)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        url = build_forecast_url(chunk, "gfs_seamless", DAILY_VARIABLES, HOURLY_VARIABLES, 16, api_url="http://x")
+        assert len(url) <= 2000
+
+
+def test_single_and_empty():
+    assert chunk_communes([]) == []
+    assert chunk_communes(communes(1)) == [communes(1)]
+
+
+def test_split_locations():
+    assert split_locations({"a": 1}, 1) == [{"a": 1}]
+    assert split_locations([{"a": 1}, {"a": 2}], 2) == [{"a": 1}, {"a": 2}]
+    with pytest.raises(ValueError):
+        split_locations([{"a": 1}], 2)
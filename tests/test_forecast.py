@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.mockapi import synthetic_location
+from meteo_data.forecast import DAY, HOUR, RUN_COLUMN, build_compact_frames, build_frames, time_axis
+
+COMMUNES = [
+    {"nom": "Niort", "lat": 46.3239, "lon": -0.4615},
+    {"nom": "Parthenay", "lat": 46.6486, "lon": -0.2475},
+]
+
+
+def test_time_axis_regular_and_irregular():
+    regular = ["2026-03-01T00:00", "2026-03-01T01:00", "2026-03-01T02:00"]
+    np.testing.assert_array_equal(time_axis(regular, HOUR), np.array(regular, dtype="datetime64[us]"))
+    # changement d'heure : le dernier instant ne correspond plus au pas, lecture chaîne par chaîne
+    irregular = ["2026-03-29T01:00", "2026-03-29T03:00", "2026-03-29T04:00"]
+    np.testing.assert_array_equal(time_axis(irregular, HOUR), np.array(irregular, dtype="datetime64[us]"))
+    assert time_axis([], DAY).size == 0
+    assert time_axis(["2026-03-01"], DAY)[0] == np.datetime64("2026-03-01", "us")
+
+
+def test_compact_frames_match_per_commune_frames():
+    responses = [synthetic_location("AROME", days=3, start="2026-03-01"),
+                 synthetic_location("ARPEGE", days=2, start="2026-03-01")]
+    run_times = [1_772_323_200, None]
+    df_long_term, df_hourly = build_compact_frames(COMMUNES, responses, run_times)
+
+    expected = [build_frames(ville, data, run_time) for ville, data, run_time in zip(COMMUNES, responses, run_times)]
+    expected_long_term = pd.concat([frames[0] for frames in expected], ignore_index=True)
+    expected_hourly = pd.concat([frames[1] for frames in expected], ignore_index=True)
+
+    assert list(df_long_term.columns) == list(expected_long_term.columns)
+    assert list(df_hourly.columns) == list(expected_hourly.columns)
+    assert len(df_long_term) == 5 and len(df_hourly) == 5 * 24
+    assert isinstance(df_hourly["Ville"].dtype, pd.CategoricalDtype)
+    assert df_hourly["Température (°C)"].dtype == np.float32
+
+    np.testing.assert_allclose(df_hourly["Température (°C)"], expected_hourly["Température (°C)"], rtol=1e-6)
+    np.testing.assert_array_equal(df_hourly["Date et Heure"].to_numpy(),
+                                  pd.to_datetime(expected_hourly["Date et Heure"]).to_numpy())
+    np.testing.assert_array_equal(df_long_term["Lever du soleil"].to_numpy(),
+                                  pd.to_datetime(expected_long_term["Lever du soleil"]).to_numpy())
+    assert df_long_term["Ville"].astype(str).tolist() == expected_long_term["Ville"].tolist()
+    assert df_hourly[RUN_COLUMN].iloc[0] == pd.Timestamp(run_times[0], unit="s")
+    assert df_hourly[RUN_COLUMN].iloc[-1] is pd.NaT
+
+
+def test_compact_frames_homonyms_share_category():
+    homonyms = [{"nom": "Saint-Martin", "lat": 46.0, "lon": -0.5}, {"nom": "Saint-Martin", "lat": 45.0, "lon": 0.5}]
+    responses = [synthetic_location("GFS", days=1, start="2026-03-01") for _ in homonyms]
+    df_long_term, _ = build_compact_frames(homonyms, responses)
+    assert list(df_long_term["Ville"].cat.categories) == ["Saint-Martin"]
+    np.testing.assert_allclose(df_long_term["Latitude"], [46.0, 45.0])
@@ -0,0 +1,43 @@
+from meteo_data.communes import COMMUNES_DEUX_SEVRES
+from meteo_data.grid import grid_cell, resolve_grid_cells
+from meteo_data.models import GRID_RESOLUTIONS
+
+
+def commune(nom, lat, lon, population=None):
+    return {"nom": nom, "lat": lat, "lon": lon, "population": population}
+
+
+def test_grid_cell_uses_model_step():
+    assert grid_cell("GFS", 46.32, -0.46) == (185, -2)
+    assert grid_cell("AROME", 46.32, -0.46) == (1853, -18)
+    assert grid_cell("GFS", 46.32, -0.46, step=0.5) == (93, -1)
+
+
+def test_cells_are_real_communes():
+    cells, cell_of = resolve_grid_cells("GFS", COMMUNES_DEUX_SEVRES)
+    assert len(cell_of) == len(COMMUNES_DEUX_SEVRES)
+    assert len(cells) < len(COMMUNES_DEUX_SEVRES)
+    # coordonnées d'une commune suivie, jamais un centre de maille synthétique
+    assert all(any(cell is ville for ville in COMMUNES_DEUX_SEVRES) for cell in cells)
+    for ville, cell in zip(COMMUNES_DEUX_SEVRES, cell_of):
+        assert grid_cell("GFS", ville["lat"], ville["lon"]) == grid_cell("GFS", cells[cell]["lat"], cells[cell]["lon"])
+
+
+def test_most_populous_commune_represents_its_cell():
+    step = GRID_RESOLUTIONS["GFS"]
+    communes = [
+        commune("Petite", 46.30, -0.45, 300),
+        commune("Sans population", 46.31, -0.46),
+        commune("Grande", 46.32, -0.47, 59000),
+        commune("Lointaine", 46.30 + 4 * step, -0.45, 100),
+    ]
+    cells, cell_of = resolve_grid_cells("GFS", communes)
+    assert [cell["nom"] for cell in cells] == ["Grande", "Lointaine"]
+    assert cell_of == [0, 0, 0, 1]
+
+
+def test_homonyms_keep_their_own_cell():
+    communes = [commune("Saint-Martin", 46.3, -0.4), commune("Saint-Martin", 47.3, 0.6)]
+    cells, cell_of = resolve_grid_cells("AROME", communes)
+    assert cell_of == [0, 1]
+    assert cells[0] is communes[0] and cells[1] is communes[1]
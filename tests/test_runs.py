@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+from meteo_data.runs import RECHECK_INTERVAL, entry_expiry, expected_run, next_run_available_at
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_expected_run_waits_for_publication_delay():
+    # GFS : runs 0/6/12/18 h, publiés 4 h plus tard
+    assert expected_run("GFS", utc(2026, 10, 17, 9, 59)) == utc(2026, 10, 17, 0)
+    assert expected_run("GFS", utc(2026, 10, 17, 10, 0)) == utc(2026, 10, 17, 6)
+
+
+def test_expected_run_of_previous_day():
+    assert expected_run("ARPEGE", utc(2026, 10, 17, 2)) == utc(2026, 10, 16, 18)
+
+
+def test_next_run_available_at():
+    assert next_run_available_at("AROME", utc(2026, 10, 17, 21)) == utc(2026, 10, 18, 2)
+    assert next_run_available_at("GFS", utc(2026, 10, 17, 6)) == utc(2026, 10, 17, 16)
+
+
+def test_entry_expiry_on_next_publication():
+    now = utc(2026, 10, 17, 10, 30)
+    assert entry_expiry("GFS", utc(2026, 10, 17, 6), now) == utc(2026, 10, 17, 16).timestamp()
+
+
+def test_late_run_rechecked_after_interval():
+    # run suivant attendu à 16 h mais pas encore paru à 17 h
+    now = utc(2026, 10, 17, 17)
+    assert entry_expiry("GFS", utc(2026, 10, 17, 6), now) == (now + timedelta(seconds=RECHECK_INTERVAL)).timestamp()
@@ -0,0 +1,101 @@
+import http.client
+import threading
+from http.server import ThreadingHTTPServer
+
+import pyarrow as pa
+import pytest
+
+from benchmarks.mockapi import synthetic_location
+from meteo_data.forecast import build_compact_frames
+from meteo_data.index import frames_version
+from meteo_data.service import ForecastService, ModelTables, RequestError, make_handler, to_arrow
+
+COMMUNES = [
+    {"nom": "Niort", "lat": 46.3239, "lon": -0.4615},
+    {"nom": "Parthenay", "lat": 46.6486, "lon": -0.2475},
+]
+QUERY = {"models": ["AROME"], "communes": ["Niort"], "start": ["2026-03-01"], "end": ["2026-03-02"]}
+
+
+def model_tables(model_name, offset=0.0):
+    responses = [synthetic_location(model_name, days=3, start="2026-03-01") for _ in COMMUNES]
+    for data in responses:
+        data["hourly"]["temperature_2m"] = [value + offset for value in data["hourly"]["temperature_2m"]]
+    df_long_term, df_hourly = build_compact_frames(COMMUNES, responses)
+    return ModelTables("test", frames_version(df_long_term, df_hourly),
+                       to_arrow(model_name, df_long_term), to_arrow(model_name, df_hourly))
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Service dont les tables sont construites en mémoire, sans magasin ni API."""
+    service = ForecastService(source="store")
+    tables = {"AROME": model_tables("AROME")}
+    monkeypatch.setattr(service, "model_tables", lambda model_name: tables[model_name])
+    service.tables = tables
+    return service
+
+
+def test_query_returns_selected_rows_with_etag(service):
+    status, body, headers = service.query("hourly", QUERY)
+    assert status == 200
+    assert headers["ETag"].startswith('"') and headers["Content-Type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(body).read_all()
+    assert set(table["Ville"].to_pylist()) == {"Niort"}
+    assert table.num_rows == 48
+
+
+def test_etag_is_stable_and_depends_on_selection(service):
+    etag = service.query("hourly", QUERY)[2]["ETag"]
+    assert service.query("hourly", dict(QUERY))[2]["ETag"] == etag
+    assert service.query("hourly", {**QUERY, "communes": ["Parthenay"]})[2]["ETag"] != etag
+    assert service.query("hourly", {**QUERY, "format": ["parquet"]})[2]["ETag"] != etag
+    assert service.query("daily", QUERY)[2]["ETag"] != etag
+
+
+def test_if_none_match_returns_304_until_content_changes(service):
+    etag = service.query("hourly", QUERY)[2]["ETag"]
+    status, body, headers = service.query("hourly", QUERY, if_none_match=f'"autre", {etag}')
+    assert (status, body, headers["ETag"]) == (304, b"", etag)
+
+    # même run, données différentes : nouvelle version, donc nouvel ETag
+    service.tables["AROME"] = model_tables("AROME", offset=0.5)
+    status, _, headers = service.query("hourly", QUERY, if_none_match=etag)
+    assert status == 200 and headers["ETag"] != etag
+
+
+def test_invalid_requests(service):
+    for query in ({"models": ["INCONNU"]}, {**QUERY, "format": ["csv"]}, {**QUERY, "start": ["hier"]},
+                  {**QUERY, "variables": ["Pression"]}):
+        with pytest.raises(RequestError) as error:
+            service.query("hourly", query)
+        assert error.value.status == 400
+
+
+def test_http_304_has_no_body_nor_content_length(service):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection(*httpd.server_address[:2], timeout=10)
+        path = "/v1/hourly?models=AROME&communes=Niort&start=2026-03-01&end=2026-03-02"
+        connection.request("GET", path)
+        response = connection.getresponse()
+        body = response.read()
+        assert response.status == 200
+        assert int(response.getheader("Content-Length")) == len(body)
+        etag = response.getheader("ETag")
+
+        # même connexion (HTTP/1.1) : la réponse 304 ne doit rien laisser sur le flux
+        connection.request("GET", path, headers={"If-None-Match": etag})
+        response = connection.getresponse()
+        assert response.status == 304 and response.read() == b""
+        assert response.getheader("Content-Length") is None
+        assert response.getheader("ETag") == etag
+
+        connection.request("GET", path)
+        assert connection.getresponse().read() == body
+        connection.close()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from meteo_data.archive import MODEL_COLUMN
+from meteo_data.forecast import RUN_COLUMN
+from meteo_data.verification import LEAD_COLUMN, VARIABLE_COLUMN, error_sums, scores_from_sums
+
+TEMPERATURE = "Température (°C)"
+HUMIDITY = "Humidité (%)"
+# heures locales (Europe/Paris, UTC+1 en mars) du 1er au 2 mars
+HOURS = pd.date_range("2026-03-01 00:00", periods=48, freq="h")
+RUN = pd.Timestamp("2026-03-01 00:00")  # UTC, soit 01:00 à Paris
+
+
+def forecasts(error, model="AROME", ville="Niort"):
+    return pd.DataFrame({
+        MODEL_COLUMN: model,
+        "Ville": ville,
+        "Date et Heure": HOURS,
+        TEMPERATURE: np.full(len(HOURS), 10.0 + error),
+        HUMIDITY: np.full(len(HOURS), 80.0),
+        RUN_COLUMN: RUN,
+    })
+
+
+def observations(ville="Niort"):
+    humidity = np.full(len(HOURS), 70.0)
+    humidity[30:] = np.nan
+    return pd.DataFrame({
+        "Ville": ville,
+        "Date et Heure": HOURS,
+        TEMPERATURE: np.full(len(HOURS), 10.0),
+        HUMIDITY: humidity,
+    })
+
+
+def test_error_sums_by_lead_and_date():
+    sums = error_sums(forecasts(2.0), observations())
+    temperature = sums[sums[VARIABLE_COLUMN] == TEMPERATURE].set_index("Date")
+    # 00:00 locale précède le run (analyse) : ignorée
+    assert temperature.loc[pd.Timestamp("2026-03-01"), "n"] == 23
+    assert temperature.loc[pd.Timestamp("2026-03-01"), LEAD_COLUMN] == 0
+    # le 2 mars à 00:00 locale est la 23e heure après le run : encore échéance 0
+    day_two = sums[(sums[VARIABLE_COLUMN] == TEMPERATURE) & (sums["Date"] == pd.Timestamp("2026-03-02"))]
+    assert dict(zip(day_two[LEAD_COLUMN], day_two["n"])) == {0: 1, 1: 23}
+    assert (temperature["somme"] == 2.0 * temperature["n"]).all()
+    assert (temperature["somme_carres"] == 4.0 * temperature["n"]).all()
+
+
+def test_error_sums_skip_missing_observations():
+    sums = error_sums(forecasts(0.0), observations())
+    humidity = sums[sums[VARIABLE_COLUMN] == HUMIDITY]
+    # 48 heures, moins l'analyse et les 18 heures sans observation
+    assert humidity["n"].sum() == 48 - 1 - 18
+    assert (humidity["somme"] == 10.0 * humidity["n"]).all()
+
+
+def test_scores_from_sums_aggregates_communes():
+    merged = pd.concat([forecasts(1.0, ville="Niort"), forecasts(-3.0, ville="Parthenay")], ignore_index=True)
+    observed = pd.concat([observations("Niort"), observations("Parthenay")], ignore_index=True)
+    scores = scores_from_sums(error_sums(merged, observed))
+    row = scores[(scores[VARIABLE_COLUMN] == TEMPERATURE) & (scores[LEAD_COLUMN] == 1)].iloc[0]
+    assert row["n"] == 46
+    assert row["MAE"] == 2.0 and row["Biais"] == -1.0
+    assert np.isclose(row["RMSE"], np.sqrt(5.0))